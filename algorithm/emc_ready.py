@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from algorithm.template import AlgoTemplate
+from library import ta
+
+
+class EMC(AlgoTemplate):
+    """
+    EMA cross
+      - flat: long when the fast EMA crosses over the slow EMA, short when it crosses under
+      - long/ short: close the whole position on the opposite cross or at timeout, no add orders
+    the signals only depend on the bars, so the strategy is backtested with signal arrays as well (generate_signals)
+    """
+    version = '1.0'
+    name = 'EMC'
+    indicator_params = ('fast_period', 'slow_period')
+
+    # ------------------------------------------------------------------------------------------- #
+    """ initialization """
+    # ------------------------------------------------------------------------------------------- #
+    def __init__(self, main_app, symbol: str):
+        super().__init__(main_app, symbol)
+        self.fast_period = 20
+        self.slow_period = 60
+
+        # indicators
+        self.ema_fast = pd.Series(dtype=float)
+        self.ema_slow = pd.Series(dtype=float)
+        self._fast = np.zeros(0)  # values of ema_fast, read by index bar by bar (live: the last 2 bars)
+        self._slow = np.zeros(0)
+        self._streams = None  # live: (ta.StreamingEMA fast, slow), updated with each closed bar
+        self._last_time_key = None  # live: latest bar in the streams
+
+    # ------------------------------------------------------------------------------------------- #
+    """ algorithm """
+    # ------------------------------------------------------------------------------------------- #
+    def apply_indicators(self, kline: pd.DataFrame):
+        self.ema_fast = ta.ema(kline, self.fast_period)
+        self.ema_slow = ta.ema(kline, self.slow_period)
+        self._fast = self.ema_fast.to_numpy(dtype=float)
+        self._slow = self.ema_slow.to_numpy(dtype=float)
+
+    def update_indicator(self, kline: pd.DataFrame):
+        """
+        live: only the bars closed since the last call are added to the EMAs, the kline is not recalculated
+        """
+        if self._streams is None:
+            self._streams = (ta.StreamingEMA(self.fast_period), ta.StreamingEMA(self.slow_period))
+
+        new_bars = kline if self._last_time_key is None else kline[kline['time_key'] > self._last_time_key]
+        for bar in new_bars[['close']].to_dict('records'):
+            fast, slow = (stream.update(bar) for stream in self._streams)
+            self._fast = np.append(self._fast[-1:], fast)
+            self._slow = np.append(self._slow[-1:], slow)
+        if not new_bars.empty:
+            self._last_time_key = new_bars['time_key'].iloc[-1]
+
+    def generate_signals(self, kline: pd.DataFrame) -> dict:
+        cross_over = self.cross_over_mask(self._fast, self._slow)
+        cross_under = self.cross_under_mask(self._fast, self._slow)
+
+        return {'long_entry': cross_over, 'long_exit': cross_under, 'short_entry': cross_under, 'short_exit': cross_over}
+
+    def check_entry_conditions(self, kline: pd.DataFrame, index: int = 0):
+        if self.inv_algo:
+            return
+
+        cross = self._get_cross(kline, index)
+        if cross > 0:
+            self.place_order(side='BUY', qty=self.exec_set, remark='LE', index=index)
+        elif cross < 0:
+            self.place_order(side='SELL', qty=self.exec_set, remark='SE', index=index)
+
+    def check_exit_conditions(self, kline: pd.DataFrame, index: int = 0):
+        cross = self._get_cross(kline, index)
+        if self.inv_algo > 0 and cross < 0:
+            self.place_order(side='SELL', qty=abs(self.inv_algo), remark='LX', index=index)
+        elif self.inv_algo < 0 and cross > 0:
+            self.place_order(side='BUY', qty=abs(self.inv_algo), remark='SX', index=index)
+
+    # ------------------------------------------------------------------------------------------- #
+    """ helper methods """
+    # ------------------------------------------------------------------------------------------- #
+    def _get_cross(self, kline: pd.DataFrame, index: int) -> int:
+        """
+        same comparison as cross_over_mask/ cross_under_mask at one bar
+        :return: 1 if the fast EMA crosses over the slow EMA at the bar, -1 if it crosses under, otherwise 0
+        """
+        if self.main_app.engine == 'live':
+            index = len(self._fast) - 1  # latest bar
+
+        if index < 1:
+            return 0
+
+        fast_prev, fast, slow_prev, slow = self._fast[index - 1], self._fast[index], self._slow[index - 1], self._slow[index]
+        if fast_prev < slow_prev and fast > slow:
+            return 1
+        if fast_prev > slow_prev and fast < slow:
+            return -1
+
+        return 0
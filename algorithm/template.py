@@ -1,5 +1,6 @@
 import datetime as dt
 import logging
+import numpy as np
 import pandas as pd
 import threading as th
 
@@ -8,6 +9,14 @@ class AlgoTemplate:
     version = None
     launch_date = None
     name = None
+    # params carried from one backtest period to the next, extend it if the strategy keeps other position params
+    position_state_params = ('inv_real', 'inv_algo', 'avg_price', 'first_entry_price', 'last_entry_price',
+                             'last_entry_time')
+    # attributes used by apply_indicators, runs with the same values share the indicators (parameter sweep),
+    # None: not listed, the indicators are only shared by runs with the same params
+    indicator_params = None
+    # close all positions at these times (e.g. typhoon, exchange incidents)
+    special_timeouts = {dt.datetime(2022, 11, 2, 13, 54), dt.datetime(2023, 4, 12, 16, 14)}
 
     # ------------------------------------------------------------------------------------------- #
     """ initialization """
@@ -31,6 +40,7 @@ class AlgoTemplate:
         self.main_app = main_app
         self.kline = pd.DataFrame()
         self.kline_daily = pd.DataFrame()
+        self.bars = None  # BarView of self.kline, set by the backtest engine
 
         # algo params
         self.max_contract = 3
@@ -46,6 +56,7 @@ class AlgoTemplate:
         self.mode = 'normal'
         self._order_num = 1
         self._can_trade = True  # temporary for placing order
+        self.orders = []  # live: orders of the bar being evaluated, placed after all strategies finished (AlgoTrade)
         self.can_open_order = True
         self.is_timeout = False
         self.is_stop_trade = False
@@ -96,7 +107,8 @@ class AlgoTemplate:
                     side = 'SELL' if side == 'BUY' else 'BUY'
                     remark += '(reverse)'
 
-                self.main_app.fire_trade(side, qty, f'{self.name}-{remark}', order_type)
+                self.main_app.latency.mark(f'{self.name} order built')
+                self.orders.append((side, qty, f'{self.name}-{remark}', order_type))
                 th.Timer(1, self._reset_can_trade).start()
 
         # self.main_app.update_gui()
@@ -122,6 +134,15 @@ class AlgoTemplate:
         self._order_num += 1
         return order_id
 
+    def _get_time_key(self, index: int) -> dt.datetime:
+        """
+        return 'time_key' of the bar, from the bar view if available (backtesting)
+        """
+        if self.bars is not None:
+            return self.bars.time_key[index]
+
+        return self.kline['time_key'].iloc[index]
+
     def update_params(self, inventory=0, pnl=0, average_price=0, traded_vol=0, last_entry_price=0, last_entry_time=0):
         """
         only used for demo order
@@ -135,9 +156,31 @@ class AlgoTemplate:
         self.last_entry_price = last_entry_price
         self.last_entry_time = last_entry_time
 
+    def update_order_params(self, side: str, qty: int, price: int, time_: dt.datetime):
+        """
+        live: position params once the order is accepted, the strategies see them before its fill reaches the
+        trade journal (which is only shown by the gui)
+        :param side: side of the order placed (flipped in reverse mode)
+        """
+        previous_inv = self.inv_algo
+        self.update_backtest_params(side, qty, price)
+        self.trd_vol += qty
+        if abs(self.inv_algo) > abs(previous_inv) or previous_inv * self.inv_algo < 0:  # entry, add or reversal
+            self.last_entry_price = price
+            self.last_entry_time = time_
+
+    def get_position_state(self) -> dict:
+        """
+        return position params, used to continue a backtest from the end of the previous period
+        """
+        return {param: getattr(self, param) for param in self.position_state_params}
+
+    def set_position_state(self, state: dict):
+        for param, value in state.items():
+            setattr(self, param, value)
+
     def update_backtest_params(self, side: str, qty: int, price: int):
-        if self.inv_algo == 0:
-            self.first_entry_price = price
+        previous_inv = self.inv_algo
 
         # update inventory
         if side == 'BUY':
@@ -146,11 +189,14 @@ class AlgoTemplate:
             self.inv_real -= qty
         self.inv_algo = self.inv_real if self.mode == 'normal' else -self.inv_real
 
-        # update average price
+        # update average price: a new position (also reversed by one order) starts at the price,
+        # adding to it averages, closing a part of it keeps it
         if self.inv_algo == 0:
             self.avg_price = 0
-        else:
-            self.avg_price = (self.avg_price * self.inv_algo + price * qty) / (self.inv_algo + qty)
+        elif previous_inv == 0 or (previous_inv > 0) != (self.inv_algo > 0):
+            self.avg_price = self.first_entry_price = price
+        elif abs(self.inv_algo) > abs(previous_inv):
+            self.avg_price = (self.avg_price * abs(previous_inv) + price * qty) / abs(self.inv_algo)
 
     @staticmethod
     def cross_over(value1: pd.Series, value2: pd.Series | float):
@@ -192,6 +238,30 @@ class AlgoTemplate:
         else:
             return False
 
+    @staticmethod
+    def cross_over_mask(value1: pd.Series | np.ndarray, value2: pd.Series | np.ndarray | float) -> np.ndarray:
+        """
+        vectorized cross_over, True at every bar where value1 crosses over value2
+        :return: boolean array
+        """
+        value1 = np.asarray(value1, dtype=float)
+        value2 = np.broadcast_to(np.asarray(value2, dtype=float), value1.shape)
+        mask = np.zeros(value1.shape, dtype=bool)
+        mask[1:] = (value1[:-1] < value2[:-1]) & (value1[1:] > value2[1:])
+        return mask
+
+    @staticmethod
+    def cross_under_mask(value1: pd.Series | np.ndarray, value2: pd.Series | np.ndarray | float) -> np.ndarray:
+        """
+        vectorized cross_under, True at every bar where value1 crosses under value2
+        :return: boolean array
+        """
+        value1 = np.asarray(value1, dtype=float)
+        value2 = np.broadcast_to(np.asarray(value2, dtype=float), value1.shape)
+        mask = np.zeros(value1.shape, dtype=bool)
+        mask[1:] = (value1[:-1] > value2[:-1]) & (value1[1:] < value2[1:])
+        return mask
+
     # ------------------------------------------------------------------------------------------- #
     """ algorithm """
     # ------------------------------------------------------------------------------------------- #
@@ -202,6 +272,28 @@ class AlgoTemplate:
     def apply_daily_indicators(self):
         pass
 
+    def update_kline_daily(self, bars: list):
+        """
+        live: add closed daily bars (BarAggregator) to kline_daily and apply the daily indicators,
+        same price columns as the backtest daily kline ('time_key': trading day as yyyymmdd)
+        :param bars: [{'time_key': datetime, 'open': .., 'high': .., 'low': .., 'close': .., 'volume': ..}, ...]
+        """
+        if not bars:
+            return
+        daily = pd.DataFrame(bars, columns=['time_key', 'open', 'high', 'low', 'close', 'volume'])
+        daily['time_key'] = pd.to_datetime(daily['time_key']).dt.strftime('%Y%m%d').astype(int)
+        daily = daily[['open', 'high', 'low', 'close', 'volume', 'time_key']]
+        self.kline_daily = daily if self.kline_daily.empty else pd.concat([self.kline_daily, daily], ignore_index=True)
+        self.apply_daily_indicators()
+
+    def generate_signals(self, kline: pd.DataFrame) -> dict | None:
+        """
+        signals of all bars for the vectorized backtest, called after apply_indicators
+        return None if the strategy depends on the path (e.g. add orders), it is then backtested bar by bar
+        :return: boolean arrays (keys: 'long_entry' 'long_exit' 'short_entry' 'short_exit')
+        """
+        return None
+
     def update_kline(self, kline: pd.DataFrame, index: int = 0):
         """
         in live trading: the latest kline would be used, get last index from kline
@@ -234,7 +326,7 @@ class AlgoTemplate:
             else:
                 side = 'BUY'
                 remark = 'SX TIMEOUT'
-            self.place_order(side=side, qty=self.inv_algo, remark=remark, index=index)
+            self.place_order(side=side, qty=abs(self.inv_algo), remark=remark, index=index)
             return
         else:
             # run indicators
@@ -262,7 +354,7 @@ class AlgoTemplate:
                 else:
                     return
 
-                self.place_order(side=side, qty=self.inv_algo, remark=remark, index=index)
+                self.place_order(side=side, qty=abs(self.inv_algo), remark=remark, index=index)
                 return
 
             self.check_exit_conditions(kline, index=index)
@@ -277,7 +369,7 @@ class AlgoTemplate:
         if self.main_app.engine == 'live':
             index = self.kline.index[-1]  # get index
 
-        time_key = self.kline['time_key'].iloc[index]
+        time_key = self._get_time_key(index)
         if self.algo_timeout_time.hour > 3:
             if self.algo_timeout_time <= time_key.time() or time_key.hour <= 3:
                 return set_timeout(True)
@@ -288,10 +380,8 @@ class AlgoTemplate:
         elif time_key.hour == 12 and time_key.minute == 28:
             return set_timeout(True)
 
-        time_str = dt.datetime.strftime(time_key, '%Y-%m-%d %H:%M:%S')
-
         # special timeout
-        if time_str in ('2022-11-02 13:54:00', '2023-04-12 16:14:00'):
+        if time_key in self.special_timeouts:
             return set_timeout(True)
 
         return set_timeout(False)
@@ -311,7 +401,7 @@ class AlgoTemplate:
         if self.main_app.engine == 'live':
             index = self.kline.index[-1]  # get index
 
-        time_key = self.kline['time_key'].iloc[index]
+        time_key = self._get_time_key(index)
         if self.open_order_end_time.hour > 3:
             if self.open_order_start_time < time_key.time() < self.open_order_end_time:
                 return set_can_open_order(True)
@@ -323,6 +413,35 @@ class AlgoTemplate:
             else:
                 return set_can_open_order(False)
 
+    def get_open_order_mask(self, time_key: pd.Series) -> np.ndarray:
+        """
+        vectorized _check_can_open_order
+        :return: boolean array, True if time_key within open order period
+        """
+        seconds = _get_seconds_of_day(time_key)
+        start, end = _to_seconds(self.open_order_start_time), _to_seconds(self.open_order_end_time)
+        if self.open_order_end_time.hour > 3:
+            return (start < seconds) & (seconds < end)
+        else:
+            return (start < seconds) | (seconds < end)
+
+    def get_timeout_mask(self, time_key: pd.Series) -> np.ndarray:
+        """
+        vectorized check_is_timeout
+        :return: boolean array, True if algo timeout
+        """
+        seconds = _get_seconds_of_day(time_key)
+        hour, minute = seconds // 3600, seconds // 60 % 60
+        timeout = _to_seconds(self.algo_timeout_time)
+        if self.algo_timeout_time.hour > 3:
+            mask = (timeout <= seconds) | (hour <= 3)
+        else:
+            mask = ((timeout <= seconds) & (hour <= 3)) | ((hour == 12) & (minute == 28))
+
+        # special timeout
+        return mask | np.isin(time_key.to_numpy(dtype='datetime64[ns]'),
+                              np.array(sorted(self.special_timeouts), dtype='datetime64[ns]'))
+
     def update_indicator(self, kline: pd.DataFrame):
         pass
 
@@ -348,3 +467,12 @@ class AlgoTemplate:
         if self.inv_algo:
             side = 'SELL' if self.inv_algo > 0 else 'BUY'
             self.place_order(side=side, qty=self.inv_algo, remark='LX TOUT', last_bar=last_bar)
+
+
+def _get_seconds_of_day(time_key: pd.Series) -> np.ndarray:
+    values = time_key.to_numpy(dtype='datetime64[s]')
+    return (values - values.astype('datetime64[D]')).astype('int64')
+
+
+def _to_seconds(time_: dt.time) -> int:
+    return time_.hour*3600 + time_.minute*60 + time_.second
@@ -0,0 +1,127 @@
+"""
+Columnar store for 1-minute bars
+
+layout: <store_dir>/<yyyy-mm>/<column>.npy
+    one directory per calendar month, one NumPy file per column,
+    columns are read with memory mapping so a date range read only touches the months (and rows) it needs
+      <store_dir>/manifest.json
+    information about the source files which are already in the store
+"""
+import datetime as dt
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = {'Date': 'datetime64[s]',
+           'Open': 'float64',
+           'High': 'float64',
+           'Low': 'float64',
+           'Close': 'float64',
+           'Volume': 'int64'}
+
+
+def get_store_dir(project_dir: os.path) -> os.path:
+    return os.path.join(project_dir, 'database', 'fhsi_m1', 'bar_store')
+
+
+def write(store_dir: os.path, df: pd.DataFrame, replace_from: dt.datetime = None) -> None:
+    """
+    save bars to the store
+    :param store_dir: directory of the store
+    :param df: dataframe (columns: 'Date' 'Open' 'High' 'Low' 'Close' 'Volume')
+    :param replace_from: if given, bars earlier than 'replace_from' are kept and only the months from 'replace_from'
+                         onwards are rewritten, otherwise all existing partitions are replaced
+    :return: None
+    """
+    # keep bars before 'replace_from' in the first rewritten month
+    first_month = ''
+    if replace_from is not None:
+        first_month = str(np.datetime64(replace_from, 'M'))
+        kept = read(store_dir, np.datetime64(first_month, 's'), np.datetime64(replace_from, 's') - 1)
+        df = pd.concat([kept, df[df['Date'] >= replace_from]], axis=0, ignore_index=True)
+
+    # remove old partitions
+    for partition in list_partitions(store_dir):
+        if partition >= first_month:
+            shutil.rmtree(os.path.join(store_dir, partition))
+    os.makedirs(store_dir, exist_ok=True)
+
+    # convert to arrays
+    df = df.sort_values('Date', kind='stable')
+    arrays = {col: pd.to_datetime(df[col]).to_numpy(dtype=dtype) if col == 'Date' else df[col].to_numpy(dtype=dtype)
+              for col, dtype in COLUMNS.items()}
+
+    # split by month (data is sorted, each month is a continuous block)
+    months = arrays['Date'].astype('datetime64[M]')
+    boundaries = np.flatnonzero(months[1:] != months[:-1]) + 1
+    for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(months)]):
+        if start == end:
+            continue
+        partition_dir = os.path.join(store_dir, str(months[start]))
+        os.makedirs(partition_dir, exist_ok=True)
+        for col, values in arrays.items():
+            np.save(os.path.join(partition_dir, f'{col}.npy'), values[start:end])
+
+
+def read(store_dir: os.path, from_: dt.datetime, to_: dt.datetime) -> pd.DataFrame:
+    """
+    read bars between 'from_' and 'to_' (both inclusive)
+    :param store_dir: directory of the store
+    :param from_: start datetime
+    :param to_: end datetime
+    :return: dataframe (columns: 'Date' 'Open' 'High' 'Low' 'Close' 'Volume')
+    """
+    from_, to_ = np.datetime64(from_, 's'), np.datetime64(to_, 's')
+    first_month, last_month = str(from_.astype('datetime64[M]')), str(to_.astype('datetime64[M]'))
+
+    # collect slices month by month
+    slices = {col: [] for col in COLUMNS}
+    for partition in list_partitions(store_dir):
+        if not first_month <= partition <= last_month:
+            continue
+
+        partition_dir = os.path.join(store_dir, partition)
+        dates = np.load(os.path.join(partition_dir, 'Date.npy'), mmap_mode='r')
+        start = np.searchsorted(dates, from_, side='left')
+        end = np.searchsorted(dates, to_, side='right')
+        if start == end:
+            continue
+
+        for col in COLUMNS:
+            values = dates if col == 'Date' else np.load(os.path.join(partition_dir, f'{col}.npy'), mmap_mode='r')
+            slices[col].append(np.array(values[start:end]))
+
+    # build dataframe
+    data = {col: np.concatenate(values) if values else np.array([], dtype=COLUMNS[col])
+            for col, values in slices.items()}
+    data['Date'] = data['Date'].astype('datetime64[ns]')
+
+    return pd.DataFrame(data)
+
+
+def read_manifest(store_dir: os.path) -> dict:
+    path = os.path.join(store_dir, 'manifest.json')
+    if not os.path.isfile(path):
+        return {}
+
+    with open(path, 'r') as file_:
+        return json.load(file_)
+
+
+def write_manifest(store_dir: os.path, manifest: dict) -> None:
+    os.makedirs(store_dir, exist_ok=True)
+    with open(os.path.join(store_dir, 'manifest.json'), 'w') as file_:
+        json.dump(manifest, file_, indent=2, default=str)
+
+
+def list_partitions(store_dir: os.path) -> list:
+    """
+    return sorted partition names, e.g. ['2019-06', '2019-07', ...]
+    """
+    if not os.path.isdir(store_dir):
+        return []
+
+    return sorted(name for name in os.listdir(store_dir) if os.path.isdir(os.path.join(store_dir, name)))
@@ -7,32 +7,32 @@ import datetime as dt
 import pandas as pd
 from pathlib import Path
 
+import bar_store
+
 
 class CandleStick:
     def __init__(self,
                  project_dir: str,
                  from_: dt.datetime = dt.datetime.strptime('2019-01-01', '%Y-%m-%d'),
-                 to_: dt.datetime = dt.datetime.now()):
+                 to_: dt.datetime = dt.datetime.now(),
+                 read_bars=None):
         """
         Build candlestick
         :param from_: 'yyyy-mm-dd'
         :param to_: 'yyyy-mm-dd'
+        :param read_bars: function(from_, to_) returns bars of the period (e.g. SharedFrame.read),
+                          read from the bar store if None
         """
         # re-define 'from_' and 'to_'
         self.project_dir = project_dir
         from_ = from_.replace(hour=9, minute=15)
         to_ = (to_ + dt.timedelta(days=1)).replace(hour=3, minute=0)
 
-        # read fhsi data
-        self.fhsi_data = pd.read_csv(
-            os.path.join(self.project_dir, 'database', 'fhsi_m1', 'full_data', 'full_data.csv'),
-            index_col=0,
-            parse_dates=['Date']
-        )
-
-        # build data with 'from_' and 'to_'
-        self.fhsi_chart_data = self.fhsi_data[(self.fhsi_data['Date'] >= from_) &
-                                              (self.fhsi_data['Date'] <= to_)]
+        # read fhsi data between 'from_' and 'to_'
+        if read_bars is None:
+            self.fhsi_chart_data = bar_store.read(bar_store.get_store_dir(self.project_dir), from_, to_)
+        else:
+            self.fhsi_chart_data = read_bars(from_, to_)
         if self.fhsi_chart_data.empty:
             return
 
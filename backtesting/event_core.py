@@ -0,0 +1,73 @@
+"""
+Array based building blocks of the backtest loop
+
+BarView: the bars converted once to NumPy arrays (and Python datetimes for 'time_key'),
+         strategies and the engine read a value of a bar in O(1) instead of indexing a pandas Series
+FillBuffer: trade journal in preallocated arrays, growing by doubling, converted to a dataframe on demand
+"""
+import numpy as np
+import pandas as pd
+
+
+class BarView:
+    columns = ('open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, df: pd.DataFrame):
+        """
+        :param df: dataframe (columns: 'time_key' 'open' 'high' 'low' 'close' 'volume'), with default RangeIndex
+        """
+        self.length = len(df)
+        self.time_key = df['time_key'].to_numpy(dtype='datetime64[us]').tolist()  # list of dt.datetime
+        for col in self.columns:
+            setattr(self, col, df[col].to_numpy())
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, col: str):
+        return getattr(self, col)
+
+
+class FillBuffer:
+    columns = ('time_key', 'side', 'qty', 'price', 'remark')
+
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self._time_key = np.empty(capacity, dtype='datetime64[ns]')
+        self._side = np.empty(capacity, dtype=object)
+        self._qty = np.empty(capacity, dtype='int64')
+        self._price = np.empty(capacity, dtype='float64')
+        self._remark = np.empty(capacity, dtype=object)
+        self._frame = None
+
+    def __len__(self):
+        return self.size
+
+    def append(self, time_key, side: str, qty: int, price: float, remark: str):
+        if self.size == len(self._qty):
+            self._grow()
+
+        i = self.size
+        self._time_key[i] = np.datetime64(time_key, 'ns')
+        self._side[i] = side
+        self._qty[i] = qty
+        self._price[i] = price
+        self._remark[i] = remark
+        self.size += 1
+        self._frame = None
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        return the fills as trade journal (columns: 'time_key' 'side' 'qty' 'price' 'remark')
+        """
+        if self._frame is None:
+            self._frame = pd.DataFrame({col: getattr(self, f'_{col}')[:self.size].copy() for col in self.columns})
+
+        return self._frame.copy()
+
+    def _grow(self):
+        for col in self.columns:
+            values = getattr(self, f'_{col}')
+            grown = np.empty(len(values) * 2, dtype=values.dtype)
+            grown[:len(values)] = values
+            setattr(self, f'_{col}', grown)
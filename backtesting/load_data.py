@@ -1,90 +1,208 @@
 import datetime as dt
+import numpy as np
 import pandas as pd
 import os
 
-
-def load(project_dir: os.path):
+import bar_store
+from library.contract_info import get_rollover_date
+
+# define month symbols
+SYMBOL_FOR_MONTH = {
+    'F': 1,
+    'G': 2,
+    'H': 3,
+    'J': 4,
+    'K': 5,
+    'M': 6,
+    'N': 7,
+    'Q': 8,
+    'U': 9,
+    'V': 10,
+    'X': 11,
+    'Z': 12
+}
+
+
+def load(project_dir: os.path, rollover_days: int = 2, incremental: bool = False):
     """
     combine individual file which contains:
       'Date', 'Time', 'Open', 'High', 'Low', 'Close', 'Volume'
-    and save it to database
+    and save it to the bar store
+    :param project_dir: project directory
+    :param rollover_days: switch to the next contract at the day session of the trading day which is
+                          'rollover_days' trading days before expiry (0: on the expiry date)
+    :param incremental: only read the contract files which are new or changed since the last load,
+                        and rewrite the store from the end of the last unchanged contract
     """
     # define paths
     db_dir = os.path.join(project_dir, 'database', 'fhsi_m1')
+    store_dir = bar_store.get_store_dir(project_dir)
+
+    # find the first contract file which is not in the store yet
+    contracts = list_contract_files(db_dir)
+    file_infos = [get_file_info(db_dir, contract) for contract in contracts]
+    ingested = get_ingested_contracts(store_dir, rollover_days) if incremental else []
+    first_new = 0
+    while first_new < min(len(ingested), len(contracts)) and \
+            all(ingested[first_new].get(k) == v for k, v in file_infos[first_new].items()):
+        first_new += 1
+
+    if first_new == len(contracts) == len(ingested):
+        print("Bar store is up to date.")
+        return
+    elif first_new == len(contracts):
+        # some files were removed, rebuild everything
+        first_new = 0
+
+    # the last unchanged contract is no longer the latest one, it ends at its rollover date
+    start = None
+    if first_new:
+        previous = ingested[first_new - 1]
+        if previous['last'] is None:
+            # empty file: no end either if no earlier file has bars, then the store is rewritten from the first bar
+            start = None if previous['end'] is None else pd.Timestamp(previous['end'])
+        else:
+            end = get_contract_end(previous['year'], previous['month'], pd.Timestamp(previous['last']),
+                                   rollover_days, is_last=False)
+            start = max(pd.Timestamp(previous['start']), end)
+        previous['end'] = start
+
+    # read new contract files only
+    new_contracts = contracts[first_new:]
+    frames = [read_contract_file(os.path.join(db_dir, file)) for year, month, file in new_contracts]
+    print(f"Splicing {len(new_contracts)} contract file(s) into the bar store.")
+
+    # cut every contract to its own window and combine data in one go
+    windows = get_contract_windows(new_contracts, frames, rollover_days, start=start)
+    if all(df.empty for df in frames):
+        raise ValueError(f"No bars in the contract files {[file for year, month, file in new_contracts]}.")
+    df_full = pd.concat(
+        [df[(df['Date'] >= start_) & (df['Date'] < end_)] for df, (start_, end_) in zip(frames, windows) if not df.empty],
+        axis=0,
+        ignore_index=True
+    )
+
+    # save to database
+    bar_store.write(store_dir, df_full, replace_from=start)
+
+    # remember the files and date ranges in the store
+    records = ingested[:first_new]
+    for file_info, df, (start_, end_) in zip(file_infos[first_new:], frames, windows):
+        file_info['first'] = None if df.empty else df['Date'].iloc[0]
+        file_info['last'] = None if df.empty else df['Date'].iloc[-1]
+        file_info['start'], file_info['end'] = start_, end_
+        records.append(file_info)
+    bar_store.write_manifest(store_dir, {'rollover_days': rollover_days,
+                                         'updated': dt.datetime.now(),
+                                         'contracts': records})
 
-    # create empty dataframe
-    df_full = pd.DataFrame(columns=['Date', 'Time', 'Open', 'High', 'Low', 'Close', 'TotalVolume'])
-
-    # define month symbols
-    symbol_for_month = {
-        'F': 1,
-        'G': 2,
-        'H': 3,
-        'J': 4,
-        'K': 5,
-        'M': 6,
-        'N': 7,
-        'Q': 8,
-        'U': 9,
-        'V': 10,
-        'X': 11,
-        'Z': 12
-    }
-
-    # list all files in db_dir
-    files = os.listdir(db_dir)
-
-    file_list = dict()  # key: contract_year_month, value: file_name
-    for file in files:
+
+def list_contract_files(db_dir: os.path) -> list:
+    """
+    return contract files sorted by contract month
+    :param db_dir: directory of the exported files, e.g. 'HSIF0-Interactive Brokers-HKFE-Futures-Minute-Trade.csv'
+    :return: [(year, month, file_name), ...]
+    """
+    contracts = []
+    for file in os.listdir(db_dir):
         # filter out non-csv files
         if os.path.splitext(file)[1] != '.csv':
             continue
 
         # identify year and month from file name
         year = int(file[4])
-        month = symbol_for_month.get(file[3])
+        month = SYMBOL_FOR_MONTH.get(file[3])
         this_year = int(str(dt.datetime.now().year)[-1])  # only concern last digit
         year += 2020 if 0 <= year <= this_year else + 2010
+        contracts.append((year, month, file))
+
+    return sorted(contracts)
 
-        # assign key, value to dictionary
-        year_month = str(year).zfill(4) + str(month).zfill(2)
-        file_list[year_month] = file
 
-    # get sorted item(date) from dictionary
-    sorted_date = sorted(file_list)
+def get_file_info(db_dir: os.path, contract: tuple) -> dict:
+    """
+    identify a contract file by its name, size and modification time
+    """
+    year, month, file = contract
+    stat = os.stat(os.path.join(db_dir, file))
 
-    # combine data (initialize rollover date first)
-    rollover_date = dt.datetime.strptime('01/01/2019 09:15:00', '%d/%m/%Y %H:%M:%S')
-    for date in sorted_date:
-        # read file
-        path = os.path.join(db_dir, file_list.get(date))
-        df = pd.read_csv(path)
+    return {'year': year, 'month': month, 'file': file, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
 
-        # remove data before 'rollover_date'
-        df['datetime'] = df.apply(
-            lambda row: dt.datetime.strptime(f"{row['Date']} {row['Time']}", '%d/%m/%Y %H:%M:%S'),
-            axis=1
-        )
-        df = df[(df['datetime'] > rollover_date)]
 
-        # update 'rollover_date'
-        rollover_date = df['datetime'].iloc[-1]
+def get_ingested_contracts(store_dir: os.path, rollover_days: int) -> list:
+    """
+    return the contract records saved by the last load,
+    empty if the store was built with another rollover setting
+    """
+    manifest = bar_store.read_manifest(store_dir)
+    if manifest.get('rollover_days') != rollover_days:
+        return []
 
-        # drop column
-        df.drop(columns='datetime', inplace=True)
+    return manifest.get('contracts', [])
 
-        # combine data
-        df_full = pd.concat([df_full, df], axis=0)
 
-    # formatting data
-    df_full['x_axis'] = df_full.apply(
-        lambda row: dt.datetime.strptime(f'{row["Date"]} {row["Time"]}', '%d/%m/%Y %H:%M:%S'),
-        axis=1
-    )
-    df_full = df_full[['x_axis', 'Open', 'High', 'Low', 'Close', 'TotalVolume']]
-    df_full.rename(columns={'x_axis': 'Date',
-                            'TotalVolume': 'Volume'},
-                   inplace=True)
+def read_contract_file(path: os.path) -> pd.DataFrame:
+    """
+    read a file exported from MultiCharts
+    :return: dataframe (columns: 'Date' 'Open' 'High' 'Low' 'Close' 'Volume')
+    """
+    df = pd.read_csv(path, dtype={'Date': str, 'Time': str})
+    df['Date'] = parse_datetime(df['Date'], df['Time'])
+    df = df[['Date', 'Open', 'High', 'Low', 'Close', 'TotalVolume']].rename(columns={'TotalVolume': 'Volume'})
 
-    # save to database
-    df_full.to_csv(os.path.join(db_dir, 'full_data', 'full_data.csv'))
+    return df.sort_values('Date', kind='stable', ignore_index=True)
+
+
+def parse_datetime(date_: pd.Series, time_: pd.Series) -> np.ndarray:
+    """
+    vectorized parsing of 'dd/mm/yyyy' and 'HH:MM:SS' columns
+    each distinct date and time string is parsed only once, then mapped back to the rows
+    """
+    date_codes, dates = pd.factorize(date_)
+    time_codes, times = pd.factorize(time_)
+
+    return pd.to_datetime(dates, format='%d/%m/%Y').to_numpy()[date_codes] + pd.to_timedelta(times).to_numpy()[time_codes]
+
+
+def get_contract_windows(contracts: list, frames: list, rollover_days: int,
+                         start: dt.datetime = None) -> list:
+    """
+    define the period [start, end) taken from each contract for the continuous series
+    the contract is used until the rollover date (day session open), or until its last bar if the file ends earlier
+    :param contracts: [(year, month, file_name), ...] sorted by contract month
+    :param frames: dataframes of the contracts
+    :param rollover_days: number of trading days before expiry to switch to the next contract
+    :param start: start datetime of the first contract, default its first bar
+    :return: [(start, end), ...]
+    """
+    windows = []
+    for i, ((year, month, file), df) in enumerate(zip(contracts, frames)):
+        if df.empty:
+            windows.append((start, start))
+            continue
+
+        # start from the end of the previous contract
+        if start is None:
+            start = df['Date'].iloc[0]
+
+        # end at the rollover date or at the end of data, the last contract runs to the end of data
+        end = get_contract_end(year, month, df['Date'].iloc[-1], rollover_days, is_last=i == len(contracts) - 1)
+        end = max(start, end)
+
+        windows.append((start, end))
+        start = end
+
+    return windows
+
+
+def get_contract_end(year: int, month: int, last_bar: dt.datetime, rollover_days: int, is_last: bool) -> dt.datetime:
+    """
+    return the (exclusive) end of a contract's window:
+    the day session open of the rollover date, or right after its last bar if the data ends earlier
+    """
+    end = last_bar + dt.timedelta(minutes=1)
+    if not is_last:
+        rollover_time = dt.datetime.combine(get_rollover_date(year, month, rollover_days), dt.time(9, 15))
+        end = min(end, rollover_time)
+
+    return end
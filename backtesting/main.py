@@ -7,9 +7,15 @@ import time
 from typing import Type
 
 from algorithm.template import AlgoTemplate
-from algorithm.mal_ready import MAL
+from library import ta
+from library.ta_cache import IndicatorCache
+import bar_store
 import charts
+import event_core
 import load_data
+import scheduler
+import shared_data
+import vector_engine
 
 
 class BackTestEngine:
@@ -19,28 +25,58 @@ class BackTestEngine:
                  data: pd.DataFrame,
                  symbol: str = 'HK.HSImain',
                  start_date: dt.datetime = dt.datetime(2010, 1, 1),
-                 end_date: dt.datetime = dt.datetime.now()):
+                 end_date: dt.datetime = dt.datetime.now(),
+                 kline_daily: pd.DataFrame = None,
+                 warmup_bars: int = 500,
+                 initial_state: dict = None,
+                 vectorized: bool = False,
+                 fees: float = None,
+                 slippage: float = None,
+                 point_value: int = None,
+                 strategy_params: dict = None,
+                 indicators: dict = None):
         """
         perform backtesting, generate report
         :param strategy: AlgoTemplate class
-        :param data: dataframe (columns: 'Date' 'Open' 'High' 'Low' 'Close' 'Volume')
+        :param data: dataframe (columns: 'Date' 'Open' 'High' 'Low' 'Close' 'Volume'),
+                     may include warm-up bars before start_date and bars after end_date
         :param symbol: trading symbol/ code
         :param start_date:
         :param end_date:
+        :param kline_daily: daily kline loaded by the parent process, read from database if None
+        :param warmup_bars: minimum number of bars used for indicators only before the first traded bar
+        :param initial_state: position carried from the previous period (AlgoTemplate.get_position_state)
+        :param vectorized: derive orders from signal arrays if the strategy supports it (AlgoTemplate.generate_signals),
+                           otherwise check conditions bar by bar
+        :param fees: commission per contract in money, default FEES
+        :param slippage: slippage per contract in money, default SLIPPAGE
+        :param point_value: point value of contract, default POINT_VALUE
+        :param strategy_params: strategy attributes overriding the defaults, e.g. {'max_contract': 2}
+        :param indicators: strategy attributes set by apply_indicators in a run with the same indicator params
+                           (BackTestEngine.indicators), apply_indicators is skipped if given
         """
         self.engine = 'backtest'
         self.strategy = strategy(self, symbol)
-        self.strategy.kline_daily = pd.read_csv(
-            os.path.join(PROJECT_DIR, 'database', 'fhsi_daily_kline.csv'),
-            index_col=0
-        )
+        if kline_daily is None:
+            kline_daily = read_kline_daily()
+        self.strategy.kline_daily = kline_daily
+        for param, value in (strategy_params or {}).items():
+            setattr(self.strategy, param, value)
+        if initial_state:
+            self.strategy.set_position_state(initial_state)
+        self.warmup_bars = warmup_bars
+        self.vectorized = vectorized
         self.chart = chart
         self.data = data
-        self.commission = FEES / POINT_VALUE  # in terms of point
-        self.slippage = SLIPPAGE / POINT_VALUE  # in terms of point
-        self.point_value = POINT_VALUE
+        fees = FEES if fees is None else fees
+        slippage = SLIPPAGE if slippage is None else slippage
+        self.point_value = POINT_VALUE if point_value is None else point_value
+        self.commission = fees / self.point_value  # in terms of point
+        self.slippage = slippage / self.point_value  # in terms of point
+        self.indicators = indicators
         self.backtest_data = pd.DataFrame()
-        self.df_trd_jrl = pd.DataFrame(columns=['time_key', 'side', 'qty', 'price', 'remark'])
+        self.fills = event_core.FillBuffer()
+        self.bars = None
         self.symbol = symbol
         self.start_date = start_date.replace(hour=9, minute=15)
         self.end_date = end_date.replace(hour=3, minute=0) + dt.timedelta(days=1)
@@ -48,110 +84,109 @@ class BackTestEngine:
     def start_testing_strategy(self):
         """
         start backtesting for the specified period (self.start_date to self.end_date)
-        1. apply indicators to the chart and visualize them
-        2. checking conditions bar by bar
+        1. apply indicators to the chart and visualize them (no chart if self.chart is None)
+        2. checking conditions bar by bar (or all bars at once if vectorized)
         :return: None
         """
-        # extract data from start_date to end_date
+        # bars before start_date are used to warm up the indicators
         data = self.data.copy()
         data['time_key'] = pd.to_datetime(data['time_key'])
-        data = data.loc[(data['time_key'] >= self.start_date) &
-                        (data['time_key'] <= self.end_date)]
 
-        # apply necessary indicators
+        # apply necessary indicators, or reuse the indicators of another run with the same indicator params
         data.reset_index(inplace=True)
-        self.strategy.apply_indicators(kline=data)
+        if self.indicators is None:
+            params = dict(self.strategy.__dict__)
+            self.strategy.apply_indicators(kline=data)
+            self.indicators = {key: value for key, value in self.strategy.__dict__.items()
+                               if key not in params or value is not params[key]}
+        else:
+            self.strategy.__dict__.update(self.indicators)
+
+        if self.chart is not None:
+            self.add_indicators_to_chart()
+
+        # start feeding data from start_date to end_date, keep the last bar for filling the order of the previous bar
+        self.backtest_data = data
+        self.bars = event_core.BarView(data)
+        self.strategy.bars = self.bars
+        first_bar = max(int(data['time_key'].searchsorted(self.start_date)), self.warmup_bars)
+        last_bar = min(int(data['time_key'].searchsorted(self.end_date, side='right')), data.shape[0] - 1)
+        if self.vectorized:
+            signals = self.strategy.generate_signals(data)
+            if signals is not None:
+                self.fire_signals(signals, first_bar, last_bar)
+                return
+
+        for i in range(first_bar, last_bar, 1):
+            self.strategy.update_kline(kline='foo', index=i)
 
+    def add_indicators_to_chart(self):
+        """
+        visualize the indicators of the strategy on self.chart, the ones which the strategy does not have are skipped
+        :return: None
+        """
         # add ema_fast to the chart
-        x_data = self.strategy.ema_fast.index
-        y_data = self.strategy.ema_fast.tolist()
-        self.chart.add_ta(x_data=x_data, y_data=y_data, name='EMA Fast', width=1, type_='solid', color='red')
+        if hasattr(self.strategy, 'ema_fast'):
+            x_data = self.strategy.ema_fast.index
+            y_data = self.strategy.ema_fast.tolist()
+            self.chart.add_ta(x_data=x_data, y_data=y_data, name='EMA Fast', width=1, type_='solid', color='red')
 
         # add ema_slow to the chart
-        x_data = self.strategy.ema_slow.index
-        y_data = self.strategy.ema_slow.tolist()
-        self.chart.add_ta(x_data=x_data, y_data=y_data, name='EMA Slow', width=1, type_='solid', color='green')
+        if hasattr(self.strategy, 'ema_slow'):
+            x_data = self.strategy.ema_slow.index
+            y_data = self.strategy.ema_slow.tolist()
+            self.chart.add_ta(x_data=x_data, y_data=y_data, name='EMA Slow', width=1, type_='solid', color='green')
 
         # add bollinger bands to the chart
-        x_data = self.strategy.bb_top.index
-        y_data_top = self.strategy.bb_top.tolist()
-        y_data_bot = self.strategy.bb_bot.tolist()
-        y_data_mid = self.strategy.bb_mid.tolist()
-        self.chart.add_ta(x_data=x_data, y_data=y_data_top, name='BBands', width=1, type_='dashed', color='grey')
-        self.chart.add_ta(x_data=x_data, y_data=y_data_bot, name='BBands', width=1, type_='dashed', color='grey')
-        self.chart.add_ta(x_data=x_data, y_data=y_data_mid, name='BBands', width=1, type_='dashed', color='grey')
+        if hasattr(self.strategy, 'bb_top'):
+            x_data = self.strategy.bb_top.index
+            y_data_top = self.strategy.bb_top.tolist()
+            y_data_bot = self.strategy.bb_bot.tolist()
+            y_data_mid = self.strategy.bb_mid.tolist()
+            self.chart.add_ta(x_data=x_data, y_data=y_data_top, name='BBands', width=1, type_='dashed', color='grey')
+            self.chart.add_ta(x_data=x_data, y_data=y_data_bot, name='BBands', width=1, type_='dashed', color='grey')
+            self.chart.add_ta(x_data=x_data, y_data=y_data_mid, name='BBands', width=1, type_='dashed', color='grey')
 
         # add adx
-        x_data = self.data['time_key'].tolist()
-        y_data = self.strategy.adx.tolist()
-        self.chart.add_ta(x_data=x_data, y_data=y_data, name='ADX', width=1, type_='solid', color='black', is_subchart=True)
+        if hasattr(self.strategy, 'adx'):
+            x_data = self.data['time_key'].tolist()
+            y_data = self.strategy.adx.tolist()
+            self.chart.add_ta(x_data=x_data, y_data=y_data, name='ADX', width=1, type_='solid', color='black',
+                              is_subchart=True)
 
-        # start feeding data
-        self.backtest_data = data
-        for i in range(500, self.backtest_data.shape[0], 1):
-            self.strategy.update_kline(kline='foo', index=i)
+    def fire_signals(self, signals: dict, first_bar: int, last_bar: int) -> None:
+        """
+        place the orders derived from signal arrays
+        :param signals: boolean arrays (keys: 'long_entry' 'long_exit' 'short_entry' 'short_exit')
+        :param first_bar: index of the first bar to be checked
+        :param last_bar: index after the last bar to be checked
+        :return: None
+        """
+        time_key = self.backtest_data['time_key']
+        orders = vector_engine.get_orders(signals,
+                                          can_open_order=self.strategy.get_open_order_mask(time_key),
+                                          is_timeout=self.strategy.get_timeout_mask(time_key),
+                                          first_bar=first_bar,
+                                          last_bar=last_bar,
+                                          position=int(np.sign(self.strategy.inv_algo)))
+        for index, signal in orders:
+            if signal in ('LE', 'SE'):
+                side = 'BUY' if signal == 'LE' else 'SELL'
+                qty = self.strategy.exec_set
+            else:
+                side = 'SELL' if signal.startswith('LX') else 'BUY'
+                qty = abs(self.strategy.inv_algo)
+            self.strategy.place_order(side=side, qty=qty, remark=signal, index=index)
 
-    def get_monthly_report(self):
+    @property
+    def df_trd_jrl(self) -> pd.DataFrame:
+        """
+        trade journal (columns: 'time_key' 'side' 'qty' 'price' 'remark')
+        """
+        return self.fills.to_frame()
 
-        def write_to_report(df: pd.DataFrame, pnl: int, trd_qty: int) -> None:
-            """
-            write value to the last row of original dataframe
-            :param df: report dataframe
-            :param pnl: profit/loss in point
-            :param trd_qty: traded quantity
-            :return: None
-            """
-            i = df.index[-1]
-            df.loc[i, 'Profit/Loss'] = int(pnl*self.point_value - (self.slippage + self.commission)*trd_qty*self.point_value)
-            df.loc[i, 'Traded Qty'] = trd_qty
-            df.loc[i, 'Commission'] = int(self.commission*trd_qty*self.point_value)
-            df.loc[i, 'Slippage'] = self.slippage*trd_qty*self.point_value
-
-        def processing(df: pd.DataFrame) -> pd.DataFrame:
-            """
-            generate report (Period, Profit/Loss, Traded Qty, Commission, Slippage)
-            on original dataframe
-            :param df: trade journal
-            :return: report
-            """
-            # initialize variables
-            if df.empty:
-                return df
-
-            curr_month = df.at[0, 'time_key'].month
-            pnl = trd_qty = 0
-            new_row = {'Period': 0, 'Profit/Loss': 0, 'Traded Qty': 0, 'Commission': 0, 'Slippage': 0}
-            df_report = pd.DataFrame(columns=new_row.keys())
-            df_report.loc[len(df_report)] = new_row
-            df_report['Period'].iloc[-1] = dt.datetime.strftime(df.at[0, 'time_key'], '%Y-%b')
-
-            # generating report
-            for i, row in df.iterrows():
-                # new month
-                if row['time_key'].month != curr_month and row['time_key'].hour > 3:
-                    curr_month = row['time_key'].month
-                    write_to_report(df_report, pnl, trd_qty)
-                    df_report.loc[len(df_report)] = new_row  # add new row
-                    df_report.loc[df_report.index[-1], 'Period'] = dt.datetime.strftime(df.at[i, 'time_key'], '%Y-%b')
-                    pnl = trd_qty = 0
-
-                # sum up
-                pnl += row['cost_price']
-                trd_qty += row['qty']
-
-            # finish, add last month
-            write_to_report(df_report, pnl, trd_qty)
-
-            return df_report
-
-        # initialize dataframe
-        df = self.df_trd_jrl.copy()
-        df['cost_price'] = df.apply(
-            lambda row: row['price']*row['qty'] if row['side'] == 'SELL' else row['price']*row['qty']*-1,
-            axis=1
-        )
-
-        return processing(df)
+    def get_monthly_report(self):
+        return get_monthly_report(self.df_trd_jrl, self.commission, self.slippage, self.point_value)
 
     def add_trades_to_chart(self, chart):
         """
@@ -196,13 +231,82 @@ class BackTestEngine:
         :param index: current index of the kline, used to identify 'time_key', only used for backtesting
         :return: None
         """
-        time_key = self.backtest_data['time_key'].iloc[index + 1]
-        price = self.backtest_data['open'].iloc[index + 1]
+        time_key = self.bars.time_key[index + 1]
+        price = self.bars.open[index + 1]
         self.strategy.update_backtest_params(side=side, qty=qty, price=price)
 
         # update trade journal
-        new_row = {'time_key': time_key, 'side': side, 'qty': qty, 'price': price, 'remark': remark}
-        self.df_trd_jrl.loc[len(self.df_trd_jrl)] = new_row
+        self.fills.append(time_key, side, qty, price, remark)
+
+
+def get_monthly_report(trades: pd.DataFrame, commission: float, slippage: float, point_value: int) -> pd.DataFrame:
+    """
+    generate monthly report from trade journal
+    :param trades: trade journal (columns: 'time_key' 'side' 'qty' 'price' 'remark')
+    :param commission: commission per contract, in point
+    :param slippage: slippage per contract, in point
+    :param point_value: point value of contract
+    :return: report
+    """
+    def write_to_report(df: pd.DataFrame, pnl: int, trd_qty: int) -> None:
+        """
+        write value to the last row of original dataframe
+        :param df: report dataframe
+        :param pnl: profit/loss in point
+        :param trd_qty: traded quantity
+        :return: None
+        """
+        i = df.index[-1]
+        df.loc[i, 'Profit/Loss'] = int(pnl*point_value - (slippage + commission)*trd_qty*point_value)
+        df.loc[i, 'Traded Qty'] = trd_qty
+        df.loc[i, 'Commission'] = int(commission*trd_qty*point_value)
+        df.loc[i, 'Slippage'] = slippage*trd_qty*point_value
+
+    def processing(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        generate report (Period, Profit/Loss, Traded Qty, Commission, Slippage)
+        on original dataframe
+        :param df: trade journal
+        :return: report
+        """
+        # initialize variables
+        if df.empty:
+            return df
+
+        curr_month = df.at[0, 'time_key'].month
+        pnl = trd_qty = 0
+        new_row = {'Period': 0, 'Profit/Loss': 0, 'Traded Qty': 0, 'Commission': 0, 'Slippage': 0}
+        df_report = pd.DataFrame(columns=new_row.keys())
+        df_report.loc[len(df_report)] = new_row
+        df_report['Period'].iloc[-1] = dt.datetime.strftime(df.at[0, 'time_key'], '%Y-%b')
+
+        # generating report
+        for i, row in df.iterrows():
+            # new month
+            if row['time_key'].month != curr_month and row['time_key'].hour > 3:
+                curr_month = row['time_key'].month
+                write_to_report(df_report, pnl, trd_qty)
+                df_report.loc[len(df_report)] = new_row  # add new row
+                df_report.loc[df_report.index[-1], 'Period'] = dt.datetime.strftime(df.at[i, 'time_key'], '%Y-%b')
+                pnl = trd_qty = 0
+
+            # sum up
+            pnl += row['cost_price']
+            trd_qty += row['qty']
+
+        # finish, add last month
+        write_to_report(df_report, pnl, trd_qty)
+
+        return df_report
+
+    # initialize dataframe
+    df = trades.copy()
+    df['cost_price'] = df.apply(
+        lambda row: row['price']*row['qty'] if row['side'] == 'SELL' else row['price']*row['qty']*-1,
+        axis=1
+    )
+
+    return processing(df)
 
 
 def delete_reports():
@@ -214,30 +318,72 @@ def delete_reports():
         os.remove(os.path.join(directory, file))
 
 
-def start_backtesting(start_date: dt.datetime, end_date: dt.datetime):
-    # get cpus
-    nos_of_cpu = mp.cpu_count()
-    days_per_cpu = (end_date - start_date).days // nos_of_cpu
+def read_kline_daily() -> pd.DataFrame:
+    return pd.read_csv(os.path.join(PROJECT_DIR, 'database', 'fhsi_daily_kline.csv'), index_col=0)
 
-    # assign backtest period to cpus
-    for cpu in range(nos_of_cpu):
-        start_period = start_date + dt.timedelta(days=cpu*days_per_cpu)
-        if cpu == range(nos_of_cpu)[-1]:
-            end_period = end_date
-        else:
-            end_period = start_period + dt.timedelta(days=days_per_cpu - 1)
-        process = mp.Process(target=backtest, args=[MAL, start_period, end_period])
-        PROCESS.append(process)
-        process.start()
 
+def load_shared_data(start_date: dt.datetime, end_date: dt.datetime) -> (shared_data.SharedFrame, pd.DataFrame):
+    """
+    load data once (including warm-up data), all processes attach to the same memory
+    :return: shared bars (to be unlinked after all processes finished), daily kline
+    """
+    shared_bars = shared_data.SharedFrame(
+        bar_store.read(bar_store.get_store_dir(PROJECT_DIR),
+                       start_date - dt.timedelta(days=WARMUP_DAYS),
+                       end_date + dt.timedelta(days=2))
+    )
+
+    return shared_bars, read_kline_daily()
+
+
+def get_indicator_cache(project_dir: os.path, max_bytes: int, disk_max_bytes: int) -> IndicatorCache:
+    """
+    indicator results are keyed by the version of the bar store, runs over the same bars reuse them from disk
+    """
+    updated = bar_store.read_manifest(bar_store.get_store_dir(project_dir)).get('updated')
+    return IndicatorCache(max_bytes=max_bytes, disk_dir=os.path.join(project_dir, 'database', 'indicator_cache'),
+                          disk_max_bytes=disk_max_bytes, source=('HK.HSImain', updated) if updated else None)
+
+
+def init_worker(shared_bars: shared_data.SharedFrame, kline_daily: pd.DataFrame):
+    """
+    runs once in every pool process, the shared data is kept for all tasks of the process
+    """
+    WORKER_DATA['shared_bars'] = shared_bars
+    WORKER_DATA['kline_daily'] = kline_daily
+
+
+def start_backtesting(pool: mp.Pool, start_date: dt.datetime, end_date: dt.datetime) -> (list, iter):
+    """
+    split the period into monthly tasks, idle processes of the pool take the next task
+    :return: periods, results (iterator in the order of periods, blocking until the result is ready)
+    """
+    periods = scheduler.split_months(start_date, end_date)
+
+    return periods, pool.imap(backtest, periods, chunksize=1)
 
-def backtest(strategy: MAL, data_from: dt.datetime, data_to: dt.datetime):
+
+def backtest(period: tuple, initial_state: dict = None) -> dict:
+    data_from, data_to = period
+    return run_backtest(MAL, data_from, data_to, WORKER_DATA['shared_bars'], WORKER_DATA['kline_daily'],
+                        initial_state=initial_state)
+
+
+def run_backtest(strategy: Type[AlgoTemplate], data_from: dt.datetime, data_to: dt.datetime,
+                 shared_bars: shared_data.SharedFrame, kline_daily: pd.DataFrame, initial_state: dict = None) -> dict:
+    """
+    backtest one period
+    :param initial_state: position carried from the previous period, start without position if None
+    :return: dict (keys: 'trades', 'start_state', 'end_state')
+    """
     print(f"Backtesting {strategy.name} from {data_from.strftime('%Y-%m-%d')} to {data_to.strftime('%Y-%m-%d')}")
+    result = {'trades': pd.DataFrame(), 'start_state': initial_state, 'end_state': initial_state}
 
-    # build candlestick
-    chart = charts.CandleStick(project_dir=PROJECT_DIR, from_=data_from, to_=data_to)
+    # build candlestick, with warm-up bars before the period and one bar after the period for the last order
+    chart = charts.CandleStick(project_dir=PROJECT_DIR, from_=data_from, to_=data_to,
+                               read_bars=lambda from_, to_: shared_bars.read(from_, to_, before=WARMUP_BARS, after=1))
     if chart.fhsi_chart_data.empty:
-        return
+        return result
 
     # start backtesting
     data = chart.get_chart_data()
@@ -248,63 +394,80 @@ def backtest(strategy: MAL, data_from: dt.datetime, data_to: dt.datetime):
             'Close': 'close',
             'Volume': 'volume'}
     data = data.rename(columns=cols)  # match column names to ibapi
-    back_test = BackTestEngine(strategy=strategy, chart=chart, data=data, start_date=data_from, end_date=data_to)
+    back_test = BackTestEngine(strategy=strategy, chart=chart, data=data, start_date=data_from, end_date=data_to,
+                               kline_daily=kline_daily, warmup_bars=WARMUP_BARS, initial_state=initial_state,
+                               vectorized=VECTORIZED)
+    result['start_state'] = back_test.strategy.get_position_state()
     back_test.start_testing_strategy()
     back_test.add_trades_to_chart(chart)
 
-    # output report, trades and chart
-    REPORT_QUEUE.put(back_test.get_monthly_report())
-    TRADES_QUEUE.put(back_test.df_trd_jrl.copy())
+    # output trades and chart
+    result['trades'] = back_test.df_trd_jrl.copy()
+    result['end_state'] = back_test.strategy.get_position_state()
     chart.export_chart(
         file_name=f'backtest_{back_test.strategy.name}_{data_from.strftime("%y%m")}_to_{data_to.strftime("%y%m")}.html')
 
     print(f"Backtesting {strategy.name} from {data_from.strftime('%Y-%m-%d')} to {data_to.strftime('%Y-%m-%d')} finished.")
+    return result
 
 
-def get_backtest_result() -> (pd.DataFrame, pd.DataFrame):
+def get_backtest_result(pool: mp.Pool, periods: list, results: iter) -> (pd.DataFrame, pd.DataFrame):
     """
-    get trades and report from multiprocessing
+    get trades and report from multiprocessing,
+    periods which should have started with the open position of the previous period are backtested again in the pool
+    :param results: results of the periods from the pool (start_backtesting)
     :return: trades, report
     """
-    trades, report = pd.DataFrame(), pd.DataFrame()
-    trade_count = report_count = 0
-
-    # get trades and report from QUEUE
-    while True:
-        if TRADES_QUEUE.qsize() != 0:
-            trades = pd.concat([trades, TRADES_QUEUE.get()], axis=0, ignore_index=True)
-            trade_count += 1
-        if REPORT_QUEUE.qsize() != 0:
-            report = pd.concat([report, REPORT_QUEUE.get()], axis=0, ignore_index=True)
-            report_count += 1
-        if trade_count == report_count == mp.cpu_count():
-            break
-
-    # wait for all processes finished
-    report = report.groupby(['Period'], as_index=False).sum()
-    [proc.join() for proc in PROCESS]
+    # carry positions across periods, results are taken as soon as they are ready
+    results = scheduler.stitch(
+        results,
+        rerun=lambda chunk, state: pool.apply(backtest, (periods[chunk], state))
+    )
+    trades = pd.concat([result['trades'] for result in results], axis=0, ignore_index=True)
+
+    # generate report from the whole trade journal, months are not split by periods
+    report = get_monthly_report(trades, FEES / POINT_VALUE, SLIPPAGE / POINT_VALUE, POINT_VALUE)
 
     # sort data
     trades.sort_values('time_key', inplace=True, ignore_index=True)
+
+    return trades, sort_monthly_report(report)
+
+
+def sort_monthly_report(report: pd.DataFrame) -> pd.DataFrame:
+    """
+    one row per month in time order, add row 'Total'
+    :param report: report from get_monthly_report
+    :return: report
+    """
+    report = report.groupby(['Period'], as_index=False).sum()
     report['sort_value'] = report.apply(lambda col: dt.datetime.strptime(col['Period'], '%Y-%b'), axis=1)
     report.sort_values('sort_value', inplace=True, ignore_index=True)
     # report.drop(columns=['sort_value'], inplace=True)
-    report.drop(columns=['sort_value', 'time_key', 'side', 'qty', 'price', 'remark', 'cost_price'], inplace=True)
+    report.drop(columns=['sort_value', 'time_key', 'side', 'qty', 'price', 'remark', 'cost_price'], inplace=True,
+                errors='ignore')
     report.loc['Total'] = report.sum(numeric_only=True)
 
-    return trades, report
+    return report
 
 
-def generate_detail_report(path_: os.path) -> pd.DataFrame | type:
+def generate_detail_report(path_: os.path, fees: float = None, slippage: float = None,
+                           point_value: int = None) -> pd.DataFrame | type:
     """
     generate detail report with equity curve
     :param path_: path of trades history in csv format
+    :param fees: commission per contract in money, default FEES
+    :param slippage: slippage per contract in money, default SLIPPAGE
+    :param point_value: point value of contract, default POINT_VALUE
     :return: detail report
     """
     # configure params
+    fees = FEES if fees is None else fees
+    slippage = SLIPPAGE if slippage is None else slippage
+    point_value = POINT_VALUE if point_value is None else point_value
     df = pd.read_csv(path_, index_col=[0])
-    df['fees'] = df['qty'] * FEES
-    df['slippage'] = df['qty'] * SLIPPAGE
+    df['fees'] = df['qty'] * fees
+    df['slippage'] = df['qty'] * slippage
     df['cost_price'] = (df['price'] * df['qty']).where(df['side'] == 'SELL', df['price'] * -df['qty'])
 
     # calculate profit/loss
@@ -312,7 +475,7 @@ def generate_detail_report(path_: os.path) -> pd.DataFrame | type:
     df['accu_pnl'] = 0
     pnl = accu_pnl = 0
     for i, row in df.iterrows():
-        amount = row['cost_price'] * POINT_VALUE - row['slippage'] - row['fees']
+        amount = row['cost_price'] * point_value - row['slippage'] - row['fees']
         accu_pnl += amount
         if row['side'] == 'SELL':
             pnl += amount
@@ -443,29 +606,42 @@ if __name__ == '__main__':
     start_ = time.time()
 
     # configure params
+    from algorithm.mal_ready import MAL  # strategy to be backtested
+
     PROJECT_DIR = os.path.split(os.getcwd())[0]
     REPORT_DIR = os.path.join(PROJECT_DIR, 'backtesting', 'report')
     START_MONTH = dt.datetime(2019, 1, 1)
     END_MONTH = dt.datetime(2023, 7, 1) - dt.timedelta(days=1)
     FEES, SLIPPAGE, POINT_VALUE = 12, 30, 10
+    ROLLOVER_DAYS = 2  # switch to the next contract 2 trading days before expiry
+    WARMUP_BARS = 5000  # bars before each period for indicators, many times the longest EMA/ADX period (scheduler)
+    WARMUP_DAYS = 30  # calendar days loaded before START_MONTH, enough for WARMUP_BARS
+    VECTORIZED = False  # quick screening with signal arrays, strategies without generate_signals run bar by bar
     # FEES, SLIPPAGE, POINT_VALUE = 30, 20, 50
-    REPORT_QUEUE = mp.Queue()
-    TRADES_QUEUE = mp.Queue()
-    PROCESS = []
+    WORKERS = mp.cpu_count()  # number of backtest processes
+    WORKER_DATA = {}  # data shared by all tasks of a worker process, see init_worker
+    INDICATOR_CACHE = True  # reuse indicator results of previous runs over the same bars (library/ta_cache)
+    CACHE_MB, DISK_CACHE_MB = 256, 2048  # max size of the cache in memory (per process) and on disk
     is_load_data = False
+    is_incremental_load = True  # only splice new contract files into the bar store
     exec_backtest = True
 
     # start
     if is_load_data:
-        load_data.load(PROJECT_DIR)
+        load_data.load(PROJECT_DIR, rollover_days=ROLLOVER_DAYS, incremental=is_incremental_load)
 
     if exec_backtest:
         # start backtesting
         delete_reports()
-        start_backtesting(START_MONTH, END_MONTH)
-
-        # get result
-        trades, monthly_report = get_backtest_result()
+        if INDICATOR_CACHE:
+            ta.set_cache(get_indicator_cache(PROJECT_DIR, CACHE_MB * 1024 ** 2, DISK_CACHE_MB * 1024 ** 2))
+        shared_bars, kline_daily = load_shared_data(START_MONTH, END_MONTH)
+        with mp.Pool(WORKERS, initializer=init_worker, initargs=(shared_bars, kline_daily)) as pool:
+            periods, results = start_backtesting(pool, START_MONTH, END_MONTH)
+
+            # get result
+            trades, monthly_report = get_backtest_result(pool, periods, results)
+        shared_bars.unlink()
 
         # save to file
         trades.to_csv(os.path.join(REPORT_DIR, 'trade_history.csv'))
@@ -0,0 +1,82 @@
+"""
+Split a backtest period into chunks and stitch the chunk results together
+
+chunks are small (one month) so that a pool of workers stays busy until the last chunk is finished,
+every chunk is backtested independently, starting flat, with warm-up bars before the chunk for the indicators,
+afterwards the chunks are walked through in time order: a chunk which was started from a wrong position
+(the previous chunk ended with an open position) is backtested again with the position carried over
+
+the stitched trade journal equals the one of a single run only as far as the indicators have converged
+within the warm-up bars: an exponentially smoothed indicator (EMA, ADX) still carries (1 - alpha) ** warm-up bars
+of the bars before the warm-up, a rolling indicator only needs its window but may differ by floating point rounding,
+so a condition decided by less than that difference may flip
+"""
+import datetime as dt
+
+
+def split_period(start_date: dt.datetime, end_date: dt.datetime, nos_of_chunks: int) -> list:
+    """
+    split the period into chunks with equal number of days, the last chunk ends at 'end_date'
+    :return: [(start, end), ...]
+    """
+    nos_of_chunks = max(1, min(nos_of_chunks, (end_date - start_date).days))
+    days_per_chunk = (end_date - start_date).days // nos_of_chunks
+
+    periods = []
+    for chunk in range(nos_of_chunks):
+        start_period = start_date + dt.timedelta(days=chunk*days_per_chunk)
+        if chunk == nos_of_chunks - 1:
+            end_period = end_date
+        else:
+            end_period = start_period + dt.timedelta(days=days_per_chunk - 1)
+        periods.append((start_period, end_period))
+
+    return periods
+
+
+def split_months(start_date: dt.datetime, end_date: dt.datetime) -> list:
+    """
+    split the period into calendar months, the first and last chunk are cut at 'start_date' and 'end_date'
+    :return: [(start, end), ...]
+    """
+    periods = []
+    start_period = start_date
+    while start_period <= end_date:
+        next_month = (start_period.replace(day=1) + dt.timedelta(days=32)).replace(day=1)
+        end_period = min(next_month - dt.timedelta(days=1), end_date)
+        periods.append((start_period, end_period))
+        start_period = next_month
+
+    return periods
+
+
+def is_same_position(state_1: dict | None, state_2: dict | None) -> bool:
+    """
+    return True if a chunk started from 'state_1' gives the same result as started from 'state_2'
+    (None: a new strategy without position)
+    """
+    inventory_1 = state_1.get('inv_real', 0) if state_1 else 0
+    inventory_2 = state_2.get('inv_real', 0) if state_2 else 0
+    if inventory_1 == inventory_2 == 0:
+        return True
+
+    return state_1 == state_2
+
+
+def stitch(results: iter, rerun, initial_state: dict = None) -> list:
+    """
+    carry the position from one chunk to the next
+    :param results: chunk results in time order (list or iterator), dict with keys 'start_state', 'end_state', ...
+    :param rerun: function(chunk_index, state) returns the result of the chunk started from 'state'
+    :param initial_state: position at the beginning of the first chunk
+    :return: chunk results in time order
+    """
+    stitched = []
+    state = initial_state
+    for i, result in enumerate(results):
+        if not is_same_position(result['start_state'], state):
+            result = rerun(i, state)
+        stitched.append(result)
+        state = result['end_state']
+
+    return stitched
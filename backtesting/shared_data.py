@@ -0,0 +1,71 @@
+"""
+Share bar data between backtest processes
+
+the parent process copies the numeric columns into multiprocessing.shared_memory once,
+the SharedFrame object is then passed to the workers (only the block names are pickled)
+and every worker attaches to the same memory without copying the full history
+"""
+import datetime as dt
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+class SharedFrame:
+    def __init__(self, df: pd.DataFrame):
+        """
+        copy the columns of a dataframe into shared memory, 'Date' must be sorted
+        :param df: dataframe with numeric/ datetime columns (columns: 'Date' 'Open' 'High' 'Low' 'Close' 'Volume')
+        """
+        self.length = len(df)
+        self.columns = {}  # key: column, value: (shared memory name, dtype)
+        self._blocks = []
+
+        for col in df.columns:
+            values = df[col].to_numpy()
+            block = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+            self.columns[col] = (block.name, values.dtype.str)
+            self._blocks.append(block)
+
+    def __getstate__(self):
+        # only the names of the memory blocks are sent to the workers
+        return {'length': self.length, 'columns': self.columns}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._blocks = []
+
+    def read(self, from_: dt.datetime, to_: dt.datetime, before: int = 0, after: int = 0) -> pd.DataFrame:
+        """
+        return a copy of the bars between 'from_' and 'to_' (both inclusive), same as bar_store.read
+        :param before: number of extra bars before 'from_', e.g. warm-up bars for indicators
+        :param after: number of extra bars after 'to_'
+        """
+        blocks = [shared_memory.SharedMemory(name=name) for name, dtype in self.columns.values()]
+        try:
+            arrays = {col: np.ndarray((self.length,), dtype=np.dtype(dtype), buffer=block.buf)
+                      for (col, (name, dtype)), block in zip(self.columns.items(), blocks)}
+
+            # locate the period on the (zero-copy) date view, copy that slice only
+            dates = arrays['Date']
+            start = np.searchsorted(dates, np.datetime64(from_, 'ns'), side='left')
+            end = np.searchsorted(dates, np.datetime64(to_, 'ns'), side='right')
+            start, end = max(0, start - before), min(self.length, end + after)
+            df = pd.DataFrame({col: values[start:end].copy() for col, values in arrays.items()})
+            del arrays, dates
+        finally:
+            for block in blocks:
+                block.close()
+
+        return df
+
+    def unlink(self):
+        """
+        release the shared memory, called by the parent process after all workers finished
+        """
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
@@ -0,0 +1,265 @@
+"""
+Parameter sweep over strategy attributes and cost assumptions
+
+every combination of params is backtested over the same period on a pool of processes,
+the results are collected in one comparison table (one row per combination)
+  - combinations are grouped by the indicator params of the strategy (AlgoTemplate.indicator_params, if listed),
+    a task is a batch of combinations of one group: the indicators are applied once and reused by all runs
+    (BackTestEngine.indicators), a process keeps the indicators of its last group for the next task
+  - costs ('fees', 'slippage', 'point_value') do not change the trades,
+    combinations which only differ in costs are backtested once
+"""
+import datetime as dt
+import itertools
+import multiprocessing as mp
+import os
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+import bar_store
+import shared_data
+from library import ta
+from main import BackTestEngine, get_indicator_cache
+
+COST_PARAMS = ('fees', 'slippage', 'point_value')
+WORKER_DATA = {}  # data shared by all tasks of a worker process, see init_worker
+
+
+def get_grid(param_grid: dict) -> list:
+    """
+    return all combinations of the params
+    :param param_grid: e.g. {'exec_set': [1, 2], 'slippage': [20, 30]}
+    :return: [{'exec_set': 1, 'slippage': 20}, {'exec_set': 1, 'slippage': 30}, ...]
+    """
+    params = list(param_grid.keys())
+    return [dict(zip(params, values)) for values in itertools.product(*param_grid.values())]
+
+
+def get_random_combos(param_space: dict, n: int, seed: int = None) -> list:
+    """
+    return 'n' random combinations of the params
+    :param param_space: list: one of the values, tuple (low, high): int/ float within the range (both inclusive)
+    :param n: number of combinations
+    :param seed: random seed for a repeatable search
+    """
+    rng = random.Random(seed)
+
+    def draw(values):
+        if isinstance(values, tuple):
+            low, high = values
+            return rng.randint(low, high) if isinstance(low, int) and isinstance(high, int) else rng.uniform(low, high)
+        return rng.choice(values)
+
+    return [{param: draw(values) for param, values in param_space.items()} for _ in range(n)]
+
+
+def get_tasks(strategy: type, combos: list, batch_size: int) -> list:
+    """
+    group the combinations by indicator params and split the groups into batches
+    :return: [(indicator key, [(combination index, combination), ...]), ...]
+    """
+    groups = {}
+    for i, combo in enumerate(combos):
+        groups.setdefault(get_indicator_key(strategy, combo), []).append((i, combo))
+
+    tasks = []
+    for key, members in groups.items():
+        # combinations with the same strategy params next to each other, they share the trades
+        members.sort(key=lambda member: str(get_strategy_params(member[1])))
+        for start in range(0, len(members), batch_size):
+            tasks.append((key, members[start:start + batch_size]))
+
+    return tasks
+
+
+def get_indicator_key(strategy: type, combo: dict) -> tuple:
+    """
+    combinations with the same key share the indicators (BackTestEngine.indicators)
+    if the strategy does not list its indicator params, any strategy param may change the indicators:
+    the key is all strategy params, only combinations which differ in costs share the indicators
+    """
+    if strategy.indicator_params is None:
+        return tuple(sorted(get_strategy_params(combo).items()))
+
+    return tuple(combo.get(param) for param in strategy.indicator_params)
+
+
+def get_strategy_params(combo: dict) -> dict:
+    return {param: value for param, value in combo.items() if param not in COST_PARAMS}
+
+
+def init_worker(strategy: type, shared_bars: shared_data.SharedFrame, kline_daily: pd.DataFrame,
+                start_date: dt.datetime, end_date: dt.datetime, warmup_bars: int):
+    """
+    runs once in every pool process, the bars are read from shared memory once for all tasks of the process
+    """
+    bars = shared_bars.read(start_date.replace(hour=9, minute=15),
+                            (end_date + dt.timedelta(days=1)).replace(hour=3, minute=0),
+                            before=warmup_bars, after=1)
+    WORKER_DATA['data'] = bars.rename(columns={'Date': 'time_key', 'Open': 'open', 'High': 'high', 'Low': 'low',
+                                               'Close': 'close', 'Volume': 'volume'})
+    WORKER_DATA['strategy'] = strategy
+    WORKER_DATA['kline_daily'] = kline_daily
+    WORKER_DATA['start_date'] = start_date
+    WORKER_DATA['end_date'] = end_date
+    WORKER_DATA['warmup_bars'] = warmup_bars
+    WORKER_DATA['indicators'] = None  # (indicator key, indicators) of the last group
+
+
+def run_batch(task: tuple) -> list:
+    """
+    backtest a batch of combinations with the same indicator params
+    :return: [(combination index, result row), ...]
+    """
+    key, members = task
+    indicators = WORKER_DATA['indicators'][1] if WORKER_DATA['indicators'] and WORKER_DATA['indicators'][0] == key else None
+
+    rows = []
+    trades, last_params = None, None
+    for i, combo in members:
+        # backtest only if the strategy params changed, costs are applied to the same trades
+        params = get_strategy_params(combo)
+        if trades is None or params != last_params:
+            engine = run_engine(params, WORKER_DATA['start_date'], WORKER_DATA['end_date'], indicators,
+                                fees=combo['fees'], slippage=combo['slippage'], point_value=combo['point_value'])
+            indicators = engine.indicators
+            trades, last_params = engine.df_trd_jrl, params
+
+        rows.append((i, {**combo, **get_metrics(trades, combo['fees'], combo['slippage'], combo['point_value'])}))
+
+    WORKER_DATA['indicators'] = (key, indicators)
+    return rows
+
+
+def run_engine(params: dict, start_date: dt.datetime, end_date: dt.datetime, indicators: dict = None,
+               initial_state: dict = None, **costs) -> BackTestEngine:
+    """
+    backtest the strategy with 'params' on the bars of the worker process
+    :param indicators: indicators of a previous run with the same indicator params (BackTestEngine.indicators)
+    :param initial_state: position carried from the previous period
+    :param costs: 'fees' 'slippage' 'point_value'
+    :return: engine after backtesting
+    """
+    engine = BackTestEngine(strategy=WORKER_DATA['strategy'], chart=None, data=WORKER_DATA['data'],
+                            start_date=start_date, end_date=end_date, kline_daily=WORKER_DATA['kline_daily'],
+                            warmup_bars=WORKER_DATA['warmup_bars'], initial_state=initial_state,
+                            strategy_params=params, indicators=indicators, **costs)
+    engine.start_testing_strategy()
+
+    return engine
+
+
+def get_metrics(trades: pd.DataFrame, fees: float, slippage: float, point_value: int) -> dict:
+    """
+    summary of a trade journal, a trade is counted from flat to flat
+    :param trades: trade journal (columns: 'time_key' 'side' 'qty' 'price' 'remark')
+    :param fees: commission per contract in money
+    :param slippage: slippage per contract in money
+    :param point_value: point value of contract
+    :return: dict (keys: same names as generate_overview)
+    """
+    qty = trades['qty'].to_numpy(dtype=float)
+    sign = np.where(trades['side'].to_numpy() == 'SELL', 1, -1)
+    amount = sign*trades['price'].to_numpy(dtype=float)*qty*point_value - qty*(fees + slippage)
+
+    # profit/loss of closed trades
+    is_closed = np.cumsum(-sign*qty) == 0
+    nos_of_trades = int(is_closed.sum())
+    trade_id = np.cumsum(is_closed) - is_closed
+    trade_pnl = np.bincount(trade_id, weights=amount, minlength=nos_of_trades + 1)[:nos_of_trades]
+    equity = np.cumsum(amount)[is_closed]
+
+    pnl = equity[-1] if nos_of_trades else 0
+    mdd = min(0, (equity - np.maximum.accumulate(np.maximum(equity, 0))).min()) if nos_of_trades else 0
+    profit, loss = trade_pnl[trade_pnl > 0].sum(), abs(trade_pnl[trade_pnl < 0].sum())
+    wins, losses = (trade_pnl > 0).sum(), (trade_pnl < 0).sum()
+
+    return {'Profit/Loss': int(pnl),
+            'Trades': nos_of_trades,
+            'Win Rate': round(wins / (wins + losses), 2) if wins + losses else 0,
+            'Traded Contracts': int(qty.sum()),
+            'Commission': fees * qty.sum(),
+            'Slippage': slippage * qty.sum(),
+            'Max DrawDown': int(mdd),
+            'Profit Factor': round(profit / max(1, loss), 2),
+            'Return/Risk Ratio': round(pnl / -mdd, 2) if mdd else np.nan}
+
+
+def run_sweep(strategy: type, combos: list, start_date: dt.datetime, end_date: dt.datetime,
+              shared_bars: shared_data.SharedFrame, kline_daily: pd.DataFrame, fees: float, slippage: float,
+              point_value: int, workers: int, warmup_bars: int = 5000, batch_size: int = 20) -> pd.DataFrame:
+    """
+    backtest every combination of params
+    :param strategy: AlgoTemplate class
+    :param combos: [{param: value, ...}, ...] strategy attributes and/or 'fees' 'slippage' 'point_value'
+    :param shared_bars: bars from 'warmup_bars' before 'start_date' to 'end_date'
+    :param fees, slippage, point_value: default costs for the combinations without them
+    :param workers: number of processes
+    :param warmup_bars: bars used for indicators only before 'start_date'
+    :param batch_size: max number of combinations per task
+    :return: comparison table, one row per combination (params and metrics)
+    """
+    combos = [{'fees': fees, 'slippage': slippage, 'point_value': point_value, **combo} for combo in combos]
+    tasks = get_tasks(strategy, combos, batch_size)
+    print(f"Sweeping {len(combos)} combinations in {len(tasks)} tasks with {workers} processes.")
+
+    rows = [None] * len(combos)
+    with mp.Pool(workers, initializer=init_worker,
+                 initargs=(strategy, shared_bars, kline_daily, start_date, end_date, warmup_bars)) as pool:
+        for nos_of_tasks, results in enumerate(pool.imap_unordered(run_batch, tasks), start=1):
+            for i, row in results:
+                rows[i] = row
+            print(f"{nos_of_tasks}/{len(tasks)} tasks finished.")
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    print(f"Start sweeping at {dt.datetime.now().strftime('%H:%M:%S')}")
+    start_ = time.time()
+
+    # configure params
+    from algorithm.mal_ready import MAL  # strategy to be swept
+
+    PROJECT_DIR = os.path.split(os.getcwd())[0]
+    REPORT_DIR = os.path.join(PROJECT_DIR, 'backtesting', 'report')
+    START_MONTH = dt.datetime(2019, 1, 1)
+    END_MONTH = dt.datetime(2023, 7, 1) - dt.timedelta(days=1)
+    FEES, SLIPPAGE, POINT_VALUE = 12, 30, 10
+    WARMUP_BARS = 5000  # bars before START_MONTH for indicators
+    WARMUP_DAYS = 30  # calendar days loaded before START_MONTH, enough for WARMUP_BARS
+    WORKERS = mp.cpu_count()  # number of backtest processes
+    BATCH_SIZE = 20  # max number of combinations per task
+    PARAM_GRID = {'exec_set': [1, 2, 3], 'slippage': [20, 30, 40]}  # strategy attributes and 'fees' 'slippage' 'point_value'
+    RANDOM_COMBOS = 0  # number of random combinations drawn from PARAM_GRID, 0: all combinations
+    RANDOM_SEED = None
+    INDICATOR_CACHE = True  # reuse indicator results of previous runs over the same bars (library/ta_cache)
+    CACHE_MB, DISK_CACHE_MB = 256, 2048  # max size of the cache in memory (per process) and on disk
+
+    # load data once, all processes attach to the same memory
+    shared_bars = shared_data.SharedFrame(
+        bar_store.read(bar_store.get_store_dir(PROJECT_DIR),
+                       START_MONTH - dt.timedelta(days=WARMUP_DAYS),
+                       END_MONTH + dt.timedelta(days=2))
+    )
+    kline_daily = pd.read_csv(os.path.join(PROJECT_DIR, 'database', 'fhsi_daily_kline.csv'), index_col=0)
+    if INDICATOR_CACHE:
+        ta.set_cache(get_indicator_cache(PROJECT_DIR, CACHE_MB * 1024 ** 2, DISK_CACHE_MB * 1024 ** 2))
+
+    # start sweeping
+    if RANDOM_COMBOS:
+        combos = get_random_combos(PARAM_GRID, RANDOM_COMBOS, seed=RANDOM_SEED)
+    else:
+        combos = get_grid(PARAM_GRID)
+    sweep_report = run_sweep(MAL, combos, START_MONTH, END_MONTH, shared_bars, kline_daily, FEES, SLIPPAGE,
+                             POINT_VALUE, workers=WORKERS, warmup_bars=WARMUP_BARS, batch_size=BATCH_SIZE)
+    shared_bars.unlink()
+
+    # save to file
+    sweep_report.sort_values('Profit/Loss', ascending=False, inplace=True)
+    sweep_report.to_csv(os.path.join(REPORT_DIR, 'sweep_report.csv'))
+
+    print(f"\nFinished, {round(time.time() - start_, 2)} seconds used.")
@@ -0,0 +1,66 @@
+"""
+Vectorized backtest for strategies which only trade on indicator signals
+
+the strategy returns boolean signal arrays for the whole period (AlgoTemplate.generate_signals),
+session rules are applied as masks (AlgoTemplate.get_open_order_mask, AlgoTemplate.get_timeout_mask)
+and the orders are derived by jumping from one signal to the next, the cost is per trade instead of per bar
+
+same rules as the event loop (AlgoTemplate.backtest_in_out_logic) for one position at a time:
+  - flat: open a position on an entry signal within the open order period
+  - long/ short: close the whole position at timeout or on an exit signal
+  - the order of a bar is filled at the open of the next bar, so a new position is checked for exit from the next bar
+strategies with path-dependent logic (add orders, trailing stops, ...) use the event loop
+"""
+import numpy as np
+
+
+SIGNALS = ('long_entry', 'long_exit', 'short_entry', 'short_exit')
+
+
+def get_orders(signals: dict, can_open_order: np.ndarray, is_timeout: np.ndarray, first_bar: int, last_bar: int,
+               position: int = 0) -> list:
+    """
+    derive orders from signal arrays
+    the masks are built for all bars at once, the loop below runs once per order (not per bar):
+    which signal counts depends on the position left by the previous order (flat: entries, long/ short: exits),
+    a state machine like this has no array expression without walking the bars, so every step is a binary search
+    for the next bar where the current state changes, O(orders * log(bars)) in total
+    :param signals: boolean arrays for all bars (keys: 'long_entry' 'long_exit' 'short_entry' 'short_exit')
+    :param can_open_order: boolean array, True if the bar is within the open order period
+    :param is_timeout: boolean array, True if positions have to be closed at the bar
+    :param first_bar: index of the first bar to be checked
+    :param last_bar: index after the last bar to be checked
+    :param position: position before 'first_bar' (1: long, -1: short, 0: flat)
+    :return: [(index, signal), ...], signal: 'LE' 'SE' 'LX' 'SX' 'LX TIMEOUT' 'SX TIMEOUT'
+    """
+    in_period = np.zeros(len(can_open_order), dtype=bool)
+    in_period[first_bar:last_bar] = True
+    signals = {key: np.asarray(signals[key], dtype=bool) for key in SIGNALS}
+
+    # bars where an order would be placed in each state
+    long_entry = signals['long_entry'] & can_open_order & in_period
+    short_entry = signals['short_entry'] & can_open_order & in_period & ~long_entry
+    entries = np.flatnonzero(long_entry | short_entry)
+    exits = {1: np.flatnonzero((signals['long_exit'] | is_timeout) & in_period),
+             -1: np.flatnonzero((signals['short_exit'] | is_timeout) & in_period)}
+
+    # jump from one order to the next
+    orders = []
+    index = first_bar
+    while True:
+        candidates = exits[position] if position else entries
+        k = np.searchsorted(candidates, index)
+        if k == len(candidates):
+            break
+        index = int(candidates[k])
+
+        if position:
+            signal = 'LX' if position > 0 else 'SX'
+            orders.append((index, f'{signal} TIMEOUT' if is_timeout[index] else signal))
+            position = 0
+        else:
+            position = 1 if long_entry[index] else -1
+            orders.append((index, 'LE' if position > 0 else 'SE'))
+        index += 1
+
+    return orders
@@ -0,0 +1,205 @@
+"""
+Walk-forward optimization
+
+the period is split into rolling windows: the params are optimized on the in-sample months of a window
+and the best params are backtested on the following out-of-sample months,
+the out-of-sample results of all windows are stitched into one equity curve and report
+  - in-sample runs are tasks of (window, batch of combinations with the same indicator params) on a pool of processes,
+    every process reads the bars of the whole period once and applies the indicators of a group once for all windows
+    (the windows overlap, an indicator value does not depend on the window it is used in)
+  - out-of-sample windows run in parallel starting flat, a window is backtested again with the position carried over
+    if the previous window ended with an open position (scheduler.stitch)
+"""
+import datetime as dt
+import multiprocessing as mp
+import os
+import time
+
+import pandas as pd
+
+import bar_store
+import scheduler
+import shared_data
+import sweep
+from library import ta
+from main import generate_detail_report, generate_overview, get_indicator_cache, get_monthly_report, sort_monthly_report
+
+
+def get_windows(start_date: dt.datetime, end_date: dt.datetime, in_sample_months: int,
+                out_of_sample_months: int) -> list:
+    """
+    rolling windows, the out-of-sample periods follow each other without gap
+    :return: [((in-sample start, in-sample end), (out-of-sample start, out-of-sample end)), ...]
+    """
+    months = scheduler.split_months(start_date, end_date)
+    windows = []
+    for i in range(in_sample_months, len(months), out_of_sample_months):
+        in_sample = (months[i - in_sample_months][0], months[i - 1][1])
+        out_of_sample = (months[i][0], months[min(i + out_of_sample_months, len(months)) - 1][1])
+        windows.append((in_sample, out_of_sample))
+
+    return windows
+
+
+def get_in_sample_tasks(strategy: type, combos: list, windows: list, costs: dict, batch_size: int) -> list:
+    """
+    tasks of the same indicator group are next to each other, so a process can reuse the indicators
+    :return: [(window index, in-sample period, indicator key, [(combination index, combination), ...], costs), ...]
+    """
+    return [(i, in_sample, key, members, costs)
+            for key, members in sweep.get_tasks(strategy, combos, batch_size)
+            for i, (in_sample, out_of_sample) in enumerate(windows)]
+
+
+def get_indicators(key: tuple) -> dict | None:
+    cached = sweep.WORKER_DATA['indicators']
+    return cached[1] if cached and cached[0] == key else None
+
+
+def run_in_sample(task: tuple) -> list:
+    """
+    backtest a batch of combinations on the in-sample period of a window
+    :return: [(window index, combination index, metrics), ...]
+    """
+    window, (start_date, end_date), key, members, costs = task
+    indicators = get_indicators(key)
+
+    rows = []
+    for i, combo in members:
+        engine = sweep.run_engine(combo, start_date, end_date, indicators, **costs)
+        indicators = engine.indicators
+        rows.append((window, i, sweep.get_metrics(engine.df_trd_jrl, **costs)))
+
+    sweep.WORKER_DATA['indicators'] = (key, indicators)
+    return rows
+
+
+def run_out_of_sample(task: tuple, initial_state: dict = None) -> dict:
+    """
+    backtest the best params of a window on its out-of-sample period
+    :return: dict (keys: 'trades', 'start_state', 'end_state')
+    """
+    (start_date, end_date), key, combo, costs = task
+    engine = sweep.run_engine(combo, start_date, end_date, get_indicators(key), initial_state, **costs)
+    sweep.WORKER_DATA['indicators'] = (key, engine.indicators)
+
+    return {'trades': engine.df_trd_jrl,
+            'start_state': initial_state,
+            'end_state': engine.strategy.get_position_state()}
+
+
+def run_walk_forward(strategy: type, combos: list, windows: list, shared_bars: shared_data.SharedFrame,
+                     kline_daily: pd.DataFrame, costs: dict, objective: str, workers: int, warmup_bars: int = 5000,
+                     batch_size: int = 20) -> (pd.DataFrame, pd.DataFrame):
+    """
+    optimize the params of every window and backtest them out-of-sample
+    :param strategy: AlgoTemplate class
+    :param combos: [{param: value, ...}, ...] strategy attributes
+    :param windows: from get_windows
+    :param shared_bars: bars from 'warmup_bars' before the first window to the end of the last window
+    :param costs: {'fees': ..., 'slippage': ..., 'point_value': ...}
+    :param objective: metric to be maximized in-sample, e.g. 'Profit/Loss' (see sweep.get_metrics)
+    :param workers: number of processes
+    :return: out-of-sample trades, windows (periods, best params, in-sample and out-of-sample metrics)
+    """
+    start_date, end_date = windows[0][0][0], windows[-1][1][1]
+    tasks = get_in_sample_tasks(strategy, combos, windows, costs, batch_size)
+    print(f"Walk-forward {len(windows)} windows x {len(combos)} combinations in {len(tasks)} tasks.")
+
+    with mp.Pool(workers, initializer=sweep.init_worker,
+                 initargs=(strategy, shared_bars, kline_daily, start_date, end_date, warmup_bars)) as pool:
+        # optimize in-sample
+        metrics = {}  # key: window index, value: {combination index: metrics}
+        for nos_of_tasks, rows in enumerate(pool.imap_unordered(run_in_sample, tasks), start=1):
+            for window, i, row in rows:
+                metrics.setdefault(window, {})[i] = row
+            print(f"{nos_of_tasks}/{len(tasks)} in-sample tasks finished.")
+
+        best = []
+        for window in range(len(windows)):
+            scores = pd.DataFrame.from_dict(metrics[window], orient='index')[objective].astype(float)
+            best.append(int(scores.idxmax()) if scores.notna().any() else 0)
+
+        # backtest out-of-sample
+        out_of_sample_tasks = [(out_of_sample, sweep.get_indicator_key(strategy, combos[i]), combos[i], costs)
+                               for (in_sample, out_of_sample), i in zip(windows, best)]
+        results = scheduler.stitch(
+            pool.imap(run_out_of_sample, out_of_sample_tasks),
+            rerun=lambda window, state: pool.apply(run_out_of_sample, (out_of_sample_tasks[window], state))
+        )
+
+    # summary of windows
+    rows = []
+    for window, ((in_sample, out_of_sample), i, result) in enumerate(zip(windows, best, results)):
+        row = {'In-Sample From': in_sample[0], 'In-Sample To': in_sample[1],
+               'Out-Of-Sample From': out_of_sample[0], 'Out-Of-Sample To': out_of_sample[1],
+               **combos[i],
+               f'In-Sample {objective}': metrics[window][i][objective],
+               'Out-Of-Sample Profit/Loss': sweep.get_metrics(result['trades'], **costs)['Profit/Loss']}
+        rows.append(row)
+    trades = pd.concat([result['trades'] for result in results], axis=0, ignore_index=True)
+
+    return trades, pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    print(f"Start walk-forward at {dt.datetime.now().strftime('%H:%M:%S')}")
+    start_ = time.time()
+
+    # configure params
+    from algorithm.mal_ready import MAL  # strategy to be optimized
+
+    PROJECT_DIR = os.path.split(os.getcwd())[0]
+    REPORT_DIR = os.path.join(PROJECT_DIR, 'backtesting', 'report')
+    START_MONTH = dt.datetime(2019, 1, 1)
+    END_MONTH = dt.datetime(2023, 7, 1) - dt.timedelta(days=1)
+    FEES, SLIPPAGE, POINT_VALUE = 12, 30, 10
+    WARMUP_BARS = 5000  # bars before START_MONTH for indicators
+    WARMUP_DAYS = 30  # calendar days loaded before START_MONTH, enough for WARMUP_BARS
+    WORKERS = mp.cpu_count()  # number of backtest processes
+    BATCH_SIZE = 20  # max number of combinations per task
+    IN_SAMPLE_MONTHS, OUT_OF_SAMPLE_MONTHS = 12, 3
+    OBJECTIVE = 'Profit/Loss'  # in-sample metric to be maximized
+    PARAM_GRID = {'exec_set': [1, 2, 3]}  # strategy attributes
+    INDICATOR_CACHE = True  # reuse indicator results of previous runs over the same bars (library/ta_cache)
+    CACHE_MB, DISK_CACHE_MB = 256, 2048  # max size of the cache in memory (per process) and on disk
+
+    # load data once, all processes attach to the same memory
+    shared_bars = shared_data.SharedFrame(
+        bar_store.read(bar_store.get_store_dir(PROJECT_DIR),
+                       START_MONTH - dt.timedelta(days=WARMUP_DAYS),
+                       END_MONTH + dt.timedelta(days=2))
+    )
+    kline_daily = pd.read_csv(os.path.join(PROJECT_DIR, 'database', 'fhsi_daily_kline.csv'), index_col=0)
+    if INDICATOR_CACHE:
+        ta.set_cache(get_indicator_cache(PROJECT_DIR, CACHE_MB * 1024 ** 2, DISK_CACHE_MB * 1024 ** 2))
+
+    # start walk-forward
+    windows = get_windows(START_MONTH, END_MONTH, IN_SAMPLE_MONTHS, OUT_OF_SAMPLE_MONTHS)
+    costs = {'fees': FEES, 'slippage': SLIPPAGE, 'point_value': POINT_VALUE}
+    trades, window_report = run_walk_forward(MAL, sweep.get_grid(PARAM_GRID), windows, shared_bars, kline_daily,
+                                             costs, OBJECTIVE, workers=WORKERS, warmup_bars=WARMUP_BARS,
+                                             batch_size=BATCH_SIZE)
+    shared_bars.unlink()
+
+    # save to file
+    trades_path = os.path.join(REPORT_DIR, 'walk_forward_trades.csv')
+    trades.to_csv(trades_path)
+    window_report.to_csv(os.path.join(REPORT_DIR, 'walk_forward_windows.csv'))
+    monthly_report = sort_monthly_report(
+        get_monthly_report(trades, FEES / POINT_VALUE, SLIPPAGE / POINT_VALUE, POINT_VALUE)
+    )
+    monthly_report.to_csv(os.path.join(REPORT_DIR, 'walk_forward_monthly_report.csv'))
+
+    # out-of-sample equity curve and overview
+    detail_report, line_chart = generate_detail_report(trades_path, FEES, SLIPPAGE, POINT_VALUE)
+    report_overview = generate_overview(detail_report, line_chart)
+    report_overview.to_csv(os.path.join(REPORT_DIR, 'walk_forward_overview.csv'))
+
+    monthly_report.at['Total', 'Period'] = 'Total'
+    monthly_report.set_index('Period', inplace=True)
+    line_chart.add_monthly_report(monthly_report)
+    line_chart.add_overview_text(report_overview)
+    line_chart.export_chart(path=os.path.join(REPORT_DIR, 'walk_forward_equity_curve.html'))
+
+    print(f"\nFinished, {round(time.time() - start_, 2)} seconds used.")
@@ -3,9 +3,12 @@ import importlib.util
 import inspect
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
 
 import pandas as pd
 
+from library.pnl_service import PnlService
+
 os.environ['KIVY_LOG_MODE'] = 'MIXED'
 from kivy.app import App
 from kivy.uix.button import Button
@@ -49,7 +52,11 @@ class AlgoTrade(Widget):
         }
         # self.auto_shutdown = self.ids['checkbox_auto_shutdown'].active  # get checkbox by 'id' in kv file
         self.strategies = {}
+        self.strategy_pool = ThreadPoolExecutor(thread_name_prefix='strategy')  # evaluate strategies concurrently
         self.algo_table = pd.DataFrame()
+        self.table_rows = None  # strategies shown in the gui table, in order (None: not built yet)
+        self.table_cells = {}  # key: (strategy, column), value: label of the cell
+        self.pnl_service = PnlService(point_value=10)  # realtime P&L, shown by flush_realtime_pnl()
         self.calendar = Calendar(self)
 
         # initialize start and end date
@@ -66,8 +73,32 @@ class AlgoTrade(Widget):
     """ algorithm """
     # ------------------------------------------------------------------------------------------- #
     def update_kline(self, kline: pd.DataFrame):
-        for strategy in self.strategies.values():
-            strategy.update_kline(kline)
+        """
+        runs in the strategy executor, all strategies evaluate the same bars at the same time
+        (each gets a shallow copy: own columns for indicators, the bar values must not be changed in place),
+        after all strategies finished, their orders are placed in strategy order, each one updates the position of
+        its strategy before the next one is placed (the separate orders of FutuApi.fire_trade see all inventories)
+        """
+        futures = {name: self.strategy_pool.submit(self.evaluate_strategy, name, strategy, kline.copy(deep=False))
+                   for name, strategy in self.strategies.items()}
+        wait(futures.values())
+        for name, future in futures.items():
+            if future.exception() is not None:
+                logging.error(f"strategy {name} failed on the bar", exc_info=future.exception())
+                continue
+            for side, qty, remark, order_type in future.result():
+                self.main_app.fire_trade(side, qty, remark, order_type)
+
+    def evaluate_strategy(self, name: str, strategy, kline: pd.DataFrame) -> list:
+        """
+        :return: orders of the strategy on the bar, [(side, qty, remark, order_type), ...]
+        """
+        self.main_app.latency.mark(f'{name} start')
+        strategy.orders = []
+        strategy.update_kline(kline)
+        self.main_app.latency.mark(f'{name} end')
+
+        return strategy.orders
 
     # ------------------------------------------------------------------------------------------- #
     """ update gui """
@@ -106,8 +137,23 @@ class AlgoTrade(Widget):
         # setup self.table in DataFrame format
         self.algo_table = self.main_app.futu.get_algo_table(self.strategies.keys(), self.start_date, self.end_date)
 
-        # initialize table (gui)
+        # the widgets are built once for the same strategies, later only the changed cells are updated
+        rows = [name for name in self.algo_table['Strategy'] if self.strategies.get(name)]
+        if rows == self.table_rows:
+            self.update_table_cells()
+        else:
+            self.build_table()
+            self.table_rows = rows
+
+        # positions of the shown rows for the realtime P&L
+        self.pnl_service.set_positions(self.algo_table[self.algo_table['Strategy'].isin(self.strategies.keys())])
+
+    def build_table(self):
+        """
+        create the widgets of the algo table
+        """
         self.ids['data_table'].clear_widgets()
+        self.table_cells = {}
         col_width, row_height = 80, 30
         self.ids['data_table'].cols = len(self.algo_table.columns) + 1  # include column for 'on/off' checkbutton
 
@@ -144,17 +190,13 @@ class AlgoTrade(Widget):
                 # reset params
                 label = Label(markup=True, font_size=16, text_size=(col_width, row_height),
                               size=(col_width, row_height), size_hint=(None, None), valign='middle')
-                value = row[col]
+                value = self.get_cell_value(strategy, row, col)
 
                 # configure columns
                 match col:
                     case 'Status':
-                        value = strategy.status
                         self.ids['data_table'].ids[row['Strategy'] + '_Status'] = label  # set id
-                    case 'ExecSet':
-                        value = strategy.exec_set
                     case 'MaxCtrt':
-                        value = strategy.max_contract
                         max_contract_total += value
                     case 'InitMargin':
                         # if futu_openD not ready
@@ -182,28 +224,40 @@ class AlgoTrade(Widget):
 
                 # add widget
                 self.ids['data_table'].add_widget(label)
+                self.table_cells[(row['Strategy'], col)] = label
+
+    def update_table_cells(self):
+        """
+        update the labels whose text or color differs from the algo table
+        """
+        for index, row in self.algo_table.iterrows():
+            strategy = self.strategies.get(row['Strategy'])
+            if not strategy:
+                continue
+
+            for col in self.algo_table.columns:
+                label = self.table_cells.get((row['Strategy'], col))
+                if label is None:  # order spinner
+                    continue
+                text, color, halign = self.format_label(col, self.get_cell_value(strategy, row, col))
+                if label.text != text or list(label.color) != list(color):
+                    label.text, label.color = text, color
 
     def update_realtime_pnl(self, price: float):
-        if self.algo_table.empty:
-            return
+        """
+        callback of IB ticks (IB thread), the labels are updated by flush_realtime_pnl()
+        """
+        self.pnl_service.update_price(price)
 
-        df = self.algo_table.copy()
-        pnl_total = inv_total = 0
-        point_value = 10
-        for index, row in df.iterrows():
-            strategy_name = row['Strategy']
-            if row['Inventory']:
-                # calculate realtime P/L
-                realize_pnl = row['P / L']
-                inventory = row['Inventory']
-                avg_price = row['AvgPrice']
-                realtime_pnl = realize_pnl + (price - avg_price)*inventory*point_value
-
-                # update label
-                label = self.ids['data_table'].ids[f'{strategy_name}_PL']  # get label widget
-                label.color = self.color_map.get('green') if realtime_pnl >= 0 else self.color_map.get('red')
-                text = '{:,.0f}'.format(realtime_pnl)
-                label.text = f'[b]{text}[/b]' if realtime_pnl < 0 else f'[b]{"+"+text}[/b]'
+    def flush_realtime_pnl(self):
+        """
+        called by the kivy clock at the refresh rate, only the changed P&L labels are updated
+        """
+        for strategy_name, realtime_pnl in self.pnl_service.get_changes():
+            label = self.ids['data_table'].ids[f'{strategy_name}_PL']  # get label widget
+            label.color = self.color_map.get('green') if realtime_pnl >= 0 else self.color_map.get('red')
+            text = '{:,.0f}'.format(realtime_pnl)
+            label.text = f'[b]{text}[/b]' if realtime_pnl < 0 else f'[b]{"+"+text}[/b]'
 
     def update_status(self, strategy_name: str, status: str):
         text, color, halign = self.format_label('Status', status)
@@ -258,7 +312,9 @@ class AlgoTrade(Widget):
             case _:
                 return
 
-        self.main_app.fire_trade(side=side, qty=qty, remark='-'.join([strategy.name, remark]), order_type='MARKET')
+        # in the strategy executor, after the strategies' orders which are already queued
+        self.main_app.strategy_executor.submit(self.main_app.fire_trade, side=side, qty=qty,
+                                               remark='-'.join([strategy.name, remark]), order_type='MARKET')
 
     # ------------------------------------------------------------------------------------------- #
     """ helper methods """
@@ -291,6 +347,22 @@ class AlgoTrade(Widget):
                                      )
                     # assign strategy to dictionary
                     self.strategies[class_[1].name] = self.__getattribute__(class_[1].name.lower())
+                    # daily bars of the live minute bars
+                    self.main_app.ibapi.subscribe_bars('daily', self.strategies[class_[1].name].update_kline_daily)
+
+    def get_cell_value(self, strategy, row: pd.Series, col: str):
+        """
+        value of a cell in the algo table, some columns are shown from the strategy
+        """
+        match col:
+            case 'Status':
+                return strategy.status
+            case 'ExecSet':
+                return strategy.exec_set
+            case 'MaxCtrt':
+                return strategy.max_contract
+            case _:
+                return row[col]
 
     def format_label(self, col, value):
         color = (0, 0, 0, 1)
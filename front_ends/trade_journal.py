@@ -4,14 +4,20 @@ import threading as th
 
 import pandas as pd
 
+from library.journal_store import COLUMNS
+
 os.environ['KIVY_LOG_MODE'] = 'MIXED'
 from kivy.app import App
-from kivy.uix.button import Button
+from kivy.clock import Clock
 from kivy.uix.label import Label
 from kivy.uix.spinner import Spinner
 from kivy.uix.widget import Widget
 from KivyCalendar import DatePicker
 
+PAGE_SIZE = 200  # fills per page of the trade journal
+BLANK_ROW = {'create_time': '', 'code': '', 'trd_side': '', 'price': '', 'qty': '', 'status': '', 'remark': '',
+             'time_color': (0, 0, 0, 1), 'side_color': (0, 0, 0, 0)}  # recycled widgets keep values not given
+
 
 class Calendar(DatePicker):
     def __init__(self, trade_journal):
@@ -32,6 +38,10 @@ class TradeJournal(Widget):
         self.main_app = App.get_running_app()
         self.calendar = Calendar(self)
         self.algo = self.main_app.algo_main_page.algo_trade
+        self.trade_journal = pd.DataFrame()  # fills of the date range, latest first
+        self.time_range = None  # ('create_time' start, end) of the loaded fills, new fills outside it are not shown
+        self.filtered_journal = pd.DataFrame()  # fills of the strategy filter
+        self.page = 0
 
         # initialize start and end date
         today = dt.date.today()
@@ -59,96 +69,80 @@ class TradeJournal(Widget):
             self.ids.label_date_to.text = dt.datetime.strftime(self.end_date, '%d-%b-%y')
 
     def update_table(self, trade_journal: pd.DataFrame):
-        self.ids['data_table'].clear_widgets()
-        if trade_journal.empty:
+        """
+        :param trade_journal: fills of the date range, latest first
+        """
+        self.trade_journal = trade_journal
+        self.filter_journal()
+
+    def on_journal_changed(self, fills: pd.DataFrame):
+        """
+        subscriber of the trade journal, runs in the thread which wrote the fills
+        """
+        Clock.schedule_once(lambda time_: self.add_fills(fills), 0)
+
+    def add_fills(self, fills: pd.DataFrame):
+        """
+        add the new fills (in order of fills) to the shown ones, the date range is not loaded again
+        """
+        if self.time_range is None:
+            return
+        start, end = self.time_range
+        fills = fills[(fills['create_time'] >= start) & (fills['create_time'] <= end)]
+        if fills.empty:
             return
 
-        # filter strategy
+        fills = fills[list(COLUMNS)][::-1].reset_index(drop=True)  # latest first
+        self.trade_journal = _add_latest(fills, self.trade_journal)
         strategy = self.ids['filter'].text
         if strategy != 'ALL':
-            trade_journal = trade_journal[
-                (trade_journal['remark'].str[:3] == strategy)
-            ].reset_index(drop=True)
-        if trade_journal.empty:
-            return
+            fills = fills[fills['remark'].str[:3] == strategy]
+        self.filtered_journal = _add_latest(fills, self.filtered_journal)
+        self.show_page(self.page)
 
-        # set number of column in data_table
-        self.ids['data_table'].cols = len(trade_journal.columns)
-
-        row_height = 30
-        col_width_dict = {'create_time': 100,
-                          'code': 100,
-                          'remark': 250,
-                          'others': 80}
-        col_index = {}
-        for i, col in enumerate(list(trade_journal.columns)):
-            col_index[i] = col
-
-        # add header
-        for header in trade_journal.columns:
-            # set column width
-            col_width = col_width_dict['others'] if not col_width_dict.get(header) else col_width_dict[header]
-
-            # add widget
-            self.ids['data_table'].add_widget(
-                Button(text=header, size=(col_width, row_height), size_hint=(None, None),
-                       background_normal='', background_down='', background_color=(0.7, 0.7, 0.7, 1))
-            )
-
-        # add rows
+    def filter_journal(self):
+        """
+        apply the strategy filter and show the current page again
+        """
+        journal = self.trade_journal
+        strategy = self.ids['filter'].text
+        if not journal.empty and strategy != 'ALL':
+            journal = journal[journal['remark'].str[:3] == strategy].reset_index(drop=True)
+        self.filtered_journal = journal
+        self.show_page(min(self.page, self.get_page_count() - 1))
+
+    def get_page_count(self) -> int:
+        return max(1, -(-len(self.filtered_journal) // PAGE_SIZE))
+
+    def show_page(self, page: int):
+        """
+        give the fills of the page to the RecycleView, it creates widgets for the visible rows only
+        """
+        self.page = page
+        fills = self.filtered_journal.iloc[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+        self.ids['data_table'].data = self.get_rows(fills) if not fills.empty else []
+        self.ids['data_table'].scroll_y = 1
+        self.ids['label_page'].text = f'{page + 1} / {self.get_page_count()}'
+
+    def get_rows(self, fills: pd.DataFrame) -> list:
+        """
+        :return: data of the RecycleView, a row with the date comes before the first fill of each day
+        """
+        rows = []
         date = ''
-        for index, row in trade_journal.iterrows():
-            # add row data
-            for i, value in enumerate(row):
-                # set column width
-                col = col_index.get(i)
-                col_width = col_width_dict[col] if col_width_dict.get(col) else col_width_dict['others']
-
-                # set color
-                bg = (0, 0, 0, 0)
-                if col == 'trd_side':
-                    bg = (0.6, 0.8, 1.0, 1.0) if value == 'BUY' else (1.0, 0.8, 0.6, 1)
-
-                # check for new day
-                blank_row = False
-                fg = (0, 0, 0, 1)
-                if col == 'create_time':
-                    # new day
-                    if value[:value.index(' ')] != date:
-                        # get the date string 'yyyy-mm-dd'
-                        text = value[:value.index(' ')]
-                        blank_row = True
-                        date = text
-                        fg = (0.2, 0.1, 0.3, 1.0)
-                    # same day
-                    else:
-                        text = value[value.index(' ') + 1:]
-                else:
-                    text = str(value)
-
-                # add widget
-                h_align = 'left' if col == 'remark' else 'center'
-                button = Button(text=text, color=fg, halign=h_align, valign='center',
-                                size=(col_width, row_height), size_hint=(None, None),
-                                background_normal='', background_down='', background_color=bg)
-                button.text_size = button.size
-                self.ids['data_table'].add_widget(button)
-
-                # add blank row for new day
-                if blank_row:
-                    # add blank widget
-                    for j in range(trade_journal.shape[1] - 1):
-                        self.ids['data_table'].add_widget(Widget())
-
-                    # add time again
-                    button = Button(text=value[value.index(' ')+1:], halign=h_align, valign='center',
-                                    size=(col_width, row_height), size_hint=(None, None),
-                                    background_normal='', background_down='', background_color=bg)
-                    button.text_size = button.size
-                    self.ids['data_table'].add_widget(button)
-
-        # fill up the space
-        self.ids['data_table'].add_widget(Widget())
+        for create_time, code, trd_side, price, qty, status, remark in zip(
+                *(fills[col] for col in ('create_time', 'code', 'trd_side', 'price', 'qty', 'status', 'remark'))):
+            day, time_ = create_time.split(' ', 1)
+            # new day
+            if day != date:
+                date = day
+                rows.append(dict(BLANK_ROW, create_time=day, time_color=(0.2, 0.1, 0.3, 1.0)))
+
+            side_color = (0.6, 0.8, 1.0, 1.0) if trd_side == 'BUY' else (1.0, 0.8, 0.6, 1)
+            rows.append(dict(BLANK_ROW, create_time=time_, code=str(code), trd_side=str(trd_side), price=str(price),
+                             qty=str(qty), status=str(status), remark=str(remark), side_color=side_color))
+
+        return rows
 
     # ------------------------------------------------------------------------------------------- #
     """ button's callback """
@@ -162,8 +156,36 @@ class TradeJournal(Widget):
         self.main_app.popup.content = Label(text="Loading data...")
         self.main_app.popup.open()
         trade_journal = self.main_app.futu.refresh_trade_journal(self.start_date, self.end_date)
+        self.time_range = self.main_app.futu.get_time_range(self.start_date, self.end_date)
         self.update_table(trade_journal)
         self.main_app.popup.dismiss()
 
     def update_filter(self, instance=None):
-        self.refresh()
+        self.page = 0
+        self.filter_journal()
+
+    def previous_page(self, instance=None):
+        if self.page > 0:
+            self.show_page(self.page - 1)
+
+    def next_page(self, instance=None):
+        if self.page < self.get_page_count() - 1:
+            self.show_page(self.page + 1)
+
+
+def _add_latest(fills: pd.DataFrame, journal: pd.DataFrame) -> pd.DataFrame:
+    """
+    :param fills: new fills, latest first
+    :param journal: shown fills, latest first
+    :return: fills and journal, latest first (later fills first for the same time, as JournalCache)
+    """
+    if fills.empty:
+        return journal
+    if journal.empty:
+        return fills
+
+    journal_ = pd.concat([fills, journal], ignore_index=True)
+    if fills['create_time'].iloc[-1] < journal['create_time'].iloc[0]:
+        journal_ = journal_.sort_values('create_time', ascending=False, kind='stable', ignore_index=True)
+
+    return journal_
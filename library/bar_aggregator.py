@@ -0,0 +1,177 @@
+"""
+Higher timeframe bars built from 1-minute bars (HKFE sessions)
+
+sessions: morning 09:15-12:00, afternoon 13:00-16:30, night 17:15-03:00 (next morning)
+a trading day starts with the morning session and ends with the night session (as AlgoTemplate start/ timeout)
+  - timeframes: 'Nm' (e.g. '5m' '15m' '60m'), 'session', 'daily'
+  - minute bars are anchored at the session start and never span a break, the last bar of a session may be shorter
+    (e.g. '60m': 10:15, 11:15, 12:00)
+  - bars are labelled with their end time, as the minute bars in the database ('daily': date of the trading day)
+  - minute bars outside the session hours (pre-opening auction, late prints) are merged into the next session
+aggregate(): whole dataframe at once (backtesting), BarAggregator: bar by bar (live), both give the same bars
+  - BarAggregator closes an intraday bar with its last minute bar, a 'daily' bar with the first bar of the next day
+"""
+import datetime as dt
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# (start, end) in seconds from the midnight of the trading day
+SESSIONS = ((9 * 3600 + 15 * 60, 12 * 3600),
+            (13 * 3600, 16 * 3600 + 30 * 60),
+            (17 * 3600 + 15 * 60, 27 * 3600))
+NIGHT_SESSION_END = 3 * 3600  # bars up to 03:00 belong to the night session of the previous trading day
+COLUMNS = ('time_key', 'open', 'high', 'low', 'close', 'volume')
+
+
+def get_minutes(timeframe: str) -> int | None:
+    """
+    :return: length of bar in minutes, None: 'session' or 'daily'
+    """
+    if timeframe in ('session', 'daily'):
+        return None
+    if timeframe.endswith('m') and timeframe[:-1].isdigit() and int(timeframe[:-1]) > 0:
+        return int(timeframe[:-1])
+
+    raise ValueError(f"unknown timeframe '{timeframe}', use e.g. '5m', 'session' or 'daily'")
+
+
+def get_labels(time_key: np.ndarray, timeframe: str, label: str = 'end') -> np.ndarray:
+    """
+    end time of the bar (of 'timeframe') which every minute bar belongs to
+    :param time_key: datetime64 array of minute bars
+    :param label: 'end': minute bars are labelled with their end time, 'start': with their start time (IB live bars)
+    :return: datetime64[ns] array
+    """
+    minutes = get_minutes(timeframe)
+    end = np.asarray(time_key, dtype='datetime64[ns]')
+    if label == 'start':
+        end = end + np.timedelta64(1, 'm')
+
+    # trading day and seconds from its midnight (night session after midnight: + 24 hours)
+    midnight = end.astype('datetime64[D]')
+    seconds = (end - midnight).astype('timedelta64[s]').astype(np.int64)
+    after_midnight = seconds <= NIGHT_SESSION_END
+    trading_day = midnight - after_midnight.astype('timedelta64[D]')
+    seconds = seconds + after_midnight * 86400
+    if timeframe == 'daily':
+        return trading_day.astype('datetime64[ns]')
+
+    # session: the first one which ends at or after the bar
+    starts = np.array([start for start, end_ in SESSIONS])
+    ends = np.array([end_ for start, end_ in SESSIONS])
+    session = np.searchsorted(ends, seconds, side='left')
+    start, length = starts[session], ends[session] - starts[session]
+
+    # bucket within the session, counted from the session start
+    if minutes is None:
+        bucket_end = length
+    else:
+        bucket = np.clip((seconds - 60 - start) // (minutes * 60), 0, None)
+        bucket_end = np.minimum((bucket + 1) * minutes * 60, length)
+
+    return trading_day.astype('datetime64[ns]') + (start + bucket_end).astype('timedelta64[s]')
+
+
+def aggregate(kline: pd.DataFrame, timeframe: str, label: str = 'end') -> pd.DataFrame:
+    """
+    build bars of 'timeframe' from minute bars
+    :param kline: minute bars sorted by time (columns: 'time_key' 'open' 'high' 'low' 'close' 'volume')
+    :param timeframe: 'Nm' 'session' or 'daily'
+    :param label: time label of the minute bars, 'end' or 'start'
+    :return: dataframe (columns: 'time_key' 'open' 'high' 'low' 'close' 'volume'), 'time_key': end of bar
+    """
+    if kline.empty:
+        return pd.DataFrame(columns=list(COLUMNS))
+
+    labels = get_labels(kline['time_key'].to_numpy(dtype='datetime64[ns]'), timeframe, label)
+    first = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    last = np.r_[first[1:], len(labels)] - 1
+
+    return pd.DataFrame({'time_key': labels[first],
+                         'open': kline['open'].to_numpy()[first],
+                         'high': np.maximum.reduceat(kline['high'].to_numpy(), first),
+                         'low': np.minimum.reduceat(kline['low'].to_numpy(), first),
+                         'close': kline['close'].to_numpy()[last],
+                         'volume': np.add.reduceat(kline['volume'].to_numpy(), first)})
+
+
+class BarAggregator:
+    def __init__(self, timeframes: tuple = ('5m', '15m', '60m', 'session', 'daily'), label: str = 'end',
+                 maxlen: int = 5000):
+        """
+        build bars of higher timeframes incrementally from closed minute bars
+        :param timeframes: 'Nm' 'session' or 'daily'
+        :param label: time label of the minute bars, 'end' or 'start'
+        :param maxlen: number of closed bars kept per timeframe
+        """
+        for timeframe in timeframes:
+            get_minutes(timeframe)  # validate
+        self.timeframes = tuple(timeframes)
+        self.label = label
+        self.current = {timeframe: None for timeframe in self.timeframes}  # bar in progress
+        self.closed = {timeframe: deque(maxlen=maxlen) for timeframe in self.timeframes}
+        self.subscribers = {timeframe: [] for timeframe in self.timeframes}
+
+    def subscribe(self, timeframe: str, callback):
+        """
+        :param callback: called with the bar (dict, keys: 'time_key' 'open' 'high' 'low' 'close' 'volume')
+                         whenever a bar of 'timeframe' is closed
+        """
+        self.subscribers[timeframe].append(callback)
+
+    def update(self, time_key: dt.datetime, open_: float, high: float, low: float, close: float,
+               volume: float) -> list:
+        """
+        add a closed minute bar
+        :return: closed bars [(timeframe, bar), ...]
+        """
+        end = np.datetime64(time_key, 'ns') + (np.timedelta64(1, 'm') if self.label == 'start' else 0)
+        closed = []
+        for timeframe in self.timeframes:
+            bar_end = get_labels(np.array([end]), timeframe)[0]
+            bar = self.current[timeframe]
+
+            # a new bar starts
+            if bar is not None and bar['time_key'] != bar_end:
+                closed.append((timeframe, self._close(timeframe)))
+                bar = None
+            if bar is None:
+                bar = self.current[timeframe] = {'time_key': bar_end, 'open': open_, 'high': high, 'low': low,
+                                                 'close': close, 'volume': volume}
+            else:
+                bar['high'] = max(bar['high'], high)
+                bar['low'] = min(bar['low'], low)
+                bar['close'] = close
+                bar['volume'] += volume
+
+            # the minute bar at the end of an intraday bar completes it
+            if timeframe != 'daily' and end >= bar_end:
+                closed.append((timeframe, self._close(timeframe)))
+
+        return closed
+
+    def flush(self) -> list:
+        """
+        close the bars in progress, e.g. at the end of data
+        :return: closed bars [(timeframe, bar), ...]
+        """
+        return [(timeframe, self._close(timeframe)) for timeframe in self.timeframes
+                if self.current[timeframe] is not None]
+
+    def get_bars(self, timeframe: str) -> pd.DataFrame:
+        """
+        :return: closed bars of 'timeframe' (columns: 'time_key' 'open' 'high' 'low' 'close' 'volume')
+        """
+        return pd.DataFrame(list(self.closed[timeframe]), columns=list(COLUMNS))
+
+    def _close(self, timeframe: str) -> dict:
+        bar = self.current[timeframe]
+        bar['time_key'] = pd.Timestamp(bar['time_key']).to_pydatetime()
+        self.current[timeframe] = None
+        self.closed[timeframe].append(bar)
+        for callback in self.subscribers[timeframe]:
+            callback(bar)
+
+        return bar
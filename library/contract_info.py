@@ -53,3 +53,32 @@ def get_contract_year_and_month() -> (str, str):
             contract_year = str(dt.date.today().year + 1)[-2:]
 
     return contract_year, contract_month
+
+
+def get_expiry_date(year: int, month: int) -> dt.date:
+    """
+    return the last trading day of the FHSI contract:
+    the business day immediately preceding the last business day of the contract month
+    """
+    date_ = dt.date(year, month, calendar.monthrange(year, month)[1])
+    business_days = 0
+    while True:
+        if not check_is_holiday(date_):
+            business_days += 1
+            if business_days == 2:
+                return date_
+        date_ -= dt.timedelta(days=1)
+
+
+def get_rollover_date(year: int, month: int, days_before_expiry: int) -> dt.date:
+    """
+    return the trading day which is 'days_before_expiry' trading days earlier than the contract expiry date
+    (0 means the expiry date itself)
+    """
+    date_ = get_expiry_date(year, month)
+    while days_before_expiry > 0:
+        date_ -= dt.timedelta(days=1)
+        if not check_is_holiday(date_):
+            days_before_expiry -= 1
+
+    return date_
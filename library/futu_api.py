@@ -7,6 +7,8 @@ import threading as th
 import uuid
 
 from library.contract_info import get_contract_year_and_month
+from library.journal_store import JournalCache, JournalStore
+from library.position_engine import PositionEngine
 from library.programme import is_running
 
 import futu as ft
@@ -40,13 +42,20 @@ class FutuApi:
         mode = 'demo' if self.main_app.is_demo else 'real'
         self.trade_journal_file_path = os.path.join(
             self.project_directory, 'database', 'trade_journal', f'trade_journal_{mode}.csv'
-        )
+        )  # imported into the journal store once
+        self.journal = JournalCache(JournalStore(
+            os.path.join(self.project_directory, 'database', 'trade_journal', f'trade_journal_{mode}.db'),
+            csv_path=self.trade_journal_file_path
+        ))  # loaded once, subscribers are notified of new fills
+        self.positions = PositionEngine(point_value=10, fee_per_contract=self.fees_count('MHI', 1))
+        self.journal.subscribe(self.positions.apply_fills)
         self.order_journal = pd.DataFrame()  # used for 'trade history' page, assign 'remark' to trade_journal
         self.demo_order_id = ''
         self.qot_ctx = None
         self.trd_ctx = None
         self.contract_detail = {}  # to be set later
         self.timer = th.Timer(0, lambda: 0)
+        self.order_lock = th.Lock()  # strategies are evaluated concurrently, orders are placed one by one
 
     # ------------------------------------------------------------------------------------------- #
     """ broker connection """
@@ -69,6 +78,7 @@ class FutuApi:
 
     def close_all_connection(self):
         self.timer.cancel()
+        self.journal.store.close()
         if self.qot_ctx is not None and self.trd_ctx is not None:
             self.qot_ctx.close()
             self.trd_ctx.close()
@@ -104,10 +114,15 @@ class FutuApi:
     # ------------------------------------------------------------------------------------------- #
     """ trading operation """
     # ------------------------------------------------------------------------------------------- #
-    def fire_trade(self, side: str, qty: int, remark: str, order_type='MARKET'):
+    def fire_trade(self, side: str, qty: int, remark: str, order_type='MARKET') -> int | None:
+        """
+        :return: price of the order, None if it is not placed
+        """
         if not self.qot_ctx or not self.trd_ctx:
             logging.critical("Futu OpenD connection is not ready, please try again later.")
-            return
+            return None
+
+        strategy_name = remark.split('-')[0]  # for latency stages
 
         def demo_order():
             # get market data (orderbook)
@@ -117,6 +132,7 @@ class FutuApi:
                 bid_price, ask_price = 20000, 20002  # sample price for running
             else:
                 bid_price, ask_price = ret_data['Bid'][0][0], ret_data['Ask'][0][0]
+            self.main_app.latency.mark(f'{strategy_name} order sent')
 
             # set trading params
             exec_price = bid_price if side == 'SELL' else ask_price
@@ -125,24 +141,30 @@ class FutuApi:
             # update order history and deal history
             self.update_demo_order_history(create_time, side, abs(qty), exec_price, remark, order_type)
             self.update_demo_trade_deal_history(create_time, side, abs(qty), exec_price)
+            self.main_app.latency.mark(f'{strategy_name} fill received')
 
             # for separate order
             if separate_qty:
                 th.Timer(interval=0.5, function=self.fire_trade,
                          args=[side, separate_qty, remark + '(separate order)', order_type]).start()
 
+            return exec_price
+
         def real_order():
             logging.critical("Place read order.")
+            self.main_app.latency.mark(f'{strategy_name} order sent')
+            # todo: return the price once real orders are placed
 
-        # check if separate order needed
-        total_inv = abs(sum([strategy.inv_real for strategy in self.algo.strategies.values()]))
-        separate_qty = 0
-        if total_inv > 0 and side == 'SELL' or total_inv < 0 and side == 'BUY':
-            if qty > abs(total_inv):
-                separate_qty, qty = qty - total_inv, total_inv
+        with self.order_lock:
+            # check if separate order needed
+            total_inv = abs(sum([strategy.inv_real for strategy in self.algo.strategies.values()]))
+            separate_qty = 0
+            if total_inv > 0 and side == 'SELL' or total_inv < 0 and side == 'BUY':
+                if qty > abs(total_inv):
+                    separate_qty, qty = qty - total_inv, total_inv
 
-        # place order
-        demo_order() if self.main_app.is_demo else real_order()
+            # place order
+            return demo_order() if self.main_app.is_demo else real_order()
 
     # ------------------------------------------------------------------------------------------- #
     """ database operation """
@@ -165,14 +187,18 @@ class FutuApi:
         }
         return True
 
-    def get_trade_journal(self) -> pd.DataFrame:
+    def get_trade_journal(self, start_date: dt.date = None, end_date: dt.date = None, strategy: str = None,
+                          limit: int = None) -> pd.DataFrame:
+        """
+        fills from the in-memory journal, latest first
+        :param start_date, end_date: trading days (see get_time_range), None: all fills
+        :param strategy: strategy name, None: all strategies
+        :param limit: max number of fills
+        """
         if self.main_app.is_demo:
-            # read local csv file
-            if os.path.isfile(self.trade_journal_file_path):
-                logging.debug(f"read {self.trade_journal_file_path}")
-                return pd.read_csv(self.trade_journal_file_path)
-            else:
-                return pd.DataFrame()
+            start, end = self.get_time_range(start_date, end_date) if start_date is not None else (None, None)
+            trade_journal = self.journal.query(start, end, strategy, limit)
+            return trade_journal if not trade_journal.empty else pd.DataFrame()
         else:
             # request futu-api
             pass
@@ -182,9 +208,7 @@ class FutuApi:
         Callback from trade_journal 'refresh' button
         """
         if trade_journal.empty:
-            trade_journal = self.get_trade_journal()
-            if not trade_journal.empty:
-                trade_journal = self.filter_trade_journal(self.get_trade_journal(), start_date, end_date)
+            trade_journal = self.get_trade_journal(start_date, end_date)
 
         return trade_journal
 
@@ -247,7 +271,6 @@ class FutuApi:
         data = self.format_trade_journal(data)
 
         # add remark value
-        trade_journal = self.get_trade_journal()
         for i, row in data.iterrows():
             # filter order id
             order_id = row['order_id']
@@ -257,9 +280,9 @@ class FutuApi:
                 return
             data.at[i, 'remark'] = df['remark'][0]
 
-        # write to database
+        # write to database and memory, subscribers refresh from memory
         data = data.drop(['order_id'], axis=1)
-        pd.concat([data, trade_journal], ignore_index=True).to_csv(self.trade_journal_file_path, index=False)
+        self.journal.append(data)
 
     # ------------------------------------------------------------------------------------------- #
     """ algo related """
@@ -268,76 +291,31 @@ class FutuApi:
         """
         callback from algo_trade: to return a ready shown table for algo_trade
         """
+        # positions are loaded once per date range, new fills are added by the journal subscription
+        time_range = self.get_time_range(start_date, end_date)
+        if self.positions.time_range != time_range:
+            self.load_positions(time_range)
+
         # initialize algo_table dataframe
         algo_table_cols = ['Status', 'Strategy', 'ExecSet', 'Inventory', 'P / L', 'MaxCtrt', 'AvgPrice',
                            'TradedQty', 'Fees', 'Order', 'InitMargin']
-        algo_table = pd.DataFrame(columns=algo_table_cols)
-
-        # get trade journal
-        trade_journal = self.get_trade_journal()
-        if not trade_journal.empty:
-            trade_journal = self.filter_trade_journal(self.get_trade_journal(), start_date, end_date)
-
-        # return dataframe with no trading record
-        if trade_journal.empty:
-            for k in strategies_name:
-                new_index = len(algo_table)
-                algo_table.loc[new_index] = pd.Series()
-                algo_table.fillna(0, inplace=True)
-                algo_table.at[new_index, 'Strategy'] = k
-
-            return algo_table
-
-        # separate data by strategy name
-        datas = {}
-        for i in strategies_name:
-            datas[i] = trade_journal[(trade_journal['remark'].str[:3] == i)]
-
-        # calculate trading values
-        for strategy_name, trade_data in datas.items():
-            new_index = len(algo_table)
-            algo_table.loc[new_index] = pd.Series()
-            algo_table.fillna(0, inplace=True)
-            position, avg_price, trade_vol, fees, pnl_value = self.calculate_trading_data(trade_data)
+        rows = []
+        for strategy_name in strategies_name:
+            position, avg_price, trade_vol, fees, pnl_value = self.positions.get(strategy_name)
             # todo: position should be flipped if in reverse mode
-            algo_table.at[new_index, 'Strategy'] = strategy_name
-            algo_table.at[new_index, 'Inventory'] = position
-            algo_table.at[new_index, 'AvgPrice'] = avg_price
-            algo_table.at[new_index, 'TradedQty'] = trade_vol
-            algo_table.at[new_index, 'Fees'] = fees
-            algo_table.at[new_index, 'P / L'] = pnl_value
-
-        return algo_table
-
-    def calculate_trading_data(self, trade_journal: pd.DataFrame):
-        position = buy_avg_price = sell_avg_price = avg_price = trade_vol = pnl_price = 0
-        symbol = 'MHI'
-        for i, row in trade_journal[::-1].iterrows():
-            side, price, qty = row['trd_side'], row['price'], row['qty']
-
-            # calculate buy/sell average price
-            if 'BUY' in side:
-                position += qty
-                buy_avg_price += price * qty
-            elif 'SELL' in side:
-                position -= qty
-                sell_avg_price += price * qty
-            trade_vol += qty
-
-            # calculate average price
-            if position == 0:
-                pnl_price += sell_avg_price - buy_avg_price
-                buy_avg_price = sell_avg_price = 0
-            else:
-                avg_price = buy_avg_price - sell_avg_price
+            row = dict.fromkeys(algo_table_cols, 0)
+            row.update({'Strategy': strategy_name, 'Inventory': position, 'AvgPrice': avg_price,
+                        'TradedQty': trade_vol, 'Fees': fees, 'P / L': pnl_value})
+            rows.append(row)
 
-        # calculate fees, average_price and pnl
-        point_value = 10
-        fees = self.fees_count(symbol, trade_vol)
-        avg_price = avg_price / position if position else 0
-        pnl_value = pnl_price * point_value - fees
+        return pd.DataFrame(rows, columns=algo_table_cols, dtype=object)
 
-        return int(position), abs(int(avg_price)), trade_vol, int(fees), int(pnl_value)
+    def load_positions(self, time_range: (str, str)):
+        """
+        rebuild the positions from the fills in time_range ('create_time' start, end)
+        """
+        with self.journal.lock:  # no fill is added between the query and the load
+            self.positions.load(self.journal.query(*time_range), time_range)
 
     # ------------------------------------------------------------------------------------------- #
     """ update gui """
@@ -355,11 +333,19 @@ class FutuApi:
         """
         to filter the date between start_date and end_date
         """
+        start, end = self.get_time_range(start_date, end_date)
+
+        return df[(df['create_time'] >= start) & (df['create_time'] <= end)].reset_index(drop=True)
+
+    def get_time_range(self, start_date: dt.date, end_date: dt.date) -> (str, str):
+        """
+        'create_time' range of the trading days from start_date to end_date (the night session ends next day)
+        """
         start = dt.datetime.strftime(start_date, '%Y-%m-%d') + ' 09:16:00'
         end = end_date + dt.timedelta(days=1)
         end = dt.datetime.strftime(end, '%Y-%m-%d') + ' 03:00:00'
 
-        return df[(df['create_time'] >= start) & (df['create_time'] <= end)].reset_index(drop=True)
+        return start, end
 
     def cal_algo_data(self, trade_journal: pd.DataFrame, strategy_name: str) -> (int, int, int, int, int):
         pass
@@ -5,9 +5,10 @@ import random
 import socket
 import threading as th
 
-import pandas as pd
-
+from library.bar_aggregator import BarAggregator
 from library.contract_info import get_contract_year_and_month
+from library.market_data import MarketDataDispatcher
+from library.ring_buffer import KlineBuffer
 
 from ibapi.client import EClient
 from ibapi.wrapper import EWrapper, BarData, TickerId, TickType, TickAttrib
@@ -17,6 +18,9 @@ os.environ['KIVY_LOG_MODE'] = 'MIXED'
 from kivy.app import App
 from kivy.clock import Clock
 
+KLINE_CAPACITY = 5000  # minute bars kept for strategies, more than the 2 days of historical data
+OHLC_REFRESH_RATE = 2  # Hz, daily OHLC labels
+
 
 class IBApi(EWrapper, EClient):
     def __init__(self):
@@ -28,7 +32,16 @@ class IBApi(EWrapper, EClient):
         self.request_id = {'FHSI_1M': 10000,
                            'FHSI_1D': 100001}
         self.lock = th.Lock()
-        self.kline = pd.DataFrame(columns=['code', 'open', 'high', 'low', 'close', 'volume', 'time_key'])
+        self.kline = KlineBuffer(code='FHSI', capacity=KLINE_CAPACITY)
+        self.bar_aggregator = BarAggregator(label='start')  # IB bars are labelled with their start time
+        self.last_aggregated = None  # time_key of the last minute bar added to bar_aggregator
+
+        # market data consumers: strategies on closed bars, gui labels throttled, P&L coalesced by its own service
+        self.market_data = MarketDataDispatcher()
+        self.market_data.subscribe('FHSI_1M', self.on_bar_close, mode='bar_close')
+        self.market_data.subscribe('FHSI_1D', self.update_realtime_OHLC, mode='latest', rate=OHLC_REFRESH_RATE)
+        self.market_data.subscribe('FHSI_LAST', self.algo.update_realtime_pnl, mode='tick')
+        Clock.schedule_interval(lambda time_: self.market_data.flush(), self.market_data.get_flush_interval())
 
         # setup contract
         self.contract = Contract()
@@ -87,13 +100,25 @@ class IBApi(EWrapper, EClient):
 
     def historicalDataUpdate(self, reqId: int, bar: BarData):
         if reqId == self.request_id.get('FHSI_1M'):
-            Clock.schedule_once(lambda time_: self.update_kline(bar), 0)
+            self.market_data.publish('FHSI_1M', bar, key=bar.date)
         elif reqId == self.request_id.get('FHSI_1D'):
-            self.algo.update_realtime_OHLC(bar.open, bar.high, bar.low, bar.close)
+            self.market_data.publish('FHSI_1D', bar)
 
     def tickPrice(self, reqId: TickerId , tickType: TickType, price: float, attrib: TickAttrib):
         if reqId == self.request_id.get('FHSI_1M') and tickType == 4:  # last price at which the contract traded
-            self.algo.update_realtime_pnl(price)
+            self.market_data.publish('FHSI_LAST', price)
+
+    # ------------------------------------------------------------------------------------------- #
+    """ market data consumers """
+    # ------------------------------------------------------------------------------------------- #
+    def on_bar_close(self, bar: BarData):
+        """
+        last update of a closed minute bar (IB reader thread, when the first update of the next bar comes)
+        """
+        self.main_app.strategy_executor.submit(self.update_kline, bar, self.main_app.latency.now())
+
+    def update_realtime_OHLC(self, bar: BarData):
+        self.algo.update_realtime_OHLC(bar.open, bar.high, bar.low, bar.close)
 
     # ------------------------------------------------------------------------------------------- #
     """ algo methods """
@@ -103,21 +128,42 @@ class IBApi(EWrapper, EClient):
         to build the kline from historical data
         """
         time_key = dt.datetime.strptime(bar.date, '%Y%m%d  %H:%M:%S')
-        new_row = pd.Series(
-            dict(zip(['code', 'open', 'high', 'low', 'close', 'volume', 'time_key'],
-                     ['FHSI', bar.open, bar.high, bar.low, bar.close, bar.volume, time_key]))
-        )
-        self.kline.loc[len(self.kline)] = new_row
+        self.kline.append(time_key, bar.open, bar.high, bar.low, bar.close, float(bar.volume))
 
-    def update_kline(self, bar: BarData):
+    def update_kline(self, bar: BarData, received_ns: int = None):
+        """
+        add the closed bar and evaluate the strategies
+        :param bar: last update of the closed bar
+        :param received_ns: monotonic ns of the IB callback, start of the latency trace
+        """
         with self.lock:
             time_key = dt.datetime.strptime(bar.date, '%Y%m%d  %H:%M:%S')
-            # check if new bar comes
-            if time_key != self.kline['time_key'][self.kline.index[-1]]:
-                self.algo.update_kline(self.kline.copy())
-                self.init_kline(bar)
+            # the last bar of the historical data was still in progress
+            if time_key == self.kline.get_last_time_key():
+                self.kline.update_last(time_key, bar.open, bar.high, bar.low, bar.close, float(bar.volume))
             else:
-                self.kline.loc[self.kline.index[-1]] = pd.Series(
-                    dict(zip(['code', 'open', 'high', 'low', 'close', 'volume', 'time_key'],
-                             ['FHSI', bar.open, bar.high, bar.low, bar.close, bar.volume, time_key]))
-                )
+                self.init_kline(bar)
+
+            latency = self.main_app.latency
+            latency.begin(time_key, received_ns)
+            latency.mark('executor start')
+            self.update_bar_aggregator()
+            self.algo.update_kline(self.kline.to_frame())
+            latency.end()
+
+    def subscribe_bars(self, timeframe: str, callback):
+        """
+        :param callback: called with closed bars of 'timeframe' ([dict, ...]), at once with the bars closed so far,
+                         then with every bar closed by update_kline (before the strategies evaluate the minute bar)
+        """
+        with self.lock:
+            callback(list(self.bar_aggregator.closed[timeframe]))
+            self.bar_aggregator.subscribe(timeframe, lambda bar: callback([bar]))
+
+    def update_bar_aggregator(self):
+        """
+        add the closed minute bars (including the historical ones at the first call) to the higher timeframes
+        """
+        for row in self.kline.to_frame(since=self.last_aggregated).itertuples(index=False):
+            self.bar_aggregator.update(row.time_key, row.open, row.high, row.low, row.close, row.volume)
+        self.last_aggregated = self.kline.get_last_time_key()
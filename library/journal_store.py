@@ -0,0 +1,197 @@
+"""
+Trade journal in SQLite (WAL mode)
+
+fills are appended as rows, nothing is rewritten, reads are indexed range queries by time and strategy
+  - the strategy of a fill is the first 3 characters of its remark (e.g. 'MAL-LE' -> 'MAL'), as in the algo table
+  - an existing CSV journal is imported once when the database is created
+  - query() returns the same columns and order (latest first) as the CSV journal did
+JournalCache: the journal loaded once into memory, kept up to date by its own appends, subscribers are notified
+  - appended fills are buffered, they are merged into the journal when the whole journal is read
+  - the latest fill of every strategy is kept, a query of the latest fill of a strategy is answered from it
+  - other queries with a time range, strategy or limit are the indexed queries of the store
+"""
+import logging
+import os
+import sqlite3
+import threading as th
+
+import pandas as pd
+
+COLUMNS = ('create_time', 'code', 'trd_side', 'price', 'qty', 'status', 'remark')
+
+
+class JournalStore:
+    def __init__(self, path: os.path, csv_path: os.path = None):
+        """
+        :param path: database file
+        :param csv_path: CSV journal to be imported if the database is new
+        """
+        self.path = path
+        self.lock = th.Lock()  # one connection shared by the executor, the strategy pool and the gui
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')  # durable at checkpoints, no fsync per fill
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS trades (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    create_time TEXT NOT NULL,
+                    code TEXT,
+                    trd_side TEXT,
+                    price REAL,
+                    qty INTEGER,
+                    status TEXT,
+                    remark TEXT,
+                    strategy TEXT
+                )""")
+            self.connection.execute('CREATE INDEX IF NOT EXISTS trades_time ON trades (create_time)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS trades_strategy_time ON trades (strategy, create_time)')
+
+        if csv_path is not None and os.path.isfile(csv_path) and not len(self):
+            self.import_csv(csv_path)
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM trades').fetchone()[0]
+
+    def append(self, data: pd.DataFrame):
+        """
+        :param data: fills (columns: 'create_time' 'code' 'trd_side' 'price' 'qty' 'status' 'remark')
+        """
+        rows = [(*(_to_sql(value) for value in row), None if pd.isna(row[-1]) else str(row[-1])[:3])
+                for row in data[list(COLUMNS)].itertuples(index=False)]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT INTO trades (create_time, code, trd_side, price, qty, status, remark, strategy) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows
+            )
+
+    def query(self, start: str = None, end: str = None, strategy: str = None, limit: int = None) -> pd.DataFrame:
+        """
+        :param start: earliest 'create_time' (inclusive), e.g. '2023-06-01 09:16:00'
+        :param end: latest 'create_time' (inclusive)
+        :param strategy: e.g. 'MAL'
+        :param limit: max number of fills (latest first)
+        :return: dataframe (columns: 'create_time' 'code' 'trd_side' 'price' 'qty' 'status' 'remark'), latest first
+        """
+        conditions, params = [], []
+        for condition, value in (('create_time >= ?', start), ('create_time <= ?', end), ('strategy = ?', strategy)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM trades"
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY create_time DESC, id DESC'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+
+        with self.lock:
+            rows = self.connection.execute(sql, params).fetchall()
+
+        return pd.DataFrame(rows, columns=list(COLUMNS))
+
+    def import_csv(self, csv_path: os.path):
+        journal = pd.read_csv(csv_path)
+        self.append(journal[::-1])  # the CSV is latest first, the table is in order of fills
+        logging.info(f"{len(journal)} fills imported from {csv_path}")
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class JournalCache:
+    def __init__(self, store: JournalStore):
+        """
+        :param store: fills are read once and appended through the cache
+        """
+        self.store = store
+        self.lock = th.RLock()  # also held by subscribers and by readers which must not miss a fill
+        self.subscribers = []
+        self._journal = self._with_strategy(store.query())  # latest first, without the buffered fills
+        self._pending = []  # fills appended since the journal was merged, [dataframe (latest first), ...]
+        self._is_sorted = True  # False: a buffered fill is earlier than a fill before it
+        self._last_time = self._journal['create_time'].iloc[0] if len(self._journal) else None
+        self._latest = {}  # key: strategy, value: latest fill (values of COLUMNS)
+        self._update_latest(self._journal[::-1])
+
+    def subscribe(self, callback):
+        """
+        :param callback: called with the new fills (dataframe, in order of fills) after every append, in the thread
+                         of the writer, while the journal is locked (keep it short)
+        """
+        self.subscribers.append(callback)
+
+    def append(self, data: pd.DataFrame):
+        """
+        the store and the memory are changed under the same lock: appends reach both in the same order,
+        a failed write raises before the memory is changed
+        :param data: fills (columns: 'create_time' 'code' 'trd_side' 'price' 'qty' 'status' 'remark')
+        """
+        new = self._with_strategy(data[list(COLUMNS)][::-1])
+        with self.lock:
+            self.store.append(data)
+
+            self._pending.append(new)
+            if self._last_time is not None and new['create_time'].min() < self._last_time:
+                self._is_sorted = False
+            self._last_time = max(new['create_time'].max(), self._last_time or '')
+            self._update_latest(new[::-1])
+
+            for callback in self.subscribers:
+                callback(data)
+
+    def query(self, start: str = None, end: str = None, strategy: str = None, limit: int = None) -> pd.DataFrame:
+        """
+        same as JournalStore.query
+        """
+        # latest fill of a strategy
+        if strategy is not None and limit == 1:
+            with self.lock:
+                latest = self._latest.get(strategy)
+            if latest is None or (start is not None and latest[0] < start):
+                return pd.DataFrame(columns=list(COLUMNS))
+            if end is None or latest[0] <= end:
+                return pd.DataFrame([latest], columns=list(COLUMNS))
+
+        if start is not None or end is not None or strategy is not None or limit is not None:
+            return self.store.query(start, end, strategy, limit)
+
+        return self._get_journal()[list(COLUMNS)]
+
+    def _get_journal(self) -> pd.DataFrame:
+        """
+        :return: all fills (columns: COLUMNS and 'strategy'), latest first, later fills first for the same time
+        """
+        with self.lock:
+            if self._pending:
+                journal = pd.concat([*self._pending[::-1], self._journal], ignore_index=True)
+                if not self._is_sorted:
+                    journal = journal.sort_values('create_time', ascending=False, kind='stable', ignore_index=True)
+                self._journal, self._pending, self._is_sorted = journal, [], True
+
+            return self._journal
+
+    def _update_latest(self, fills: pd.DataFrame):
+        """
+        :param fills: in order of fills
+        """
+        for fill in fills[list(COLUMNS)].itertuples(index=False, name=None):
+            strategy = fill[-1][:3] if isinstance(fill[-1], str) else None
+            latest = self._latest.get(strategy)
+            if strategy is not None and (latest is None or fill[0] >= latest[0]):
+                self._latest[strategy] = fill
+
+    @staticmethod
+    def _with_strategy(journal: pd.DataFrame) -> pd.DataFrame:
+        journal = journal.reset_index(drop=True)
+        journal['strategy'] = journal['remark'].str[:3]
+        return journal
+
+
+def _to_sql(value):
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, 'item') else value  # NumPy scalars to Python values
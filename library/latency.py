@@ -0,0 +1,87 @@
+"""
+Latency of the live hot path: from a closed bar to the order
+
+every closed bar starts a trace, the stages of the bar are marked with monotonic timestamps:
+    'bar received'      IB callback with the first update of the next bar
+    'executor start'    the strategy executor takes the bar
+    '<strategy> start', '<strategy> end'
+    '<strategy> order built', '<strategy> order sent', '<strategy> fill received'
+the time of each stage since 'bar received' is kept for the last 'window' bars, summary() gives rolling percentiles
+marking a stage costs a clock read and an append, statistics are only calculated on summary() / export()
+"""
+import logging
+import os
+import threading as th
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+class LatencyMonitor:
+    def __init__(self, window: int = 1000):
+        """
+        :param window: number of samples per stage for the statistics
+        """
+        self.window = window
+        self.samples = {}  # key: stage, value: deque of milliseconds since 'bar received'
+        self.trace = None  # id of the bar being evaluated
+        self.trace_start = 0  # monotonic ns of 'bar received'
+        self.lock = th.Lock()
+
+    @staticmethod
+    def now() -> int:
+        return time.monotonic_ns()
+
+    def begin(self, trace_id, received_ns: int = None):
+        """
+        start the trace of a bar
+        :param trace_id: e.g. 'time_key' of the closed bar
+        :param received_ns: monotonic ns when the bar was received, default now
+        """
+        with self.lock:
+            self.trace = trace_id
+            self.trace_start = received_ns if received_ns is not None else self.now()
+            self._add('bar received', 0.)
+
+    def mark(self, stage: str):
+        """
+        mark a stage of the current bar (orders without a bar, e.g. manual orders, are not traced)
+        """
+        ns = self.now()
+        with self.lock:
+            if self.trace is not None:
+                self._add(stage, (ns - self.trace_start) / 1e6)
+
+    def end(self):
+        with self.lock:
+            self.trace = None
+
+    def summary(self) -> pd.DataFrame:
+        """
+        :return: one row per stage in the order of first appearance,
+                 columns: 'count' and 'p50' 'p90' 'p99' 'max' in milliseconds since 'bar received'
+        """
+        with self.lock:
+            samples = {stage: np.array(values) for stage, values in self.samples.items()}
+
+        rows = {stage: {'count': len(values),
+                        'p50': np.percentile(values, 50),
+                        'p90': np.percentile(values, 90),
+                        'p99': np.percentile(values, 99),
+                        'max': values.max()}
+                for stage, values in samples.items() if len(values)}
+
+        return pd.DataFrame.from_dict(rows, orient='index', columns=['count', 'p50', 'p90', 'p99', 'max']).round(3)
+
+    def log_summary(self):
+        logging.info(f"latency since bar received (ms):\n{self.summary().to_string()}")
+
+    def export(self, path: os.path):
+        self.summary().to_csv(path, index_label='stage')
+
+    def _add(self, stage: str, milliseconds: float):
+        if stage not in self.samples:
+            self.samples[stage] = deque(maxlen=self.window)
+        self.samples[stage].append(milliseconds)
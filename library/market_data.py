@@ -0,0 +1,128 @@
+"""
+Market data dispatcher between the IB reader thread and its consumers
+
+the IB callbacks publish every value of a topic, each consumer chooses how it is delivered:
+    'tick'       every value, at once, in the publisher thread
+    'latest'     the latest value at most 'rate' times per second, by flush() (kivy main thread)
+    'bar_close'  once per bar with its last value, in the publisher thread when the first value of the next bar comes
+values which are replaced before being delivered are dropped, get_stats() counts them per consumer
+"""
+import logging
+import threading as th
+import time
+
+import pandas as pd
+
+_EMPTY = object()  # no pending value
+
+
+class _Subscription:
+    def __init__(self, topic: str, callback, mode: str, rate: float = None):
+        self.topic = topic
+        self.callback = callback
+        self.mode = mode
+        self.interval = 1 / rate if rate else 0.
+        self.pending = _EMPTY  # value to be delivered ('latest'), value of the bar in progress ('bar_close')
+        self.bar_key = None  # key of the bar in progress ('bar_close')
+        self.next_time = 0.  # earliest monotonic time of the next delivery ('latest')
+        self.received = 0
+        self.delivered = 0
+
+    @property
+    def name(self) -> str:
+        return getattr(self.callback, '__name__', str(self.callback))
+
+
+class MarketDataDispatcher:
+    modes = ('tick', 'latest', 'bar_close')
+
+    def __init__(self):
+        self.subscriptions = {}  # key: topic, value: list of _Subscription
+        self.lock = th.Lock()
+
+    def subscribe(self, topic: str, callback, mode: str = 'tick', rate: float = None):
+        """
+        :param topic: e.g. 'FHSI_1M'
+        :param callback: called with the value
+        :param mode: 'tick' / 'latest' / 'bar_close'
+        :param rate: max deliveries per second ('latest' only)
+        """
+        if mode not in self.modes:
+            raise ValueError(f"mode should be one of {self.modes}, got '{mode}'.")
+        if mode == 'latest' and not rate:
+            raise ValueError("rate is required for mode 'latest'.")
+
+        with self.lock:
+            self.subscriptions.setdefault(topic, []).append(_Subscription(topic, callback, mode, rate))
+
+    def get_flush_interval(self) -> float | None:
+        """
+        :return: seconds between flush() calls for the fastest 'latest' consumer, None if there is none
+        """
+        intervals = [sub.interval for subs in self.subscriptions.values() for sub in subs if sub.mode == 'latest']
+        return min(intervals) if intervals else None
+
+    def publish(self, topic: str, value, key=None):
+        """
+        :param value: e.g. price, BarData
+        :param key: bar identifier for 'bar_close' consumers, e.g. bar.date
+        """
+        for sub in self.subscriptions.get(topic, ()):
+            closed = _EMPTY
+            with self.lock:
+                sub.received += 1
+                match sub.mode:
+                    case 'tick':
+                        closed = value
+                    case 'latest':
+                        sub.pending = value
+                    case 'bar_close':
+                        if sub.pending is not _EMPTY and key != sub.bar_key:
+                            closed = sub.pending
+                        sub.pending, sub.bar_key = value, key
+
+            if closed is not _EMPTY:
+                self._deliver(sub, closed)
+
+    def flush(self, now: float = None):
+        """
+        deliver the latest values which are due, to be called at get_flush_interval()
+        """
+        now = time.monotonic() if now is None else now
+        due = []
+        with self.lock:
+            for subs in self.subscriptions.values():
+                for sub in subs:
+                    if sub.mode == 'latest' and sub.pending is not _EMPTY and now >= sub.next_time:
+                        due.append((sub, sub.pending))
+                        sub.pending = _EMPTY
+                        sub.next_time = now + sub.interval
+
+        for sub, value in due:
+            self._deliver(sub, value)
+
+    def get_stats(self) -> pd.DataFrame:
+        """
+        :return: one row per consumer, columns: 'topic' 'consumer' 'mode' 'received' 'delivered' 'dropped'
+        """
+        with self.lock:
+            rows = [{'topic': sub.topic,
+                     'consumer': sub.name,
+                     'mode': sub.mode,
+                     'received': sub.received,
+                     'delivered': sub.delivered,
+                     'dropped': sub.received - sub.delivered - (sub.pending is not _EMPTY)}
+                    for subs in self.subscriptions.values() for sub in subs]
+
+        return pd.DataFrame(rows, columns=['topic', 'consumer', 'mode', 'received', 'delivered', 'dropped'])
+
+    def log_stats(self):
+        logging.info(f"market data:\n{self.get_stats().to_string(index=False)}")
+
+    def _deliver(self, sub: _Subscription, value):
+        try:
+            sub.callback(value)
+        except Exception:  # a failing consumer must not stop the others or the IB reader thread
+            logging.exception(f"market data: {sub.name} failed on {sub.topic}")
+        with self.lock:
+            sub.delivered += 1
@@ -0,0 +1,67 @@
+"""
+Realtime P&L of the strategies
+
+IB ticks only store the latest price (any thread, constant time), the gui collects the changes at its refresh rate:
+  - positions of the strategies are kept in NumPy arrays, set from the algo table when it is rebuilt
+  - get_changes() calculates the P&L of all strategies at once and returns only the ones whose shown value changed
+  - ticks between two refreshes are coalesced, only the latest price counts
+"""
+import threading as th
+
+import numpy as np
+import pandas as pd
+
+
+class PnlService:
+    def __init__(self, point_value: float = 10):
+        """
+        :param point_value: HKD per index point, e.g. 10 for MHI
+        """
+        self.point_value = point_value
+        self.lock = th.Lock()
+        self.names = []  # strategies, in the order of the arrays
+        self.inventory = np.zeros(0)
+        self.avg_price = np.zeros(0)
+        self.realized_pnl = np.zeros(0)
+        self.shown = np.zeros(0)  # P&L shown in the gui (rounded), nan: not shown yet
+        self.price = None  # latest price
+        self.changed = False  # new price or positions since the last get_changes()
+
+    def set_positions(self, algo_table: pd.DataFrame):
+        """
+        :param algo_table: columns 'Strategy' 'Inventory' 'AvgPrice' 'P / L' (realized P&L, after fees)
+        """
+        with self.lock:
+            if algo_table.empty:
+                self.names = []
+                self.inventory = self.avg_price = self.realized_pnl = self.shown = np.zeros(0)
+            else:
+                self.names = list(algo_table['Strategy'])
+                self.inventory = algo_table['Inventory'].to_numpy(dtype=float)
+                self.avg_price = algo_table['AvgPrice'].to_numpy(dtype=float)
+                self.realized_pnl = algo_table['P / L'].to_numpy(dtype=float)
+                self.shown = np.full(len(self.names), np.nan)  # the table shows the realized P&L again
+            self.changed = True
+
+    def update_price(self, price: float):
+        """
+        callback of the price ticks
+        """
+        with self.lock:
+            self.price = price
+            self.changed = True
+
+    def get_changes(self) -> list:
+        """
+        :return: [(strategy, realtime P&L), ...] of the strategies with inventory whose rounded P&L changed
+        """
+        with self.lock:
+            if not self.changed or self.price is None:
+                return []
+            self.changed = False
+            pnl = self.realized_pnl + (self.price - self.avg_price) * self.inventory * self.point_value
+            rounded = np.rint(pnl)
+            changed = np.flatnonzero((self.inventory != 0) & (rounded != self.shown))
+            self.shown[changed] = rounded[changed]
+
+        return [(self.names[i], pnl[i]) for i in changed]
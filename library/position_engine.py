@@ -0,0 +1,101 @@
+"""
+Position and P&L of the strategies from the trade journal
+
+the accounting of the algo table:
+  - a round trip lasts from flat to flat, its P&L is realized when the position is flat again
+  - the average price is the net cost of the open round trip divided by the position
+  - fees are charged per contract traded
+load() calculates all strategies at once with grouped cumulative sums of the fills,
+apply() adds one fill in constant time, so the algo table never rescans the history after a fill
+"""
+import threading as th
+
+import numpy as np
+import pandas as pd
+
+
+class PositionEngine:
+    def __init__(self, point_value: float = 10, fee_per_contract: float = 0.):
+        """
+        :param point_value: HKD per index point, e.g. 10 for MHI
+        :param fee_per_contract: all fees of one contract traded
+        """
+        self.point_value = point_value
+        self.fee_per_contract = fee_per_contract
+        self.lock = th.Lock()
+        self.time_range = None  # ('create_time' start, end) of the loaded fills
+        self.states = {}  # key: strategy, value: [position, open cost, realized points, traded qty]
+
+    def load(self, trade_journal: pd.DataFrame, time_range: (str, str) = None):
+        """
+        replace the positions by the ones of the fills
+        :param trade_journal: fills, latest first (columns: 'create_time' 'trd_side' 'price' 'qty' 'remark')
+        :param time_range: ('create_time' start, end) of trade_journal, later fills outside it are ignored
+        """
+        states = {}
+        if not trade_journal.empty:
+            fills = trade_journal[::-1]  # in order of fills
+            side = fills['trd_side'].astype(str)
+            sign = np.where(side.str.contains('BUY', regex=False), 1.,
+                            np.where(side.str.contains('SELL', regex=False), -1., 0.))
+            qty = fills['qty'].to_numpy(dtype=float)
+            frame = pd.DataFrame({'strategy': fills['remark'].str[:3].to_numpy(),
+                                  'position': sign * qty,
+                                  'cost': sign * qty * fills['price'].to_numpy(dtype=float),  # buy: +, sell: -
+                                  'qty': qty})
+
+            grouped = frame.groupby('strategy', sort=False)
+            frame['position'] = grouped['position'].cumsum()
+            frame['cost'] = grouped['cost'].cumsum()
+            frame['closed_cost'] = frame['cost'].where(frame['position'] == 0)  # cost of the round trips until flat
+
+            grouped = frame.groupby('strategy', sort=False)
+            totals = grouped[['position', 'cost', 'closed_cost']].last()
+            totals['closed_cost'] = totals['closed_cost'].fillna(0.)
+            totals['qty'] = grouped['qty'].sum()
+            for strategy, row in totals.iterrows():
+                states[strategy] = [row['position'], row['cost'] - row['closed_cost'], -row['closed_cost'], row['qty']]
+
+        with self.lock:
+            self.states = states
+            self.time_range = time_range
+
+    def apply(self, strategy: str, side: str, price: float, qty: float):
+        """
+        add one fill
+        :param strategy: e.g. 'MAL'
+        :param side: e.g. 'BUY', 'SELL'
+        """
+        sign = 1 if 'BUY' in side else -1 if 'SELL' in side else 0
+        with self.lock:
+            state = self.states.setdefault(strategy, [0., 0., 0., 0.])
+            state[0] += sign * qty
+            state[1] += sign * qty * price
+            state[3] += qty
+            if state[0] == 0:
+                state[2] -= state[1]  # sell - buy of the round trip
+                state[1] = 0.
+
+    def apply_fills(self, fills: pd.DataFrame):
+        """
+        add new fills of the trade journal (in order of fills), the ones outside time_range are ignored
+        """
+        if self.time_range is not None:
+            start, end = self.time_range
+            fills = fills[(fills['create_time'] >= start) & (fills['create_time'] <= end)]
+        for fill in fills.itertuples(index=False):
+            if isinstance(fill.remark, str):
+                self.apply(fill.remark[:3], str(fill.trd_side), float(fill.price), float(fill.qty))
+
+    def get(self, strategy: str) -> (int, int, int, int, int):
+        """
+        :return: position, average price, traded qty, fees, P&L (realized, after all fees)
+        """
+        with self.lock:
+            position, open_cost, realized, traded = self.states.get(strategy, (0, 0., 0., 0))
+
+        fees = self.fee_per_contract * traded
+        avg_price = open_cost / position if position else 0
+        pnl_value = realized * self.point_value - fees
+
+        return int(position), abs(int(avg_price)), int(traded), int(fees), int(pnl_value)
@@ -0,0 +1,78 @@
+"""
+Fixed capacity kline of live bars
+
+the bars are kept in preallocated NumPy arrays, the oldest bar is overwritten when the buffer is full,
+adding or updating a bar costs the same however long the session runs
+  - every value is written twice (at i and i + capacity), so the latest bars are always one contiguous slice:
+    get_array() returns a view without copying, to_frame() copies it once into a dataframe
+"""
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+
+class KlineBuffer:
+    columns = ('code', 'open', 'high', 'low', 'close', 'volume', 'time_key')
+    values = ('open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, code: str, capacity: int = 5000):
+        """
+        :param code: code of the bars, e.g. 'FHSI'
+        :param capacity: max number of bars, the oldest bars are dropped
+        """
+        self.code = code
+        self.capacity = capacity
+        self.size = 0
+        self.end = 0  # position after the latest bar, within [capacity, 2 * capacity) once the buffer is full
+        self._arrays = {col: np.full(2 * capacity, np.nan) for col in self.values}
+        self._arrays['time_key'] = np.empty(2 * capacity, dtype='datetime64[ns]')
+
+    def __len__(self):
+        return self.size
+
+    def append(self, time_key: dt.datetime, open_: float, high: float, low: float, close: float, volume: float):
+        """
+        add a new bar, the oldest bar is dropped if the buffer is full
+        """
+        if self.end == 2 * self.capacity:
+            self.end = self.capacity  # continue in the second half, the first half holds the same bars
+        self.end += 1
+        self.size = min(self.size + 1, self.capacity)
+        self.update_last(time_key, open_, high, low, close, volume)
+
+    def update_last(self, time_key: dt.datetime, open_: float, high: float, low: float, close: float,
+                    volume: float):
+        """
+        overwrite the latest bar (bar in progress)
+        """
+        i = self.end - 1
+        mirror = i - self.capacity if i >= self.capacity else i + self.capacity
+        for col, value in zip(('time_key', 'open', 'high', 'low', 'close', 'volume'),
+                              (np.datetime64(time_key, 'ns'), open_, high, low, close, volume)):
+            self._arrays[col][i] = self._arrays[col][mirror] = value
+
+    def get_last_time_key(self) -> dt.datetime | None:
+        if not self.size:
+            return None
+        return pd.Timestamp(self._arrays['time_key'][self.end - 1]).to_pydatetime()
+
+    def get_array(self, col: str) -> np.ndarray:
+        """
+        :return: read-only view of the bars in the buffer, from the oldest to the latest
+        """
+        view = self._arrays[col][self.end - self.size:self.end]
+        view.flags.writeable = False
+        return view
+
+    def to_frame(self, since: dt.datetime = None) -> pd.DataFrame:
+        """
+        :param since: only the bars later than 'since'
+        :return: dataframe (columns: 'code' 'open' 'high' 'low' 'close' 'volume' 'time_key'), default RangeIndex
+        """
+        start = 0
+        if since is not None:
+            start = np.searchsorted(self.get_array('time_key'), np.datetime64(since, 'ns'), side='right')
+
+        data = {col: self.get_array(col)[start:].copy() for col in self.columns if col != 'code'}
+        return pd.DataFrame({'code': self.code, **data}, columns=list(self.columns))
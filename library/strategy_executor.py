@@ -0,0 +1,53 @@
+"""
+Strategy execution thread
+
+market data callbacks and manual orders put jobs into a queue, one thread runs them in order:
+strategies (indicators, conditions) and order placement never wait for the Kivy main loop,
+the UI is updated by posting callbacks back to the main loop (Clock.schedule_once)
+"""
+import logging
+import queue
+import threading as th
+
+
+class StrategyExecutor:
+    _stop = object()  # sentinel to end the thread
+
+    def __init__(self, name: str = 'strategy-executor'):
+        self.name = name
+        self.jobs = queue.Queue()
+        self.thread = None
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.thread = th.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """
+        finish the queued jobs and end the thread
+        """
+        if self.thread is None:
+            return
+        self.jobs.put(self._stop)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def submit(self, func, *args, **kwargs):
+        """
+        run func(*args, **kwargs) in the execution thread, after the jobs submitted before
+        """
+        self.jobs.put((func, args, kwargs))
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is self._stop:
+                return
+
+            func, args, kwargs = job
+            try:
+                func(*args, **kwargs)
+            except Exception:  # a failing job must not stop the strategies
+                logging.exception(f"{self.name}: {getattr(func, '__name__', func)} failed")
@@ -1,6 +1,48 @@
 import pandas as pd
 import numpy as np
 import time
+from collections import deque
+from functools import wraps
+
+from library import ta_kernels
+
+BACKEND = 'pandas'  # 'pandas': functions below, 'numpy': array functions in library/ta_kernels
+CACHE = None  # library.ta_cache.IndicatorCache, results of the functions below are reused if set
+
+
+def set_backend(backend: str):
+    """
+    select how ema, bollingerbands, adx and stoch are calculated, the output is a Series in both cases
+    :param backend: 'pandas' or 'numpy'
+    """
+    global BACKEND
+    if backend not in ('pandas', 'numpy'):
+        raise ValueError(f"unknown backend '{backend}', use 'pandas' or 'numpy'")
+    BACKEND = backend
+
+
+def set_cache(cache):
+    """
+    :param cache: library.ta_cache.IndicatorCache, None: no cache
+    """
+    global CACHE
+    CACHE = cache
+
+
+def cached(columns=None):
+    """
+    :param columns: columns of the input dataframe read by the function (part of the cache key),
+                    or function(*args, **kwargs) returning them, None: the input is a Series
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(data, *args, **kwargs):
+            if CACHE is None:
+                return func(data, *args, **kwargs)
+            columns_ = columns(*args, **kwargs) if callable(columns) else columns
+            return CACHE.call(func, data, *args, columns=columns_, **kwargs)
+        return wrapper
+    return decorator
 
 
 def timing_decorator(func):
@@ -13,6 +55,7 @@ def timing_decorator(func):
     return wrapper
 
 
+@cached()
 def bollingerbands(price_original: pd.Series, period: int = 20, num_std: float = 2.0):
     """
     :param price_original: Price Series (normally 'close')
@@ -20,6 +63,10 @@ def bollingerbands(price_original: pd.Series, period: int = 20, num_std: float =
     :param num_std: required standard deviation
     :return: Series: sma, upper_band, lower_band
     """
+    if BACKEND == 'numpy':
+        bands = ta_kernels.bollingerbands(price_original.to_numpy(dtype=float), period, num_std)
+        return tuple(pd.Series(band, index=price_original.index, name=price_original.name) for band in bands)
+
     price = price_original.copy()
 
     rolling_mean = price.rolling(window=period).mean()
@@ -30,12 +77,18 @@ def bollingerbands(price_original: pd.Series, period: int = 20, num_std: float =
     return np.round(rolling_mean, 2), np.round(upper_band, 2), np.round(lower_band, 2)
 
 
+@cached(columns=('high', 'low', 'close'))
 def adx(df_original: pd.DataFrame, period: int = 14):
     """
     :param df_original: DataFrame contains columns: 'high' 'low' 'close'
     :param period: calculated peruod
     :return: Series ['ADX']
     """
+    if BACKEND == 'numpy':
+        values = ta_kernels.adx(df_original['high'].to_numpy(dtype=float), df_original['low'].to_numpy(dtype=float),
+                                df_original['close'].to_numpy(dtype=float), period)
+        return pd.Series(values, index=df_original.index, name='ADX')
+
     alpha = 1.015 / period  # smoothing factor: as same as possible to multicharts
     df = df_original.copy()
 
@@ -78,6 +131,7 @@ def adx(df_original: pd.DataFrame, period: int = 14):
     return df['ADX']
 
 
+@cached(columns=lambda period, ohlc='close': (ohlc,))
 def ema(df_original: pd.DataFrame, period: int, ohlc='close'):
     """
     :param df_original: DataFrame contains columns: 'open' 'high' 'low' 'close'
@@ -85,12 +139,23 @@ def ema(df_original: pd.DataFrame, period: int, ohlc='close'):
     :param ohlc:
     :return: Series
     """
+    if BACKEND == 'numpy':
+        values = ta_kernels.ema(df_original[ohlc].to_numpy(dtype=float), period)
+        return pd.Series(values, index=df_original.index, name='ema')
+
     df = df_original.copy()
     df['ema'] = df[ohlc].ewm(span=period, adjust=False).mean()
     return df['ema']
 
 
+@cached(columns=('high', 'low', 'close'))
 def stoch(df_original: pd.DataFrame, period: int = 14, smooth_1: int = 3, smooth_2: int = 3, smoothing_type: int = 1):
+    if BACKEND == 'numpy':
+        slow_k, slow_d = ta_kernels.stoch(df_original['high'].to_numpy(dtype=float),
+                                          df_original['low'].to_numpy(dtype=float),
+                                          df_original['close'].to_numpy(dtype=float), period, smooth_1, smooth_2)
+        return pd.Series(slow_k, index=df_original.index), pd.Series(slow_d, index=df_original.index)
+
     df = df_original.copy()
 
     high_n = df['high'].rolling(window=period).max()
@@ -102,3 +167,299 @@ def stoch(df_original: pd.DataFrame, period: int = 14, smooth_1: int = 3, smooth
     slow_d = slow_k.rolling(window=smooth_2).mean()
 
     return slow_k, slow_d
+
+
+# streaming indicators: updated with each closed bar, O(1) per bar, same output as the functions above
+# the private classes repeat the arithmetic of pandas' window aggregations step by step, so the values are identical
+# (pandas 2 as in requirement.txt, the rolling variance of pandas 3 differs in the last digits)
+class _EWMMean:
+    def __init__(self, com: float):
+        """
+        pandas ewm(com=com, adjust=False).mean() (ignore_na=False)
+        """
+        alpha = 1. / (1. + com)
+        self.old_wt_factor = 1. - alpha
+        self.new_wt = alpha
+        self.old_wt = 1.
+        self.weighted = np.nan
+        self.nobs = 0
+
+    def update(self, value: float) -> float:
+        is_observation = value == value
+        if not self.nobs and self.weighted != self.weighted:
+            self.weighted = value
+        elif self.weighted == self.weighted:
+            # the weight of the previous value decays for every bar, including missing values
+            self.old_wt *= self.old_wt_factor
+            if is_observation:
+                # avoid numerical errors on constant series
+                if self.weighted != value:
+                    self.weighted = (self.old_wt * self.weighted + self.new_wt * value) / (self.old_wt + self.new_wt)
+                self.old_wt = 1.
+        self.nobs += is_observation
+
+        return self.weighted if self.nobs else np.nan
+
+
+class _RollingMoments:
+    def __init__(self, window: int):
+        """
+        pandas rolling(window).mean() and rolling(window).var(), Kahan summation as pandas
+        """
+        self.window = window
+        self.values = deque()
+        self._reset()
+
+    def _reset(self):
+        self.nobs = self.neg_ct = self.num_same = 0
+        self.sum_x = self.sum_add = self.sum_remove = 0.
+        self.mean_x = self.ssqdm_x = self.var_add = self.var_remove = 0.
+        self.prev_value = np.nan
+
+    def update(self, value: float):
+        self.values.append(value)
+        if len(self.values) == 1 or self.window <= 1:
+            # first window (or every window if window is 1): start from scratch
+            self._reset()
+            self.values = deque([value])
+            self.prev_value = value
+        elif len(self.values) > self.window:
+            self._remove(self.values.popleft())
+        self._add(value)
+
+    def _add(self, value: float):
+        if value != value:
+            return
+
+        self.nobs += 1
+        self.num_same = self.num_same + 1 if value == self.prev_value else 1
+        self.prev_value = value
+        self.neg_ct += np.signbit(value)
+
+        # sum
+        y = value - self.sum_add
+        t = self.sum_x + y
+        self.sum_add = t - self.sum_x - y
+        self.sum_x = t
+
+        # Welford's method for the variance
+        prev_mean = self.mean_x - self.var_add
+        y = value - self.var_add
+        t = y - self.mean_x
+        self.var_add = t + self.mean_x - y
+        self.mean_x = self.mean_x + t / self.nobs
+        self.ssqdm_x = self.ssqdm_x + (value - prev_mean) * (value - self.mean_x)
+
+    def _remove(self, value: float):
+        if value != value:
+            return
+
+        self.nobs -= 1
+        self.neg_ct -= np.signbit(value)
+
+        # sum
+        y = -value - self.sum_remove
+        t = self.sum_x + y
+        self.sum_remove = t - self.sum_x - y
+        self.sum_x = t
+
+        # variance
+        if self.nobs:
+            prev_mean = self.mean_x - self.var_remove
+            y = value - self.var_remove
+            t = y - self.mean_x
+            self.var_remove = t + self.mean_x - y
+            self.mean_x = self.mean_x - t / self.nobs
+            self.ssqdm_x = self.ssqdm_x - (value - prev_mean) * (value - self.mean_x)
+        else:
+            self.mean_x = self.ssqdm_x = 0.
+
+    def mean(self) -> float:
+        if self.nobs < self.window or not self.nobs:
+            return np.nan
+        if self.num_same >= self.nobs:
+            return self.prev_value
+
+        result = self.sum_x / self.nobs
+        if (self.neg_ct == 0 and result < 0) or (self.neg_ct == self.nobs and result > 0):
+            return 0.
+        return result
+
+    def std(self) -> float:
+        if self.nobs < self.window or self.nobs <= 1:
+            return np.nan
+        if self.num_same >= self.nobs:
+            return 0.
+
+        var = self.ssqdm_x / (self.nobs - 1)
+        return np.sqrt(var) if var >= 0 else 0.
+
+
+class _RollingExtreme:
+    def __init__(self, window: int, func):
+        """
+        pandas rolling(window).max() or rolling(window).min(), monotonic deque: amortized O(1) per value
+        :param func: max or min
+        """
+        self.window = window
+        self.func = func
+        self.candidates = deque()  # (position, value) which can still be the extreme, the extreme first
+        self.missing = deque()  # positions of nan in the window
+        self.position = -1
+
+    def update(self, value: float) -> float:
+        self.position += 1
+        start = self.position - self.window + 1  # first position of the window
+        if self.candidates and self.candidates[0][0] < start:
+            self.candidates.popleft()
+        if self.missing and self.missing[0] < start:
+            self.missing.popleft()
+
+        if value != value:
+            self.missing.append(self.position)
+        else:
+            # earlier values which are not more extreme than the new one can never be the extreme again
+            while self.candidates and self.func(self.candidates[-1][1], value) == value:
+                self.candidates.pop()
+            self.candidates.append((self.position, value))
+
+        # nan until the window is full of values, as min_periods=window
+        if start < 0 or self.missing:
+            return np.nan
+        return self.candidates[0][1]
+
+
+def _divide(numerator: float, denominator: float) -> float:
+    # same as dividing Series: x/0 is inf, 0/0 is nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.float64(numerator) / np.float64(denominator)
+
+
+class StreamingEMA:
+    def __init__(self, period: int, ohlc='close'):
+        """
+        same as ema(df, period, ohlc), one bar at a time
+        """
+        self.ohlc = ohlc
+        self.value = np.nan
+        self._ewm = _EWMMean(com=(period - 1) / 2)
+
+    def update(self, bar) -> float:
+        """
+        :param bar: closed bar, dict/ Series contains 'open' 'high' 'low' 'close'
+        :return: ema of the bar
+        """
+        self.value = self._ewm.update(bar[self.ohlc])
+        return self.value
+
+    def warm_up(self, df: pd.DataFrame) -> float:
+        for value in df[self.ohlc].to_numpy(dtype=float):
+            self.value = self._ewm.update(value)
+        return self.value
+
+
+class StreamingBollingerBands:
+    def __init__(self, period: int = 20, num_std: float = 2.0):
+        """
+        same as bollingerbands(price, period, num_std), one price at a time
+        """
+        self.num_std = num_std
+        self.value = (np.nan, np.nan, np.nan)
+        self._moments = _RollingMoments(period)
+
+    def update(self, price: float) -> tuple:
+        """
+        :param price: price of the closed bar (normally 'close')
+        :return: sma, upper_band, lower_band
+        """
+        self._moments.update(price)
+        rolling_mean, rolling_std = self._moments.mean(), self._moments.std()
+        upper_band = rolling_mean + (rolling_std * self.num_std)
+        lower_band = rolling_mean - (rolling_std * self.num_std)
+        self.value = (np.round(rolling_mean, 2), np.round(upper_band, 2), np.round(lower_band, 2))
+
+        return self.value
+
+    def warm_up(self, price: pd.Series) -> tuple:
+        for value in price.to_numpy(dtype=float):
+            self.update(value)
+        return self.value
+
+
+class StreamingADX:
+    def __init__(self, period: int = 14):
+        """
+        same as adx(df, period), one bar at a time
+        """
+        alpha = 1.015 / period  # smoothing factor: as same as possible to multicharts
+        com = (1 - alpha) / alpha
+        self.value = np.nan
+        self._atr, self._plus_dm, self._minus_dm, self._adx = (_EWMMean(com) for _ in range(4))
+        self._prev_high = self._prev_low = self._prev_close = np.nan
+
+    def update(self, bar) -> float:
+        """
+        :param bar: closed bar, dict/ Series contains 'high' 'low' 'close'
+        :return: adx of the bar
+        """
+        high, low, close = float(bar['high']), float(bar['low']), float(bar['close'])
+
+        # TR, ATR
+        true_ranges = [value for value in (high - low, abs(high - self._prev_close), abs(low - self._prev_close))
+                       if value == value]
+        atr = self._atr.update(max(true_ranges) if true_ranges else np.nan)
+
+        # +-DX
+        h_ph = high - self._prev_high
+        pl_l = self._prev_low - low
+        plus_dx = h_ph if h_ph > pl_l and h_ph > 0 else 0.0
+        minus_dx = pl_l if h_ph < pl_l and pl_l > 0 else 0.0
+
+        # +- DMI
+        plus_dmi = _divide(self._plus_dm.update(plus_dx), atr) * 100
+        minus_dmi = _divide(self._minus_dm.update(minus_dx), atr) * 100
+
+        # ADX
+        dx = _divide(np.abs(plus_dmi - minus_dmi), plus_dmi + minus_dmi) * 100
+        self.value = self._adx.update(dx)
+        self._prev_high, self._prev_low, self._prev_close = high, low, close
+
+        return self.value
+
+    def warm_up(self, df: pd.DataFrame) -> float:
+        for bar in df[['high', 'low', 'close']].to_dict('records'):
+            self.update(bar)
+        return self.value
+
+
+class StreamingStoch:
+    def __init__(self, period: int = 14, smooth_1: int = 3, smooth_2: int = 3):
+        """
+        same as stoch(df, period, smooth_1, smooth_2), one bar at a time
+        """
+        self.value = (np.nan, np.nan)
+        self._high_n = _RollingExtreme(period, max)
+        self._low_n = _RollingExtreme(period, min)
+        self._slow_k = _RollingMoments(smooth_1)
+        self._slow_d = _RollingMoments(smooth_2)
+
+    def update(self, bar) -> tuple:
+        """
+        :param bar: closed bar, dict/ Series contains 'high' 'low' 'close'
+        :return: slow_k, slow_d
+        """
+        high_n = self._high_n.update(float(bar['high']))
+        low_n = self._low_n.update(float(bar['low']))
+        k = _divide(float(bar['close']) - low_n, high_n - low_n) * 100
+
+        self._slow_k.update(k)
+        slow_k = self._slow_k.mean()
+        self._slow_d.update(slow_k)
+        self.value = (slow_k, self._slow_d.mean())
+
+        return self.value
+
+    def warm_up(self, df: pd.DataFrame) -> tuple:
+        for bar in df[['high', 'low', 'close']].to_dict('records'):
+            self.update(bar)
+        return self.value
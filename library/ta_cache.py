@@ -0,0 +1,179 @@
+"""
+Cache of indicator results (library/ta)
+
+a result is keyed by a fingerprint of the input data and the indicator params (function, args, kwargs),
+only the columns which the indicator reads are fingerprinted
+  - data fingerprint: digest of all values of the read columns and the number of rows,
+    if the source is known (e.g. the 'updated' time of the bar store manifest), also the symbol, the source version
+    and the first and last 'time_key'
+  - memory tier: least recently used results are evicted when the total size exceeds 'max_bytes'
+  - disk tier (optional): one .npz file per result, shared by processes and runs,
+    least recently used files are removed when the directory exceeds 'disk_max_bytes',
+    every process keeps an index of the files (listed once, files of other processes are added when read)
+results are stored as arrays, Series are rebuilt with the index of the input data
+enable with ta.set_cache(IndicatorCache(...))
+"""
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class IndicatorCache:
+    def __init__(self, max_bytes: int = 256 * 1024 ** 2, disk_dir: os.path = None, disk_max_bytes: int = 2 * 1024 ** 3,
+                 source: tuple = None):
+        """
+        :param max_bytes: max size of the results in memory
+        :param disk_dir: directory of the disk tier, None: memory only
+        :param disk_max_bytes: max size of the disk tier
+        :param source: (symbol, version) of the data, e.g. ('FHSI', manifest['updated']), None: digest of the data
+        """
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.source = source
+        self.size = 0
+        self.hits = self.disk_hits = self.misses = 0
+        self._results = OrderedDict()  # key: cache key, value: [(values, name), ...]
+        self.disk_size = 0
+        self._files = OrderedDict()  # disk tier, least recently used first, key: file name, value: size
+
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def fingerprint(self, data: pd.DataFrame | pd.Series, columns: tuple = None) -> tuple:
+        """
+        :param columns: columns of 'data' read by the indicator, None: all price columns
+        """
+        if isinstance(data, pd.Series):
+            values = data.to_numpy(dtype=float)[:, None]
+        else:
+            columns = [col for col in columns or PRICE_COLUMNS if col in data.columns]
+            values = data[columns].to_numpy(dtype=float)
+
+        # all values the indicator is calculated from (the data may have been changed in place)
+        digest = hashlib.sha1(np.ascontiguousarray(values).data).hexdigest()
+        if self.source is not None and isinstance(data, pd.DataFrame) and 'time_key' in data.columns and len(data):
+            time_key = data['time_key']
+            return (*self.source, str(time_key.iloc[0]), str(time_key.iloc[-1]), len(data), tuple(columns), digest)
+
+        return 'digest', digest, len(data), tuple(columns or ())
+
+    def get_key(self, func, data: pd.DataFrame | pd.Series, args: tuple, kwargs: dict, columns: tuple = None) -> str:
+        params = (func.__module__, func.__qualname__, args, tuple(sorted(kwargs.items())))
+        return hashlib.sha1(repr((self.fingerprint(data, columns), params)).encode()).hexdigest()
+
+    def call(self, func, data: pd.DataFrame | pd.Series, *args, columns: tuple = None, **kwargs):
+        """
+        return func(data, *args, **kwargs) from the cache, calculate and store it if not found
+        :param columns: columns of 'data' read by func, None: all price columns (ignored if 'data' is a Series)
+        """
+        key = self.get_key(func, data, args, kwargs, columns)
+        result = self.get(key)
+        if result is None:
+            self.misses += 1
+            output = func(data, *args, **kwargs)
+            outputs = output if isinstance(output, tuple) else (output,)
+            result = [(series.to_numpy(copy=True), series.name) for series in outputs]
+            self.put(key, result)
+            return output
+
+        series = tuple(pd.Series(values.copy(), index=data.index, name=name) for values, name in result)
+        return series if len(series) > 1 else series[0]
+
+    def get(self, key: str) -> list | None:
+        # memory
+        if key in self._results:
+            self._results.move_to_end(key)
+            self.hits += 1
+            return self._results[key]
+
+        # disk
+        path = self._get_path(key)
+        if path is None or not os.path.isfile(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=True) as file_:
+                names = file_['names'].tolist()
+                result = [(file_[f'values_{i}'], name) for i, name in enumerate(names)]
+            os.utime(path)  # recently used, for the index of the next run
+            size = os.path.getsize(path)
+        except (OSError, ValueError, KeyError):  # removed or written by another process meanwhile
+            return None
+        self._add_file(os.path.basename(path), size)
+        self.disk_hits += 1
+        self._store(key, result)
+
+        return result
+
+    def put(self, key: str, result: list):
+        self._store(key, result)
+
+        path = self._get_path(key)
+        if path is None:
+            return
+        arrays = {f'values_{i}': values for i, (values, name) in enumerate(result)}
+        arrays['names'] = np.array([name for values, name in result], dtype=object)
+        file_, temp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+        with os.fdopen(file_, 'wb') as temp_file:
+            np.savez(temp_file, **arrays)
+        os.replace(temp_path, path)  # atomic, other processes never read a partial file
+        self._add_file(os.path.basename(path), os.path.getsize(path))
+        self._evict_disk()
+
+    def clear(self):
+        self._results.clear()
+        self.size = 0
+
+    def _store(self, key: str, result: list):
+        nbytes = sum(values.nbytes for values, name in result)
+        if nbytes > self.max_bytes:
+            return
+
+        if key in self._results:
+            self.size -= sum(values.nbytes for values, name in self._results.pop(key))
+        self._results[key] = result
+        self.size += nbytes
+        while self.size > self.max_bytes:
+            key_, result_ = self._results.popitem(last=False)
+            self.size -= sum(values.nbytes for values, name in result_)
+
+    def _get_path(self, key: str) -> str | None:
+        return os.path.join(self.disk_dir, f'{key}.npz') if self.disk_dir is not None else None
+
+    def _load_disk_index(self):
+        """
+        index the files of previous runs once, least recently used (modified) first
+        """
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith('.npz'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.disk_dir, name))
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, name, stat.st_size))
+
+        for mtime, name, size in sorted(files):
+            self._add_file(name, size)
+
+    def _add_file(self, name: str, size: int):
+        # new or recently used file
+        self.disk_size += size - self._files.pop(name, 0)
+        self._files[name] = size
+
+    def _evict_disk(self):
+        while self.disk_size > self.disk_max_bytes and self._files:
+            name, size = self._files.popitem(last=False)
+            self.disk_size -= size
+            try:
+                os.remove(os.path.join(self.disk_dir, name))
+            except FileNotFoundError:  # removed by another process
+                pass
@@ -0,0 +1,314 @@
+"""
+Array backend of library/ta
+
+the same indicators as the pandas functions in library/ta, NumPy arrays in and out, no intermediate frames
+  - the recursive smoothing (ewm) and the rolling windows are compiled with numba if it is installed,
+    the loops repeat the arithmetic of pandas 2 (Kahan summation etc.), so the output is identical
+    (pandas 3 calculates the rolling variance differently, its standard deviation differs by up to ~1e-5)
+  - without numba the rolling windows are NumPy array operations, O(n log(window)) (_window_reduce),
+    equal to pandas up to rounding (the sums are not compensated)
+  - without numba the recursive smoothing stays pandas' ewm on the array wrapped in a Series (no copy):
+    each value depends on the previous one, NumPy has no exact vectorized form of the recursion
+    (the closed form with powers of (1 - alpha) overflows on long series) and pandas runs it as a compiled loop
+select the backend with ta.set_backend('numpy')
+"""
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+except ImportError:  # optional dependency
+    njit = None
+
+
+def _ewm_mean_loop(values: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    pandas ewm(adjust=False).mean() (ignore_na=False) step by step
+    """
+    output = np.empty(len(values))
+    if not len(values):
+        return output
+
+    old_wt_factor = 1. - alpha
+    old_wt = 1.
+    weighted = values[0]
+    nobs = 1 if weighted == weighted else 0
+    output[0] = weighted if nobs else np.nan
+    for i in range(1, len(values)):
+        value = values[i]
+        is_observation = value == value
+        if is_observation:
+            nobs += 1
+        if weighted == weighted:
+            old_wt *= old_wt_factor
+            if is_observation:
+                if weighted != value:
+                    weighted = (old_wt * weighted + alpha * value) / (old_wt + alpha)
+                old_wt = 1.
+        elif is_observation:
+            weighted = value
+        output[i] = weighted if nobs else np.nan
+
+    return output
+
+
+def _rolling_moments_loop(values: np.ndarray, window: int) -> (np.ndarray, np.ndarray):
+    """
+    pandas rolling(window).mean() and rolling(window).std() step by step (Kahan summation, Welford's variance)
+    """
+    mean_output = np.empty(len(values))
+    std_output = np.empty(len(values))
+    nobs = neg_ct = num_same = 0
+    sum_x = sum_add = sum_remove = mean_x = ssqdm_x = var_add = var_remove = 0.
+    prev_value = np.nan
+    for i in range(len(values)):
+        value = values[i]
+        if i == 0 or window <= 1:
+            # first window (or every window if window is 1): start from scratch
+            nobs = neg_ct = num_same = 0
+            sum_x = sum_add = sum_remove = mean_x = ssqdm_x = var_add = var_remove = 0.
+            prev_value = value
+        elif i >= window and values[i - window] == values[i - window]:
+            # remove the value leaving the window
+            old_value = values[i - window]
+            nobs -= 1
+            if np.signbit(old_value):
+                neg_ct -= 1
+            y = -old_value - sum_remove
+            t = sum_x + y
+            sum_remove = t - sum_x - y
+            sum_x = t
+            if nobs:
+                prev_mean = mean_x - var_remove
+                y = old_value - var_remove
+                t = y - mean_x
+                var_remove = t + mean_x - y
+                mean_x = mean_x - t / nobs
+                ssqdm_x = ssqdm_x - (old_value - prev_mean) * (old_value - mean_x)
+            else:
+                mean_x = ssqdm_x = 0.
+
+        if value == value:
+            # add the new value
+            nobs += 1
+            num_same = num_same + 1 if value == prev_value else 1
+            prev_value = value
+            if np.signbit(value):
+                neg_ct += 1
+            y = value - sum_add
+            t = sum_x + y
+            sum_add = t - sum_x - y
+            sum_x = t
+            prev_mean = mean_x - var_add
+            y = value - var_add
+            t = y - mean_x
+            var_add = t + mean_x - y
+            mean_x = mean_x + t / nobs
+            ssqdm_x = ssqdm_x + (value - prev_mean) * (value - mean_x)
+
+        # mean
+        if nobs < window or not nobs:
+            mean_output[i] = np.nan
+        elif num_same >= nobs:
+            mean_output[i] = prev_value
+        else:
+            mean_ = sum_x / nobs
+            if (neg_ct == 0 and mean_ < 0) or (neg_ct == nobs and mean_ > 0):
+                mean_ = 0.
+            mean_output[i] = mean_
+
+        # std
+        if nobs < window or nobs <= 1:
+            std_output[i] = np.nan
+        elif num_same >= nobs:
+            std_output[i] = 0.
+        else:
+            var = ssqdm_x / (nobs - 1)
+            std_output[i] = np.sqrt(var) if var >= 0 else 0.
+
+    return mean_output, std_output
+
+
+def _rolling_extreme_loop(values: np.ndarray, window: int, is_max: bool) -> np.ndarray:
+    """
+    pandas rolling(window).max() or rolling(window).min()
+    """
+    output = np.full(len(values), np.nan)
+    for i in range(window - 1, len(values)):
+        nobs = 0
+        extreme = np.nan
+        for j in range(i - window + 1, i + 1):
+            value = values[j]
+            if value == value:
+                if not nobs or (value > extreme if is_max else value < extreme):
+                    extreme = value
+                nobs += 1
+        if nobs >= window:
+            output[i] = extreme
+
+    return output
+
+
+if njit is not None:
+    _ewm_mean_loop = njit(cache=True)(_ewm_mean_loop)
+    _rolling_moments_loop = njit(cache=True)(_rolling_moments_loop)
+    _rolling_extreme_loop = njit(cache=True)(_rolling_extreme_loop)
+
+
+def _window_reduce(values: np.ndarray, window: int, func) -> np.ndarray:
+    """
+    func (np.add, np.maximum, np.minimum) over each full window, in O(n log(window)) array operations:
+    blocks of 1, 2, 4, ... values are built by combining two neighbouring blocks, a window is the combination
+    of the blocks of its binary digits (missing values propagate)
+    :return: values of the windows ending at window - 1, window, ..., len(values) - 1
+    """
+    count = len(values) - window + 1
+    result = None
+    offset = 0
+    block, span = values, 1  # block[i]: func over values[i:i + span]
+    remaining = window
+    while remaining:
+        if remaining & 1:
+            part = block[offset:offset + count]
+            result = part if result is None else func(result, part)
+            offset += span
+        remaining >>= 1
+        if remaining:
+            block = func(block[:-span], block[span:])
+            span *= 2
+
+    return result
+
+
+def _rolling_moments_numpy(values: np.ndarray, window: int) -> (np.ndarray, np.ndarray):
+    """
+    rolling mean and std (ddof 1) of the full windows, nan if a window has a missing value
+    the sums are taken from the first value, flat windows give the value and 0 as pandas does
+    """
+    mean_output = np.full(len(values), np.nan)
+    std_output = np.full(len(values), np.nan)
+    if len(values) < window:
+        return mean_output, std_output
+
+    observed = values[values == values]
+    deviation = values - (observed[0] if len(observed) else 0.)
+    sum_ = _window_reduce(deviation, window, np.add)
+    mean_output[window - 1:] = values[window - 1:] - deviation[window - 1:] + sum_ / window
+    is_flat = _window_reduce(values, window, np.maximum) == _window_reduce(values, window, np.minimum)
+    mean_output[window - 1:][is_flat] = values[window - 1:][is_flat]
+    if window > 1:
+        var = (_window_reduce(deviation * deviation, window, np.add) - sum_ * sum_ / window) / (window - 1)
+        std_output[window - 1:] = np.where(is_flat, 0., np.sqrt(np.maximum(var, 0.)))
+
+    return mean_output, std_output
+
+
+def _rolling_extreme_numpy(values: np.ndarray, window: int, is_max: bool) -> np.ndarray:
+    """
+    rolling max or min of the full windows, nan if a window has a missing value
+    """
+    output = np.full(len(values), np.nan)
+    if len(values) >= window:
+        output[window - 1:] = _window_reduce(values, window, np.maximum if is_max else np.minimum)
+
+    return output
+
+
+def ewm_mean(values: np.ndarray, com: float) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    if njit is not None:
+        return _ewm_mean_loop(values, 1. / (1. + com))
+
+    return pd.Series(values, copy=False).ewm(com=com, adjust=False).mean().to_numpy()
+
+
+def rolling_mean_std(values: np.ndarray, window: int) -> (np.ndarray, np.ndarray):
+    values = np.asarray(values, dtype=np.float64)
+    if njit is not None:
+        return _rolling_moments_loop(values, window)
+
+    return _rolling_moments_numpy(values, window)
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    if njit is not None:
+        return _rolling_moments_loop(values, window)[0]
+
+    return _rolling_moments_numpy(values, window)[0]
+
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    if njit is not None:
+        return _rolling_extreme_loop(values, window, True)
+
+    return _rolling_extreme_numpy(values, window, True)
+
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    if njit is not None:
+        return _rolling_extreme_loop(values, window, False)
+
+    return _rolling_extreme_numpy(values, window, False)
+
+
+def _shift(values: np.ndarray) -> np.ndarray:
+    return np.concatenate(([np.nan], values[:-1]))
+
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    return ewm_mean(values, com=(period - 1) / 2)
+
+
+def bollingerbands(price: np.ndarray, period: int = 20, num_std: float = 2.0) -> tuple:
+    """
+    :return: sma, upper_band, lower_band
+    """
+    rolling_mean_, rolling_std_ = rolling_mean_std(price, period)
+    upper_band = rolling_mean_ + (rolling_std_ * num_std)
+    lower_band = rolling_mean_ - (rolling_std_ * num_std)
+
+    return np.round(rolling_mean_, 2), np.round(upper_band, 2), np.round(lower_band, 2)
+
+
+def adx(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    alpha = 1.015 / period  # smoothing factor: as same as possible to multicharts
+    com = (1 - alpha) / alpha
+    high, low, close = (np.asarray(values, dtype=np.float64) for values in (high, low, close))
+
+    # TR, ATR
+    prev_close = _shift(close)
+    true_range = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+    atr = ewm_mean(true_range, com)
+
+    # +-DX
+    h_ph = high - _shift(high)
+    pl_l = _shift(low) - low
+    plus_dx = np.where((h_ph > pl_l) & (h_ph > 0), h_ph, 0.0)
+    minus_dx = np.where((h_ph < pl_l) & (pl_l > 0), pl_l, 0.0)
+
+    # +- DMI, ADX
+    with np.errstate(invalid='ignore', divide='ignore'):
+        plus_dmi = (ewm_mean(plus_dx, com) / atr) * 100
+        minus_dmi = (ewm_mean(minus_dx, com) / atr) * 100
+        dx = (np.abs(plus_dmi - minus_dmi) / (plus_dmi + minus_dmi)) * 100
+
+    return ewm_mean(dx, com)
+
+
+def stoch(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14, smooth_1: int = 3,
+          smooth_2: int = 3) -> tuple:
+    """
+    :return: slow_k, slow_d
+    """
+    high_n = rolling_max(high, period)
+    low_n = rolling_min(low, period)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        k = ((np.asarray(close, dtype=np.float64) - low_n) / (high_n - low_n)) * 100
+
+    slow_k = rolling_mean(k, smooth_1)
+    slow_d = rolling_mean(slow_k, smooth_2)
+
+    return slow_k, slow_d
@@ -9,7 +9,9 @@ import yaml
 from library.futu_api import FutuApi
 from library.ib_api import IBApi
 from library import programme
+from library.latency import LatencyMonitor
 from library.logging_ import config_logging
+from library.strategy_executor import StrategyExecutor
 from front_ends.algo_trade_main_page import AlgoTradeMainPage
 
 # GUI MODULES -------------------------------------------------------------------------------------
@@ -30,6 +32,8 @@ class AlgoTradeForFHSI(App):
         self.engine = 'live'  # live/ backtest: control behaviour like 'update_kline' and 'fire_trade'
         self.is_demo = IS_DEMO  # live/ demo: control behaviour like 'place_order' and accessing account info
         self.running_strategies = RUNNING_STRATEGIES
+        self.strategy_executor = StrategyExecutor()  # strategies and orders run here, not on the kivy main thread
+        self.latency = LatencyMonitor()  # bar close to order, exported to database/log
 
     # ------------------------------------------------------------------------------------------- #
     """ kivy's pre-defined methods """
@@ -44,38 +48,56 @@ class AlgoTradeForFHSI(App):
         return self.carousel
 
     def on_start(self):
+        self.strategy_executor.start()
         self.connect_brokers()
         self.algo_main_page.algo_trade.load_strategies()
         self.algo_main_page.algo_trade.update_table()
-        self.update_strategy_params()
+        self.strategy_executor.submit(self.update_strategy_params)
         self.algo_main_page.trade_journal.init_filter()
         self.algo_main_page.trade_journal.refresh()
+        Clock.schedule_interval(lambda time_: self.export_latency(), LATENCY_EXPORT_INTERVAL)
+        Clock.schedule_interval(lambda time_: self.ibapi.market_data.log_stats(), LATENCY_EXPORT_INTERVAL)
+        Clock.schedule_interval(lambda time_: self.algo_main_page.algo_trade.flush_realtime_pnl(),
+                                1 / PNL_REFRESH_RATE)
 
     def on_stop(self):
         self.futu.close_all_connection()
         self.ibapi.disconnect()
+        self.strategy_executor.stop()
+        self.algo_main_page.algo_trade.strategy_pool.shutdown(wait=False)
+        self.export_latency()
 
     # ------------------------------------------------------------------------------------------- #
     """ strategy callback """
     # ------------------------------------------------------------------------------------------- #
     def fire_trade(self, side: str, qty: int, remark: str, order_type: str):
-        self.futu.fire_trade(side, qty, remark, order_type)
-        self.update_gui()
-        self.update_strategy_params()
+        """
+        runs in the strategy executor: the order is placed at once and the position params of the strategy are
+        updated before the next order, the gui is updated when the fill reaches the trade journal (on_journal_changed)
+        """
+        price = self.futu.fire_trade(side, qty, remark, order_type)
+        strategy = self.algo_main_page.algo_trade.strategies.get(remark.split('-')[0])
+        if price is not None and strategy is not None:
+            strategy.update_order_params(side, qty, price, dt.datetime.now())
+
+    def on_journal_changed(self, fills):
+        """
+        subscriber of the trade journal, runs in the thread which wrote the fills
+        """
+        Clock.schedule_once(lambda time_: self.update_gui(), 0)
 
     def update_strategy_params(self):
 
         def get_last_open_position_price_and_time(strategy):
-            trade_journal = self.futu.filter_trade_journal(
-                self.futu.get_trade_journal(),
+            # todo: review logic: the last trade can be a partial closing trade, not the latest open trade
+            trade_journal = self.futu.get_trade_journal(
                 self.algo_main_page.algo_trade.start_date,
-                self.algo_main_page.algo_trade.end_date
+                self.algo_main_page.algo_trade.end_date,
+                strategy=strategy.name,
+                limit=1
             )
-
-            for i in trade_journal.index:
-                # todo: review logic: the last trade can be a partial closing trade, not the latest open trade
-                if trade_journal['remark'][i][:3] == strategy.name:
-                    return trade_journal['price'][i], trade_journal['create_time'][i]
+            if not trade_journal.empty:
+                return trade_journal['price'][0], trade_journal['create_time'][0]
 
         algo_table = self.algo_main_page.algo_trade.algo_table
         if not algo_table.empty:
@@ -95,15 +117,19 @@ class AlgoTradeForFHSI(App):
 
     def update_gui(self):
         self.algo_main_page.algo_trade.update_table()
-        self.algo_main_page.trade_journal.refresh()
         # Clock.schedule_once(lambda time_: self.algo_main_page.algo_trade.update_table(), 0)
-        # Clock.schedule_once(lambda time_: self.algo_main_page.trade_journal.refresh(), 0)
 
     # ------------------------------------------------------------------------------------------- #
     """ helper methods """
     # ------------------------------------------------------------------------------------------- #
+    def export_latency(self):
+        mode = 'demo' if self.is_demo else 'live'
+        self.latency.export(os.path.join(self.proj_dir, 'database', 'log', f'latency_{mode}.csv'))
+
     def connect_brokers(self):
         self.futu = FutuApi()
+        self.futu.journal.subscribe(self.on_journal_changed)
+        self.futu.journal.subscribe(self.algo_main_page.trade_journal.on_journal_changed)
         self.ibapi = IBApi()
         self.futu.connect(unlock_trade_password=FUTU_UNLOCK_TRADE_PASSWORD)
         self.ibapi.init_connection(IB_TWS_ADDRESS)
@@ -144,6 +170,8 @@ if __name__ == '__main__':
     IB_TWS_LOGIN_PWD = sys_params['ib_login_pwd']
     IS_DEMO = sys_params['demo']
     RUNNING_STRATEGIES = sys_params['strategy']
+    LATENCY_EXPORT_INTERVAL = 900  # seconds, latency percentiles are written to database/log
+    PNL_REFRESH_RATE = 10  # Hz, realtime P&L labels, ticks in between are coalesced
 
     # configure logging
     config_logging(IS_DEMO, PROJECT_DIR)
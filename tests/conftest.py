@@ -0,0 +1,74 @@
+"""
+the backtesting modules import each other by module name (they are run from backtesting/),
+tests import them the same way
+"""
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_DIR = os.path.join(PROJECT_DIR, 'database', 'fhsi_m1')
+
+for path in (PROJECT_DIR, os.path.join(PROJECT_DIR, 'backtesting')):  # 'main' is backtesting/main.py
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import bar_store  # noqa: E402
+import load_data  # noqa: E402
+
+
+def get_contract_path(contract: str) -> os.path:
+    """
+    :param contract: e.g. 'HSIF0'
+    """
+    return os.path.join(DB_DIR, f'{contract}-Interactive Brokers-HKFE-Futures-Minute-Trade.csv')
+
+
+def read_backtest_data(store_dir: os.path, from_, to_) -> pd.DataFrame:
+    """
+    bars of the bar store with the column names of the backtest engine
+    """
+    return bar_store.read(store_dir, from_, to_).rename(columns={'Date': 'time_key', 'Open': 'open', 'High': 'high',
+                                                                 'Low': 'low', 'Close': 'close', 'Volume': 'volume'})
+
+
+@pytest.fixture(scope='session')
+def contract_bars():
+    """
+    1-minute bars of the Jan 2020 contract (2019-12-27 to 2020-01-22)
+    """
+    return load_data.read_contract_file(get_contract_path('HSIF0'))
+
+
+@pytest.fixture(scope='session')
+def kline(contract_bars) -> pd.DataFrame:
+    """
+    real bars with the column names of the strategies, led by missing values
+    and with a flat stretch (constant prices over more than all windows)
+    """
+    df = contract_bars.rename(columns={'Date': 'time_key', 'Open': 'open', 'High': 'high', 'Low': 'low',
+                                       'Close': 'close', 'Volume': 'volume'})
+    df = df.astype({'open': float, 'high': float, 'low': float, 'close': float})
+    df.loc[:9, ['open', 'high', 'low', 'close']] = np.nan
+    df.loc[2000:2100, ['open', 'high', 'low', 'close']] = df.loc[2000, 'close']
+
+    return df
+
+
+@pytest.fixture(scope='session')
+def store_dir(tmp_path_factory):
+    """
+    bar store of the contracts from Feb to May 2020 (2020-01-14 to 2020-05-25)
+    """
+    project_dir = tmp_path_factory.mktemp('project')
+    db_dir = os.path.join(project_dir, 'database', 'fhsi_m1')
+    os.makedirs(db_dir)
+    for contract in ('HSIG0', 'HSIH0', 'HSIJ0', 'HSIK0'):
+        shutil.copy2(get_contract_path(contract), db_dir)
+    load_data.load(project_dir)
+
+    return bar_store.get_store_dir(project_dir)
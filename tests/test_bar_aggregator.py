@@ -0,0 +1,97 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from library import bar_aggregator
+from library.bar_aggregator import BarAggregator
+
+
+def get_kline(*time_keys: str) -> pd.DataFrame:
+    """
+    minute bars at 'time_keys', the values count up from 1
+    """
+    values = np.arange(1., len(time_keys) + 1)
+    return pd.DataFrame({'time_key': pd.to_datetime(list(time_keys)), 'open': values, 'high': values + 0.5,
+                         'low': values - 0.5, 'close': values, 'volume': values})
+
+
+def get_labels(kline: pd.DataFrame, timeframe: str) -> list:
+    return [str(time_key) for time_key in bar_aggregator.aggregate(kline, timeframe)['time_key']]
+
+
+def test_bars_never_span_a_break():
+    kline = get_kline('2020-03-02 09:16', '2020-03-02 10:15', '2020-03-02 10:16', '2020-03-02 12:00',
+                      '2020-03-02 13:01', '2020-03-02 16:30', '2020-03-02 17:16', '2020-03-03 03:00')
+
+    assert get_labels(kline, '60m') == ['2020-03-02 10:15:00', '2020-03-02 11:15:00', '2020-03-02 12:00:00',
+                                        '2020-03-02 14:00:00', '2020-03-02 16:30:00', '2020-03-02 18:15:00',
+                                        '2020-03-03 03:00:00']
+    assert get_labels(kline, 'session') == ['2020-03-02 12:00:00', '2020-03-02 16:30:00', '2020-03-03 03:00:00']
+
+
+def test_night_session_belongs_to_the_trading_day_before():
+    kline = get_kline('2020-03-02 16:30', '2020-03-02 23:59', '2020-03-03 00:01', '2020-03-03 03:00',
+                      '2020-03-03 09:16')
+
+    daily = bar_aggregator.aggregate(kline, 'daily')
+    assert [str(time_key) for time_key in daily['time_key']] == ['2020-03-02 00:00:00', '2020-03-03 00:00:00']
+    assert daily['volume'].tolist() == [1 + 2 + 3 + 4, 5]
+    assert daily['open'].tolist() == [1, 5] and daily['close'].tolist() == [4, 5]
+
+
+def test_bars_outside_sessions_merge_into_the_next_session():
+    # pre-opening auction, lunch break prints, after the afternoon close
+    kline = get_kline('2020-03-02 09:10', '2020-03-02 09:20', '2020-03-02 12:30', '2020-03-02 13:05',
+                      '2020-03-02 16:45', '2020-03-02 17:20')
+
+    assert get_labels(kline, '15m') == ['2020-03-02 09:30:00', '2020-03-02 13:15:00', '2020-03-02 17:30:00']
+    assert get_labels(kline, 'session') == ['2020-03-02 12:00:00', '2020-03-02 16:30:00', '2020-03-03 03:00:00']
+
+
+def test_start_label():
+    end_labelled = get_kline('2020-03-02 09:16', '2020-03-02 09:30', '2020-03-02 09:31', '2020-03-02 12:00')
+    start_labelled = end_labelled.assign(time_key=end_labelled['time_key'] - pd.Timedelta(minutes=1))
+
+    pd.testing.assert_frame_equal(bar_aggregator.aggregate(start_labelled, '15m', label='start'),
+                                  bar_aggregator.aggregate(end_labelled, '15m'))
+
+
+@pytest.mark.parametrize('timeframe', ['1m', '5m', '60m', 'session', 'daily'])
+def test_incremental_same_as_batch(contract_bars, timeframe):
+    kline = contract_bars.rename(columns={'Date': 'time_key', 'Open': 'open', 'High': 'high', 'Low': 'low',
+                                          'Close': 'close', 'Volume': 'volume'})
+    aggregator = BarAggregator(timeframes=(timeframe,), maxlen=len(kline))
+    closed = []
+    aggregator.subscribe(timeframe, closed.append)
+    for row in kline.itertuples(index=False):
+        aggregator.update(row.time_key, row.open, row.high, row.low, row.close, row.volume)
+    aggregator.flush()
+
+    expected = bar_aggregator.aggregate(kline, timeframe)
+    bars = aggregator.get_bars(timeframe)
+    bars['time_key'] = pd.to_datetime(bars['time_key']).astype(expected['time_key'].dtype)
+    pd.testing.assert_frame_equal(bars, expected, check_dtype=False)
+    assert len(closed) == len(expected)
+    assert expected['volume'].sum() == kline['volume'].sum()
+
+
+def test_intraday_bar_closes_with_its_last_minute():
+    aggregator = BarAggregator(timeframes=('15m', 'daily'))
+
+    assert aggregator.update(dt.datetime(2020, 3, 2, 9, 16), 1, 2, 0, 1, 10) == []
+    closed = aggregator.update(dt.datetime(2020, 3, 2, 9, 30), 1, 3, 1, 2, 10)
+    assert [(timeframe, bar['time_key'], bar['high'], bar['volume']) for timeframe, bar in closed] == \
+           [('15m', dt.datetime(2020, 3, 2, 9, 30), 3, 20)]
+
+    # the daily bar is closed by the first bar of the next trading day
+    assert aggregator.update(dt.datetime(2020, 3, 3, 3, 0), 2, 2, 2, 2, 1)[0][0] == '15m'
+    closed = aggregator.update(dt.datetime(2020, 3, 3, 9, 16), 3, 3, 3, 3, 1)
+    assert [(timeframe, bar['time_key'], bar['volume']) for timeframe, bar in closed] == \
+           [('daily', dt.datetime(2020, 3, 2), 21)]
+
+
+def test_unknown_timeframe():
+    with pytest.raises(ValueError):
+        BarAggregator(timeframes=('1h',))
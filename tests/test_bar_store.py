@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+import bar_store
+
+
+def get_expected(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    bars as returned by bar_store.read
+    """
+    return df.astype({col: dtype for col, dtype in bar_store.COLUMNS.items() if col != 'Date'}) \
+        .astype({'Date': 'datetime64[ns]'}).reset_index(drop=True)
+
+
+def test_round_trip(tmp_path, contract_bars):
+    bar_store.write(tmp_path, contract_bars)
+
+    df = bar_store.read(tmp_path, contract_bars['Date'].iloc[0], contract_bars['Date'].iloc[-1])
+    pd.testing.assert_frame_equal(df, get_expected(contract_bars))
+    assert bar_store.list_partitions(tmp_path) == ['2019-12', '2020-01']
+
+
+def test_read_range_across_months(tmp_path, contract_bars):
+    bar_store.write(tmp_path, contract_bars)
+    from_, to_ = pd.Timestamp('2019-12-31 10:00'), pd.Timestamp('2020-01-02 10:00')
+
+    df = bar_store.read(tmp_path, from_, to_)
+    expected = contract_bars[(contract_bars['Date'] >= from_) & (contract_bars['Date'] <= to_)]
+    pd.testing.assert_frame_equal(df, get_expected(expected))
+    assert df['Date'].iloc[0] == from_ and df['Date'].iloc[-1] == to_
+
+
+def test_read_empty_range(tmp_path, contract_bars):
+    bar_store.write(tmp_path, contract_bars)
+
+    df = bar_store.read(tmp_path, pd.Timestamp('2021-01-01'), pd.Timestamp('2021-02-01'))
+    assert df.empty
+    assert list(df.columns) == list(bar_store.COLUMNS)
+    assert df['Date'].dtype == np.dtype('datetime64[ns]')
+
+
+def test_write_replace_from(tmp_path, contract_bars):
+    bar_store.write(tmp_path, contract_bars)
+    replace_from = pd.Timestamp('2020-01-10 09:15')
+    new_bars = contract_bars[contract_bars['Date'] >= replace_from].copy()
+    new_bars['Close'] += 1
+
+    bar_store.write(tmp_path, new_bars, replace_from=replace_from)
+
+    df = bar_store.read(tmp_path, contract_bars['Date'].iloc[0], contract_bars['Date'].iloc[-1])
+    expected = pd.concat([contract_bars[contract_bars['Date'] < replace_from], new_bars])
+    pd.testing.assert_frame_equal(df, get_expected(expected))
+
+
+def test_manifest(tmp_path):
+    assert bar_store.read_manifest(tmp_path) == {}
+
+    bar_store.write_manifest(tmp_path, {'rollover_days': 2, 'contracts': []})
+    assert bar_store.read_manifest(tmp_path) == {'rollover_days': 2, 'contracts': []}
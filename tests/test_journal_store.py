@@ -0,0 +1,119 @@
+import threading as th
+
+import pandas as pd
+import pytest
+
+from library.journal_store import COLUMNS, JournalCache, JournalStore
+
+
+def make_fills(times: list, remark: str = 'MAL-LE', side: str = 'BUY') -> pd.DataFrame:
+    """
+    one fill per 'create_time', in order of fills
+    """
+    return pd.DataFrame({'create_time': times, 'code': 'HK.MHI2003', 'trd_side': side, 'price': 20000.,
+                         'qty': 1, 'status': 'FILLED_ALL', 'remark': remark}, columns=list(COLUMNS))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JournalStore(str(tmp_path / 'journal' / 'trade_journal_demo.db'))
+    yield store
+    store.close()
+
+
+def test_store_query(store):
+    store.append(make_fills(['2020-03-02 09:30:00', '2020-03-02 10:00:00']))
+    store.append(make_fills(['2020-03-02 10:00:00', '2020-03-03 09:20:00'], remark='EMC-SE', side='SELL'))
+
+    journal = store.query()
+    assert list(journal.columns) == list(COLUMNS) and len(store) == 4
+    # latest first, later fills first for the same time
+    assert list(journal['create_time']) == ['2020-03-03 09:20:00', '2020-03-02 10:00:00', '2020-03-02 10:00:00',
+                                            '2020-03-02 09:30:00']
+    assert list(journal['remark'][1:3]) == ['EMC-SE', 'MAL-LE']
+
+    assert len(store.query(start='2020-03-02 10:00:00', end='2020-03-02 23:59:59')) == 2
+    assert list(store.query(strategy='EMC')['remark']) == ['EMC-SE'] * 2
+    assert store.query(limit=1)['create_time'][0] == '2020-03-03 09:20:00'
+
+
+def test_import_csv(tmp_path):
+    csv_path = tmp_path / 'trade_journal_demo.csv'
+    make_fills(['2020-03-02 09:30:00', '2020-03-02 10:00:00'])[::-1].to_csv(csv_path, index=False)  # latest first
+
+    store = JournalStore(str(tmp_path / 'trade_journal_demo.db'), csv_path=str(csv_path))
+    assert list(store.query()['create_time']) == ['2020-03-02 10:00:00', '2020-03-02 09:30:00']
+    store.close()
+
+    # imported once
+    store = JournalStore(str(tmp_path / 'trade_journal_demo.db'), csv_path=str(csv_path))
+    assert len(store) == 2
+    store.close()
+
+
+def test_cache_equals_store(store):
+    store.append(make_fills(['2020-03-02 09:30:00', '2020-03-02 10:00:00']))
+    cache = JournalCache(store)
+    received = []
+    cache.subscribe(received.append)
+
+    new = make_fills(['2020-03-02 10:00:00', '2020-03-02 11:00:00'], remark='EMC-SE', side='SELL')
+    cache.append(new)
+    cache.append(make_fills(['2020-03-02 09:45:00']))  # earlier than the latest fill: sorted
+
+    for args in [(), ('2020-03-02 09:40:00', '2020-03-02 10:30:00'), (None, None, 'MAL', 2)]:
+        pd.testing.assert_frame_equal(cache.query(*args), store.query(*args), check_dtype=False)
+    # latest fill of a strategy, also if it is outside the time range
+    for start, end in [(None, None), ('2020-03-02 09:00:00', '2020-03-02 10:30:00'), ('2020-03-02 12:00:00', None)]:
+        for strategy in ('MAL', 'EMC', 'BBR'):
+            pd.testing.assert_frame_equal(cache.query(start, end, strategy, 1), store.query(start, end, strategy, 1),
+                                          check_dtype=False, check_index_type=False)
+    assert len(received) == 2 and received[0] is new
+
+
+def test_latest_fill_from_memory(store, monkeypatch):
+    cache = JournalCache(store)
+    cache.append(make_fills(['2020-03-02 09:30:00', '2020-03-02 10:00:00']))
+    cache.append(make_fills(['2020-03-02 09:45:00'], remark='MAL-LX', side='SELL'))  # earlier than the latest one
+
+    def fail(*args, **kwargs):
+        raise AssertionError('read from the database')
+
+    monkeypatch.setattr(store, 'query', fail)
+    latest = cache.query('2020-03-02 09:00:00', '2020-03-02 23:59:59', strategy='MAL', limit=1)
+    assert latest.to_dict('records') == make_fills(['2020-03-02 10:00:00']).to_dict('records')
+    assert cache.query(strategy='EMC', limit=1).empty
+
+
+def test_failed_write_keeps_cache(store, monkeypatch):
+    cache = JournalCache(store)
+    received = []
+    cache.subscribe(received.append)
+    cache.append(make_fills(['2020-03-02 09:30:00']))
+
+    def fail(data):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(store, 'append', fail)
+    with pytest.raises(OSError):
+        cache.append(make_fills(['2020-03-02 10:00:00']))
+
+    assert len(cache.query()) == 1 and len(received) == 1
+
+
+def test_concurrent_appends(store):
+    cache = JournalCache(store)
+    time_ = '2020-03-02 09:30:00'  # same time: the order of the fills is the order of the appends
+
+    def append(remark: str):
+        for _ in range(20):
+            cache.append(make_fills([time_], remark=remark))
+
+    threads = [th.Thread(target=append, args=(f'{name}-LE',)) for name in ('MAL', 'EMC', 'BBR', 'ADX')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(store) == 80
+    assert list(cache.query()['remark']) == list(store.query()['remark'])
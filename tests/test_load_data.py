@@ -0,0 +1,156 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import bar_store
+import load_data
+from conftest import get_contract_path
+
+
+def add_contracts(project_dir: os.path, *contracts: str) -> os.path:
+    db_dir = os.path.join(project_dir, 'database', 'fhsi_m1')
+    os.makedirs(db_dir, exist_ok=True)
+    for contract in contracts:
+        shutil.copy2(get_contract_path(contract), db_dir)
+
+    return db_dir
+
+
+def read_store(project_dir: os.path) -> pd.DataFrame:
+    return bar_store.read(bar_store.get_store_dir(project_dir), pd.Timestamp('2000-01-01'), pd.Timestamp('2100-01-01'))
+
+
+def read_contract(contract: str, start: pd.Timestamp = None, end: pd.Timestamp = None) -> pd.DataFrame:
+    """
+    bars of a contract file in [start, end), as returned by bar_store.read
+    """
+    df = load_data.read_contract_file(get_contract_path(contract))
+    df = df[(df['Date'] >= (start or df['Date'].iloc[0])) & (df['Date'] < (end or df['Date'].iloc[-1] + pd.Timedelta(minutes=1)))]
+
+    return df.astype({col: dtype for col, dtype in bar_store.COLUMNS.items() if col != 'Date'}) \
+        .astype({'Date': 'datetime64[ns]'}).reset_index(drop=True)
+
+
+""" rollover """
+def test_cut_over_at_rollover_date(tmp_path):
+    # Mar 2020 expires on 2020-03-30, 2 trading days before is 2020-03-26
+    add_contracts(tmp_path, 'HSIH0', 'HSIJ0')
+    load_data.load(tmp_path, rollover_days=2)
+
+    df = read_store(tmp_path)
+    cut_over = pd.Timestamp('2020-03-26 09:15')
+    before = df[df['Date'] < cut_over].reset_index(drop=True)
+    after = df[df['Date'] >= cut_over].reset_index(drop=True)
+    pd.testing.assert_frame_equal(before, read_contract('HSIH0', end=cut_over))
+    pd.testing.assert_frame_equal(after, read_contract('HSIJ0', start=cut_over))
+
+
+def test_cut_over_at_end_of_data(tmp_path):
+    # Feb 2020 rolls over on 2020-02-25, its file ends before the day session
+    add_contracts(tmp_path, 'HSIG0', 'HSIH0')
+    load_data.load(tmp_path, rollover_days=2)
+
+    df = read_store(tmp_path)
+    cut_over = pd.Timestamp('2020-02-25 03:01')
+    pd.testing.assert_frame_equal(df[df['Date'] < cut_over].reset_index(drop=True), read_contract('HSIG0'))
+    pd.testing.assert_frame_equal(df[df['Date'] >= cut_over].reset_index(drop=True),
+                                  read_contract('HSIH0', start=cut_over))
+    assert df['Date'].is_unique and df['Date'].is_monotonic_increasing
+
+
+@pytest.mark.parametrize('rollover_days, cut_over', [(0, '2020-03-27 03:01'), (4, '2020-03-24 09:15')])
+def test_rollover_days(tmp_path, rollover_days, cut_over):
+    add_contracts(tmp_path, 'HSIH0', 'HSIJ0')
+    load_data.load(tmp_path, rollover_days=rollover_days)
+
+    df = read_store(tmp_path)
+    cut_over = pd.Timestamp(cut_over)
+    assert df[df['Date'] < cut_over]['Date'].iloc[-1] == read_contract('HSIH0', end=cut_over)['Date'].iloc[-1]
+    pd.testing.assert_frame_equal(df[df['Date'] >= cut_over].reset_index(drop=True),
+                                  read_contract('HSIJ0', start=cut_over))
+
+
+""" incremental ingest """
+def test_incremental_equals_full_rebuild(tmp_path):
+    incremental_dir, full_dir = tmp_path / 'incremental', tmp_path / 'full'
+    add_contracts(incremental_dir, 'HSIG0', 'HSIH0')
+    load_data.load(incremental_dir, incremental=True)
+    add_contracts(incremental_dir, 'HSIJ0', 'HSIK0')
+    load_data.load(incremental_dir, incremental=True)
+
+    add_contracts(full_dir, 'HSIG0', 'HSIH0', 'HSIJ0', 'HSIK0')
+    load_data.load(full_dir)
+
+    pd.testing.assert_frame_equal(read_store(incremental_dir), read_store(full_dir))
+    incremental_records = bar_store.read_manifest(bar_store.get_store_dir(incremental_dir))['contracts']
+    full_records = bar_store.read_manifest(bar_store.get_store_dir(full_dir))['contracts']
+    assert [(r['file'], r['start'], r['end']) for r in incremental_records] == \
+           [(r['file'], r['start'], r['end']) for r in full_records]
+
+
+def test_incremental_changed_file(tmp_path):
+    incremental_dir, full_dir = tmp_path / 'incremental', tmp_path / 'full'
+    db_dir = add_contracts(incremental_dir, 'HSIG0', 'HSIH0', 'HSIJ0')
+    load_data.load(incremental_dir, incremental=True)
+
+    # the latest contract is exported again with more bars
+    shutil.copy2(get_contract_path('HSIJ0'), db_dir)
+    path = os.path.join(db_dir, os.path.basename(get_contract_path('HSIJ0')))
+    df = pd.read_csv(path, dtype=str)
+    df.iloc[len(df) // 2:].to_csv(path, index=False)  # drop the first half, i.e. a changed file
+    load_data.load(incremental_dir, incremental=True)
+
+    full_db_dir = add_contracts(full_dir, 'HSIG0', 'HSIH0')
+    shutil.copy2(path, full_db_dir)
+    load_data.load(full_dir)
+
+    pd.testing.assert_frame_equal(read_store(incremental_dir), read_store(full_dir))
+
+
+def test_incremental_empty_first_file(tmp_path):
+    incremental_dir, full_dir = tmp_path / 'incremental', tmp_path / 'full'
+    for project_dir in (incremental_dir, full_dir):
+        db_dir = add_contracts(project_dir, 'HSIF0', 'HSIG0')
+        path = os.path.join(db_dir, os.path.basename(get_contract_path('HSIF0')))
+        pd.read_csv(path, dtype=str).iloc[:0].to_csv(path, index=False)  # header only
+    load_data.load(incremental_dir, incremental=True)
+    manifest = bar_store.read_manifest(bar_store.get_store_dir(incremental_dir))
+    assert manifest['contracts'][0]['start'] is None and manifest['contracts'][1]['start'] is not None
+
+    # the contract after the empty one changed: the store is rebuilt from its first bar
+    db_dir = os.path.join(incremental_dir, 'database', 'fhsi_m1')
+    path = os.path.join(db_dir, os.path.basename(get_contract_path('HSIG0')))
+    df = pd.read_csv(path, dtype=str)
+    df.iloc[len(df) // 2:].to_csv(path, index=False)
+    add_contracts(incremental_dir, 'HSIH0')
+    load_data.load(incremental_dir, incremental=True)
+
+    full_db_dir = os.path.join(full_dir, 'database', 'fhsi_m1')
+    shutil.copy2(path, full_db_dir)
+    add_contracts(full_dir, 'HSIH0')
+    load_data.load(full_dir)
+
+    df = read_store(incremental_dir)
+    assert df['Date'].iloc[0] == load_data.read_contract_file(path)['Date'].iloc[0]
+    pd.testing.assert_frame_equal(df, read_store(full_dir))
+
+
+def test_no_bars(tmp_path):
+    db_dir = add_contracts(tmp_path, 'HSIF0')
+    path = os.path.join(db_dir, os.path.basename(get_contract_path('HSIF0')))
+    pd.read_csv(path, dtype=str).iloc[:0].to_csv(path, index=False)
+
+    with pytest.raises(ValueError, match='No bars'):
+        load_data.load(tmp_path)
+
+
+def test_incremental_up_to_date(tmp_path, capsys):
+    add_contracts(tmp_path, 'HSIG0', 'HSIH0')
+    load_data.load(tmp_path, incremental=True)
+    df = read_store(tmp_path)
+
+    load_data.load(tmp_path, incremental=True)
+    assert 'up to date' in capsys.readouterr().out
+    pd.testing.assert_frame_equal(read_store(tmp_path), df)
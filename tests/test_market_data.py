@@ -0,0 +1,104 @@
+import logging
+
+import pytest
+
+from library.market_data import MarketDataDispatcher
+
+
+def get_stats(dispatcher: MarketDataDispatcher, consumer: str) -> tuple:
+    stats = dispatcher.get_stats().set_index('consumer')
+    return tuple(stats.loc[consumer, ['received', 'delivered', 'dropped']])
+
+
+class Consumer:
+    def __init__(self, name: str):
+        self.__name__ = name
+        self.values = []
+
+    def __call__(self, value):
+        self.values.append(value)
+
+
+def test_tick():
+    dispatcher = MarketDataDispatcher()
+    ticks = Consumer('ticks')
+    dispatcher.subscribe('FHSI_PRICE', ticks)
+    for price in range(5):
+        dispatcher.publish('FHSI_PRICE', price)
+    dispatcher.publish('FHSI_1M', 99)  # other topic
+
+    assert ticks.values == [0, 1, 2, 3, 4]
+    assert get_stats(dispatcher, 'ticks') == (5, 5, 0)
+
+
+def test_latest():
+    dispatcher = MarketDataDispatcher()
+    latest = Consumer('latest')
+    dispatcher.subscribe('FHSI_PRICE', latest, mode='latest', rate=10)
+    assert dispatcher.get_flush_interval() == pytest.approx(0.1)
+
+    dispatcher.flush(now=100.)  # nothing pending
+    for price in range(5):
+        dispatcher.publish('FHSI_PRICE', price)
+    assert latest.values == []  # only delivered by flush
+
+    dispatcher.flush(now=100.)
+    assert latest.values == [4]
+
+    dispatcher.publish('FHSI_PRICE', 5)
+    dispatcher.publish('FHSI_PRICE', 6)
+    dispatcher.flush(now=100.05)  # before next_time (rate 10 per second)
+    assert latest.values == [4]
+    assert get_stats(dispatcher, 'latest') == (7, 1, 5)  # the pending value is not dropped yet
+
+    dispatcher.flush(now=100.1)
+    assert latest.values == [4, 6]
+    assert get_stats(dispatcher, 'latest') == (7, 2, 5)
+
+
+def test_bar_close():
+    dispatcher = MarketDataDispatcher()
+    closes = Consumer('closes')
+    dispatcher.subscribe('FHSI_1M', closes, mode='bar_close')
+    for key, value in [('09:15', 1), ('09:15', 2), ('09:16', 3), ('09:16', 4), ('09:16', 5), ('09:17', 6)]:
+        dispatcher.publish('FHSI_1M', value, key=key)
+
+    # the last value of a bar, delivered when the next bar starts
+    assert closes.values == [2, 5]
+    assert get_stats(dispatcher, 'closes') == (6, 2, 3)
+
+
+def test_failing_consumer(caplog):
+    dispatcher = MarketDataDispatcher()
+    ticks = Consumer('ticks')
+
+    def failing(value):
+        raise RuntimeError('consumer error')
+
+    dispatcher.subscribe('FHSI_PRICE', failing)
+    dispatcher.subscribe('FHSI_PRICE', ticks)
+    with caplog.at_level(logging.ERROR):
+        dispatcher.publish('FHSI_PRICE', 1)
+
+    # logged, the other consumers still get the value
+    assert ticks.values == [1]
+    assert 'failing failed on FHSI_PRICE' in caplog.text
+    assert get_stats(dispatcher, 'failing') == (1, 1, 0)
+
+
+def test_stats_columns():
+    dispatcher = MarketDataDispatcher()
+    assert dispatcher.get_stats().empty and dispatcher.get_flush_interval() is None
+
+    dispatcher.subscribe('FHSI_PRICE', Consumer('ticks'))
+    dispatcher.subscribe('FHSI_PRICE', Consumer('latest'), mode='latest', rate=4)
+    stats = dispatcher.get_stats()
+    assert list(stats.columns) == ['topic', 'consumer', 'mode', 'received', 'delivered', 'dropped']
+    assert list(stats['mode']) == ['tick', 'latest']
+    assert dispatcher.get_flush_interval() == pytest.approx(0.25)
+
+
+@pytest.mark.parametrize('mode, rate', [('every', None), ('latest', None), ('latest', 0)])
+def test_invalid_subscription(mode, rate):
+    with pytest.raises(ValueError):
+        MarketDataDispatcher().subscribe('FHSI_PRICE', Consumer('consumer'), mode=mode, rate=rate)
@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from library.pnl_service import PnlService
+
+
+@pytest.fixture
+def service():
+    service = PnlService(point_value=10)
+    algo_table = pd.DataFrame({'Strategy': ['MAL', 'BOL', 'SWL'], 'Inventory': [1, 0, -2],
+                               'AvgPrice': [19000, 0, 19010], 'P / L': [-50, 100, 0]}, dtype=object)  # as FutuApi
+    service.set_positions(algo_table)
+    return service
+
+
+def as_dict(changes: list) -> dict:
+    return {strategy: pytest.approx(pnl) for strategy, pnl in changes}
+
+
+def test_no_price(service):
+    assert service.get_changes() == []
+
+
+def test_strategies_with_inventory(service):
+    service.update_price(19005)
+
+    # realized + (price - average price) * inventory * point value, BOL is flat
+    assert as_dict(service.get_changes()) == {'MAL': 0, 'SWL': 100}
+
+
+def test_ticks_are_coalesced(service):
+    for price in (19001, 19020, 19005):
+        service.update_price(price)
+
+    assert as_dict(service.get_changes()) == {'MAL': 0, 'SWL': 100}
+    assert service.get_changes() == []  # nothing new
+
+
+def test_only_changed_values(service):
+    service.update_price(19005)
+    service.get_changes()
+
+    service.update_price(19005)
+    assert service.get_changes() == []
+
+    service.update_price(19005.01)  # MAL 0.1, SWL 99.8: same rounded values
+    assert service.get_changes() == []
+
+    service.update_price(19005.04)  # MAL 0.4, SWL 99.2
+    assert as_dict(service.get_changes()) == {'SWL': 99.2}
+
+
+def test_set_positions(service):
+    service.update_price(19005)
+    service.get_changes()
+
+    # the rebuilt table shows the realized P&L, the realtime values are shown again
+    algo_table = pd.DataFrame({'Strategy': ['MAL', 'BOL'], 'Inventory': [2, -1], 'AvgPrice': [19000, 19100],
+                               'P / L': [0, 100]}, dtype=object)
+    service.set_positions(algo_table)
+    assert as_dict(service.get_changes()) == {'MAL': 100, 'BOL': 1050}
+
+
+def test_empty_table(service):
+    service.set_positions(pd.DataFrame(columns=['Strategy', 'Inventory', 'AvgPrice', 'P / L']))
+    service.update_price(19005)
+
+    assert service.get_changes() == []
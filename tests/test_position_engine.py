@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from library.position_engine import PositionEngine
+
+FEE_PER_CONTRACT = 10.6  # MHI: commission 2, platform 5, exchange 3.5, SFC 0.1 (FutuApi.fees_count)
+
+
+def calculate_trading_data(trade_journal: pd.DataFrame):
+    """
+    the algo table's loop before the position engine (FutuApi.calculate_trading_data), one strategy, latest first
+    """
+    position = buy_avg_price = sell_avg_price = avg_price = trade_vol = pnl_price = 0
+    for i, row in trade_journal[::-1].iterrows():
+        side, price, qty = row['trd_side'], row['price'], row['qty']
+
+        # calculate buy/sell average price
+        if 'BUY' in side:
+            position += qty
+            buy_avg_price += price * qty
+        elif 'SELL' in side:
+            position -= qty
+            sell_avg_price += price * qty
+        trade_vol += qty
+
+        # calculate average price
+        if position == 0:
+            pnl_price += sell_avg_price - buy_avg_price
+            buy_avg_price = sell_avg_price = 0
+        else:
+            avg_price = buy_avg_price - sell_avg_price
+
+    # calculate fees, average_price and pnl
+    point_value = 10
+    fees = FEE_PER_CONTRACT * trade_vol
+    avg_price = avg_price / position if position else 0
+    pnl_value = pnl_price * point_value - fees
+
+    return int(position), abs(int(avg_price)), trade_vol, int(fees), int(pnl_value)
+
+
+def make_journal(seed: int, count: int) -> pd.DataFrame:
+    """
+    random fills of 3 strategies, latest first
+    """
+    rng = np.random.default_rng(seed)
+    journal = pd.DataFrame({
+        'create_time': [f'2023-06-01 {10 + i // 60:02d}:{i % 60:02d}:00' for i in range(count)],
+        'trd_side': rng.choice(['BUY', 'SELL', 'SELL_SHORT', 'BUY_BACK'], count),
+        'price': rng.integers(18000, 20000, count).astype(float),
+        'qty': rng.integers(1, 3, count),
+        'remark': rng.choice(['MAL-LE', 'BOL-SX', 'SWL-1'], count),
+    })
+    return journal[::-1].reset_index(drop=True)
+
+
+def assert_same_as_loop(engine: PositionEngine, journal: pd.DataFrame):
+    for strategy in ('MAL', 'BOL', 'SWL', 'EMC'):
+        assert engine.get(strategy) == calculate_trading_data(journal[journal['remark'].str[:3] == strategy])
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_load(seed):
+    journal = make_journal(seed, count=(seed * 7) % 90)
+    engine = PositionEngine(point_value=10, fee_per_contract=FEE_PER_CONTRACT)
+    engine.load(journal)
+
+    assert_same_as_loop(engine, journal)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_apply_fills(seed):
+    journal = make_journal(seed, count=(seed * 7) % 90)
+    engine = PositionEngine(point_value=10, fee_per_contract=FEE_PER_CONTRACT)
+    engine.load(journal.iloc[0:0])
+
+    # fills come in order of fills, a few at a time
+    fills = journal[::-1]
+    for start in range(0, len(fills), 4):
+        engine.apply_fills(fills.iloc[start:start + 4])
+
+    assert_same_as_loop(engine, journal)
+
+
+def test_round_trips():
+    journal = pd.DataFrame({
+        'create_time': ['2023-06-01 10:00:00', '2023-06-01 10:01:00', '2023-06-01 10:02:00', '2023-06-01 10:03:00',
+                        '2023-06-01 10:04:00'],
+        'trd_side': ['BUY', 'BUY', 'SELL', 'SELL', 'SELL'],
+        'price': [20000., 20010., 20030., 20040., 20100.],
+        'qty': [1, 1, 1, 1, 2],
+        'remark': ['MAL-LE', 'MAL-LE', 'MAL-LX', 'MAL-LX', 'MAL-SE'],
+    })[::-1].reset_index(drop=True)
+    engine = PositionEngine(point_value=10, fee_per_contract=FEE_PER_CONTRACT)
+    engine.load(journal)
+
+    # long round trip: 30 + 30 points, open short of 2 at 20100, 6 contracts traded
+    assert engine.get('MAL') == (-2, 20100, 6, int(6 * FEE_PER_CONTRACT), int(60 * 10 - 6 * FEE_PER_CONTRACT))
+
+
+def test_time_range():
+    journal = make_journal(0, count=30)
+    time_range = ('2023-06-01 10:05:00', '2023-06-01 10:20:00')
+    in_range = journal[journal['create_time'].between(*time_range)]
+    engine = PositionEngine(point_value=10, fee_per_contract=FEE_PER_CONTRACT)
+    engine.load(in_range[in_range['create_time'] < '2023-06-01 10:10:00'], time_range)
+
+    # fills outside the loaded range are ignored
+    fills = journal[::-1]
+    engine.apply_fills(fills[fills['create_time'] >= '2023-06-01 10:10:00'])
+
+    assert_same_as_loop(engine, in_range)
+
+
+def test_unknown_strategy():
+    engine = PositionEngine(point_value=10, fee_per_contract=FEE_PER_CONTRACT)
+    engine.load(pd.DataFrame())
+
+    assert engine.get('MAL') == (0, 0, 0, 0, 0)
@@ -0,0 +1,71 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from library.ring_buffer import KlineBuffer
+
+
+def fill(buffer: KlineBuffer, count: int, start: int = 0):
+    """
+    add 'count' bars, bar i: time_key 09:15 + i minutes, all prices i
+    """
+    for i in range(start, start + count):
+        buffer.append(dt.datetime(2020, 3, 2, 9, 15) + dt.timedelta(minutes=i), i, i, i, i, 1)
+
+
+def test_empty():
+    buffer = KlineBuffer('FHSI', capacity=5)
+
+    assert len(buffer) == 0 and buffer.get_last_time_key() is None
+    df = buffer.to_frame()
+    assert df.empty and list(df.columns) == list(KlineBuffer.columns)
+
+
+@pytest.mark.parametrize('count', [3, 5, 6, 10, 11, 23])
+def test_wraparound(count):
+    buffer = KlineBuffer('FHSI', capacity=5)
+    fill(buffer, count)
+
+    expected = np.arange(max(0, count - 5), count, dtype=float)
+    assert len(buffer) == len(expected)
+    np.testing.assert_array_equal(buffer.get_array('close'), expected)
+    assert buffer.get_last_time_key() == dt.datetime(2020, 3, 2, 9, 15) + dt.timedelta(minutes=count - 1)
+
+    df = buffer.to_frame()
+    assert df.index.equals(pd.RangeIndex(len(expected)))
+    np.testing.assert_array_equal(df['open'], expected)
+    assert (df['code'] == 'FHSI').all()
+    assert df['time_key'].is_monotonic_increasing
+
+
+def test_update_last_after_wraparound():
+    buffer = KlineBuffer('FHSI', capacity=5)
+    fill(buffer, 7)
+    buffer.update_last(buffer.get_last_time_key(), 6, 9, 5, 8, 2)
+    fill(buffer, 4, start=7)  # the updated bar stays in the buffer, via both halves
+
+    np.testing.assert_array_equal(buffer.get_array('high'), [9, 7, 8, 9, 10])
+    np.testing.assert_array_equal(buffer.to_frame()['close'], [8, 7, 8, 9, 10])
+
+
+def test_array_is_a_read_only_view():
+    buffer = KlineBuffer('FHSI', capacity=5)
+    fill(buffer, 8)
+
+    with pytest.raises(ValueError):
+        buffer.get_array('close')[0] = 0
+    df = buffer.to_frame()
+    df.loc[0, 'close'] = -1  # copy, the buffer is not changed
+    assert buffer.get_array('close')[0] == 3
+
+
+def test_to_frame_since():
+    buffer = KlineBuffer('FHSI', capacity=5)
+    fill(buffer, 12)
+
+    df = buffer.to_frame(since=dt.datetime(2020, 3, 2, 9, 24))
+    np.testing.assert_array_equal(df['close'], [10, 11])
+    assert len(buffer.to_frame(since=dt.datetime(2020, 3, 2, 9, 0))) == 5
+    assert buffer.to_frame(since=buffer.get_last_time_key()).empty
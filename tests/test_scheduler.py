@@ -0,0 +1,113 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import bar_store
+import scheduler
+import shared_data
+from algorithm.emc_ready import EMC
+from main import BackTestEngine
+
+
+class OvernightEMC(EMC):
+    """
+    EMC without timeout, positions are held across the chunks
+    """
+    def check_is_timeout(self, kline: pd.DataFrame, index: int = 0):
+        return False
+
+    def get_timeout_mask(self, time_key: pd.Series) -> np.ndarray:
+        return np.zeros(len(time_key), dtype=bool)
+
+
+def run_period(shared_bars: shared_data.SharedFrame, period: tuple, warmup_bars: int, initial_state: dict = None,
+               vectorized: bool = False) -> dict:
+    """
+    backtest one chunk as main.run_backtest: warm-up bars before the period and one bar after it
+    """
+    data_from, data_to = period
+    data = shared_bars.read(data_from.replace(hour=9, minute=15), (data_to + dt.timedelta(days=1)).replace(hour=3),
+                            before=warmup_bars, after=1)
+    data = data.rename(columns={'Date': 'time_key', 'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close',
+                                'Volume': 'volume'})
+    engine = BackTestEngine(strategy=OvernightEMC, chart=None, data=data, start_date=data_from, end_date=data_to,
+                            kline_daily=pd.DataFrame(), warmup_bars=warmup_bars, initial_state=initial_state,
+                            vectorized=vectorized, fees=12, slippage=30, point_value=10)
+    start_state = engine.strategy.get_position_state()
+    engine.start_testing_strategy()
+
+    return {'trades': engine.df_trd_jrl, 'start_state': start_state, 'end_state': engine.strategy.get_position_state()}
+
+
+@pytest.fixture(scope='module')
+def shared_bars(store_dir):
+    shared_bars = shared_data.SharedFrame(bar_store.read(store_dir, dt.datetime(2020, 1, 1), dt.datetime(2020, 6, 1)))
+    yield shared_bars
+    shared_bars.unlink()
+
+
+""" stitch """
+def test_stitch_reruns_chunks_with_wrong_start():
+    flat = {'inv_real': 0, 'avg_price': 0}
+    long = {'inv_real': 1, 'avg_price': 100}
+    results = [{'start_state': None, 'end_state': long, 'name': 'a'},
+               {'start_state': None, 'end_state': flat, 'name': 'b'},  # started flat, should start long
+               {'start_state': None, 'end_state': flat, 'name': 'c'}]
+    reruns = []
+
+    def rerun(chunk: int, state: dict) -> dict:
+        reruns.append((chunk, state))
+        return {'start_state': state, 'end_state': flat, 'name': 'b rerun'}
+
+    stitched = scheduler.stitch(iter(results), rerun)
+    assert reruns == [(1, long)]
+    assert [result['name'] for result in stitched] == ['a', 'b rerun', 'c']
+
+
+def test_stitch_initial_state():
+    short = {'inv_real': -1, 'avg_price': 100}
+    results = [{'start_state': None, 'end_state': None}]
+
+    stitched = scheduler.stitch(results, rerun=lambda chunk, state: {'start_state': state, 'end_state': state},
+                                initial_state=short)
+    assert stitched == [{'start_state': short, 'end_state': short}]
+
+
+def test_is_same_position():
+    assert scheduler.is_same_position(None, {'inv_real': 0, 'avg_price': 0})
+    assert not scheduler.is_same_position(None, {'inv_real': 1, 'avg_price': 100})
+    assert not scheduler.is_same_position({'inv_real': 1, 'avg_price': 100}, {'inv_real': 1, 'avg_price': 101})
+
+
+def test_split_months():
+    assert scheduler.split_months(dt.datetime(2020, 1, 15), dt.datetime(2020, 3, 10)) == \
+           [(dt.datetime(2020, 1, 15), dt.datetime(2020, 1, 31)),
+            (dt.datetime(2020, 2, 1), dt.datetime(2020, 2, 29)),
+            (dt.datetime(2020, 3, 1), dt.datetime(2020, 3, 10))]
+
+
+""" chunked backtest """
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_chunked_run_same_as_single_run(shared_bars, vectorized):
+    start_date, end_date = dt.datetime(2020, 2, 10), dt.datetime(2020, 5, 20)
+    warmup_bars = 2000  # the slow EMA (60 bars) has converged to the last bit, see WARMUP_BARS in main.py
+
+    single = run_period(shared_bars, (start_date, end_date), warmup_bars, vectorized=vectorized)
+
+    periods = scheduler.split_months(start_date, end_date)
+    reruns = []
+
+    def rerun(chunk: int, state: dict) -> dict:
+        reruns.append(chunk)
+        return run_period(shared_bars, periods[chunk], warmup_bars, state, vectorized)
+
+    results = scheduler.stitch([run_period(shared_bars, period, warmup_bars, vectorized=vectorized)
+                                for period in periods], rerun)
+    trades = pd.concat([result['trades'] for result in results], axis=0, ignore_index=True)
+
+    assert len(periods) == 4 and reruns  # positions were carried over
+    assert len(trades) > 100
+    pd.testing.assert_frame_equal(trades, single['trades'])
+    assert results[-1]['end_state'] == single['end_state']
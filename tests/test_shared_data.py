@@ -0,0 +1,65 @@
+import multiprocessing as mp
+import pickle
+
+import pandas as pd
+import pytest
+
+from shared_data import SharedFrame
+
+
+def read_in_worker(shared_bars: SharedFrame, from_, to_) -> pd.DataFrame:
+    return shared_bars.read(from_, to_)
+
+
+@pytest.fixture
+def shared_bars(contract_bars):
+    shared_bars = SharedFrame(contract_bars)
+    yield shared_bars
+    shared_bars.unlink()
+
+
+def test_read(shared_bars, contract_bars):
+    from_, to_ = pd.Timestamp('2020-01-02 09:30'), pd.Timestamp('2020-01-03 12:00')
+
+    df = shared_bars.read(from_, to_)
+    expected = contract_bars[(contract_bars['Date'] >= from_) & (contract_bars['Date'] <= to_)]
+    pd.testing.assert_frame_equal(df, expected.reset_index(drop=True))
+
+
+def test_read_before_after(shared_bars, contract_bars):
+    from_, to_ = pd.Timestamp('2020-01-02 09:30'), pd.Timestamp('2020-01-03 12:00')
+    start = contract_bars.index[contract_bars['Date'] == from_][0]
+    end = contract_bars.index[contract_bars['Date'] == to_][0]
+
+    df = shared_bars.read(from_, to_, before=100, after=10)
+    pd.testing.assert_frame_equal(df, contract_bars.iloc[start - 100:end + 11].reset_index(drop=True))
+
+    # extra bars are limited by the data
+    df = shared_bars.read(from_, to_, before=len(contract_bars), after=len(contract_bars))
+    pd.testing.assert_frame_equal(df, contract_bars)
+
+
+def test_read_is_a_copy(shared_bars, contract_bars):
+    df = shared_bars.read(contract_bars['Date'].iloc[0], contract_bars['Date'].iloc[-1])
+    df['Close'] = 0
+
+    assert shared_bars.read(contract_bars['Date'].iloc[0], contract_bars['Date'].iloc[0])['Close'].iloc[0] == \
+           contract_bars['Close'].iloc[0]
+
+
+def test_read_in_worker(shared_bars, contract_bars):
+    assert len(pickle.dumps(shared_bars)) < 1000  # names only, no data
+
+    from_, to_ = contract_bars['Date'].iloc[100], contract_bars['Date'].iloc[200]
+    with mp.Pool(1) as pool:
+        df = pool.apply(read_in_worker, (shared_bars, from_, to_))
+    pd.testing.assert_frame_equal(df, contract_bars.iloc[100:201].reset_index(drop=True))
+
+
+def test_unlink(contract_bars):
+    shared_bars = SharedFrame(contract_bars)
+    copy = pickle.loads(pickle.dumps(shared_bars))
+
+    shared_bars.unlink()
+    with pytest.raises(FileNotFoundError):
+        copy.read(contract_bars['Date'].iloc[0], contract_bars['Date'].iloc[-1])
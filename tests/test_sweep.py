@@ -0,0 +1,73 @@
+import datetime as dt
+
+import pandas as pd
+import pytest
+
+import bar_store
+import shared_data
+import sweep
+from algorithm.emc_ready import EMC
+
+
+class UnlistedEMC(EMC):
+    """
+    same strategy without the list of its indicator params
+    """
+    indicator_params = None
+
+
+@pytest.fixture
+def worker(store_dir):
+    """
+    sweep worker data in this process, as set by the pool initializer
+    """
+    start_date, end_date = dt.datetime(2020, 3, 1), dt.datetime(2020, 3, 31)
+    shared_bars = shared_data.SharedFrame(bar_store.read(store_dir, dt.datetime(2020, 2, 1), dt.datetime(2020, 4, 2)))
+
+    def init(strategy: type):
+        sweep.init_worker(strategy, shared_bars, pd.DataFrame(), start_date, end_date, warmup_bars=500)
+        return start_date, end_date
+
+    yield init
+    shared_bars.unlink()
+
+
+def test_get_indicator_key():
+    combo = {'fast_period': 10, 'slow_period': 60, 'exec_set': 2, 'fees': 12, 'slippage': 30, 'point_value': 10}
+
+    assert sweep.get_indicator_key(EMC, combo) == (10, 60)
+    assert sweep.get_indicator_key(UnlistedEMC, combo) == (('exec_set', 2), ('fast_period', 10), ('slow_period', 60))
+    assert sweep.get_indicator_key(UnlistedEMC, {**combo, 'slippage': 40}) == \
+           sweep.get_indicator_key(UnlistedEMC, combo)
+
+
+def test_get_tasks():
+    combos = [{'fast_period': fast, 'exec_set': exec_set, 'slippage': slippage}
+              for fast in (10, 20) for exec_set in (1, 2) for slippage in (20, 30)]
+
+    # listed: grouped by the indicator params only
+    tasks = sweep.get_tasks(EMC, combos, batch_size=10)
+    assert [(key, len(members)) for key, members in tasks] == [((10, None), 4), ((20, None), 4)]
+
+    # not listed: no sharing between different strategy params
+    tasks = sweep.get_tasks(UnlistedEMC, combos, batch_size=10)
+    assert len(tasks) == 4
+    assert all(len(members) == 2 for key, members in tasks)
+    assert sorted(i for key, members in tasks for i, combo in members) == list(range(len(combos)))
+
+
+@pytest.mark.parametrize('strategy', [EMC, UnlistedEMC])
+def test_run_batch_same_as_single_runs(worker, strategy):
+    start_date, end_date = worker(strategy)
+    costs = {'fees': 12, 'slippage': 30, 'point_value': 10}
+    combos = [{'fast_period': fast, 'slow_period': 60, 'exec_set': exec_set, **costs}
+              for fast in (10, 20) for exec_set in (1, 2)]
+
+    rows = {}
+    for task in sweep.get_tasks(strategy, combos, batch_size=10):
+        rows.update(sweep.run_batch(task))
+
+    for i, combo in enumerate(combos):
+        engine = sweep.run_engine(sweep.get_strategy_params(combo), start_date, end_date, **costs)
+        assert engine.df_trd_jrl.shape[0] > 10
+        assert rows[i] == {**combo, **sweep.get_metrics(engine.df_trd_jrl, **costs)}
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from algorithm.emc_ready import EMC
+from library import ta
+
+
+def stream(indicator, rows) -> np.ndarray:
+    return np.array([indicator.update(row) for row in rows], dtype=float)
+
+
+def test_streaming_ema(kline):
+    values = stream(ta.StreamingEMA(20), kline.to_dict('records'))
+    np.testing.assert_array_equal(values, ta.ema(kline, 20).to_numpy())
+
+
+def test_streaming_bollingerbands(kline):
+    values = stream(ta.StreamingBollingerBands(20, 2.0), kline['close'].to_numpy())
+    for i, band in enumerate(ta.bollingerbands(kline['close'], 20, 2.0)):
+        np.testing.assert_array_equal(values[:, i], band.to_numpy())
+
+
+def test_streaming_adx(kline):
+    values = stream(ta.StreamingADX(14), kline.to_dict('records'))
+    np.testing.assert_array_equal(values, ta.adx(kline, 14).to_numpy())
+
+
+def test_streaming_stoch(kline):
+    values = stream(ta.StreamingStoch(14, 3, 3), kline.to_dict('records'))
+    slow_k, slow_d = ta.stoch(kline, 14, 3, 3)
+    np.testing.assert_array_equal(values[:, 0], slow_k.to_numpy())
+    np.testing.assert_array_equal(values[:, 1], slow_d.to_numpy())
+
+
+@pytest.mark.parametrize('func', [max, min])
+def test_rolling_extreme(func):
+    values = np.array([np.nan, 3., 1., 2., 2., 5., np.nan, 4., 1., 1., 1., 0., 7.])
+    rolling = pd.Series(values).rolling(window=3)
+    expected = (rolling.max() if func is max else rolling.min()).to_numpy()
+
+    extreme = ta._RollingExtreme(3, func)
+    np.testing.assert_array_equal([extreme.update(value) for value in values], expected)
+
+
+def test_warm_up(kline):
+    ema = ta.StreamingEMA(20)
+    ema.warm_up(kline[:-1])
+    assert ema.update(kline.iloc[-1]) == ta.ema(kline, 20).iloc[-1]
+
+
+def test_live_strategy_streams_the_closed_bars(kline):
+    strategy = EMC(main_app=None, symbol='MHI')
+    expected_fast, expected_slow = ta.ema(kline, 20).to_numpy(), ta.ema(kline, 60).to_numpy()
+
+    # the whole kline at the first bar, then one more closed bar each time
+    for end in range(3000, 3050):
+        strategy.update_indicator(kline[:end])
+        np.testing.assert_array_equal(strategy._fast, expected_fast[end - 2:end])
+        np.testing.assert_array_equal(strategy._slow, expected_slow[end - 2:end])
@@ -0,0 +1,123 @@
+import os
+
+import pandas as pd
+import pytest
+
+from library import ta
+from library.ta_cache import IndicatorCache
+
+
+@pytest.fixture
+def use_cache():
+    def set_cache(cache: IndicatorCache) -> IndicatorCache:
+        ta.set_cache(cache)
+        return cache
+    yield set_cache
+    ta.set_cache(None)
+
+
+def get_indicators(kline: pd.DataFrame) -> list:
+    return [ta.ema(kline, 20), *ta.bollingerbands(kline['close'], 20), ta.adx(kline, 14), *ta.stoch(kline, 14)]
+
+
+@pytest.mark.parametrize('source', [('HK.HSImain', 'v1'), None])
+def test_same_results(tmp_path, use_cache, kline, source):
+    expected = get_indicators(kline)
+
+    cache = use_cache(IndicatorCache(disk_dir=tmp_path, source=source))
+    for _ in range(2):
+        for series, expected_series in zip(get_indicators(kline), expected):
+            pd.testing.assert_series_equal(series, expected_series)
+    assert (cache.misses, cache.hits) == (4, 4)
+
+    # from disk in a new process
+    cache = use_cache(IndicatorCache(disk_dir=tmp_path, source=source))
+    for series, expected_series in zip(get_indicators(kline), expected):
+        pd.testing.assert_series_equal(series, expected_series)
+    assert (cache.misses, cache.disk_hits) == (0, 4)
+
+
+def test_returned_series_is_a_copy(use_cache, kline):
+    use_cache(IndicatorCache())
+    ema = ta.ema(kline, 20)
+    ema.iloc[:] = 0
+
+    assert ta.ema(kline, 20).iloc[-1] != 0
+
+
+@pytest.mark.parametrize('source', [('HK.HSImain', 'v1'), None])
+def test_content_change_with_same_time_range(use_cache, kline, source):
+    cache = use_cache(IndicatorCache(source=source))
+    ta.ema(kline, 20)
+
+    changed = kline.copy()
+    changed.loc[changed.index[-1], 'close'] += 1  # last row
+    assert ta.ema(changed, 20).iloc[-1] == ta.ema.__wrapped__(changed, 20).iloc[-1]
+    assert cache.misses == 2
+
+    changed = kline.copy()
+    changed['close'] += 1  # all rows, e.g. rebuilt with another rollover
+    ta.ema(changed, 20)
+    assert cache.misses == 3
+
+
+@pytest.mark.parametrize('row', [20, 1000, -2])
+def test_change_of_any_row(use_cache, kline, row):
+    # same source version, time range and length: every row is part of the fingerprint
+    cache = use_cache(IndicatorCache(source=('HK.HSImain', 'v1')))
+    ta.ema(kline, 20)
+
+    changed = kline.copy()
+    changed.loc[changed.index[row], 'close'] += 1
+    assert ta.ema(changed, 20).equals(ta.ema.__wrapped__(changed, 20))
+    assert (cache.misses, cache.hits) == (2, 0)
+
+
+@pytest.mark.parametrize('source', [('HK.HSImain', 'v1'), None])
+def test_only_read_columns_are_fingerprinted(use_cache, kline, source):
+    cache = use_cache(IndicatorCache(source=source))
+    ta.ema(kline, 20)
+    ta.adx(kline, 14)
+
+    changed = kline.assign(volume=0, open=0.)
+    ta.ema(changed, 20)
+    ta.adx(changed, 14)
+    assert (cache.misses, cache.hits) == (2, 2)
+
+    # ema of another column
+    ta.ema(changed, 20, ohlc='open')
+    assert cache.misses == 3
+
+
+def test_disk_eviction_keeps_recently_used(tmp_path, use_cache, kline, monkeypatch):
+    file_size = kline.shape[0] * 8 + 1000  # one series and its header
+    cache = use_cache(IndicatorCache(disk_dir=tmp_path, disk_max_bytes=3 * file_size))
+
+    # the directory is listed once, not for every result
+    monkeypatch.setattr(os, 'listdir', lambda path: pytest.fail('directory listed'))
+    for period in (10, 20, 30):
+        ta.ema(kline, period)
+    cache.clear()
+    ta.ema(kline, 10)  # from disk: recently used
+    ta.ema(kline, 40)  # evicts the least recently used (20)
+    monkeypatch.undo()
+
+    assert cache.disk_size <= 3 * file_size
+    assert cache.disk_size == sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path))
+    cache.clear()
+    hits = cache.disk_hits
+    for period in (10, 30, 40):
+        ta.ema(kline, period)
+    assert cache.disk_hits == hits + 3
+    ta.ema(kline, 20)
+    assert cache.disk_hits == hits + 3
+
+
+def test_disk_index_of_previous_runs(tmp_path, use_cache, kline):
+    use_cache(IndicatorCache(disk_dir=tmp_path))
+    for period in (10, 20):
+        ta.ema(kline, period)
+
+    cache = IndicatorCache(disk_dir=tmp_path)
+    assert len(cache._files) == 2
+    assert cache.disk_size == sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path))
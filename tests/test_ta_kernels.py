@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from library import ta, ta_kernels
+
+
+@pytest.fixture(params=['numba', 'no numba'])
+def kernels(request, monkeypatch):
+    """
+    numpy backend with the compiled loops, or with the NumPy windows (and pandas' ewm) if numba is missing
+    """
+    if request.param == 'numba':
+        pytest.importorskip('numba')
+    else:
+        monkeypatch.setattr(ta_kernels, 'njit', None)
+    ta.set_backend('numpy')
+    yield request.param
+    ta.set_backend('pandas')
+
+
+def get_both(func, *args) -> (tuple, tuple):
+    """
+    :return: output of the numpy backend, output of the pandas backend (tuples of arrays)
+    """
+    outputs = []
+    for backend in ('numpy', 'pandas'):
+        ta.set_backend(backend)
+        output = func(*args)
+        outputs.append(tuple(series.to_numpy() for series in (output if isinstance(output, tuple) else (output,))))
+
+    return outputs
+
+
+def assert_same(kernels: str, numpy_output: tuple, pandas_output: tuple, decimals: int = None):
+    """
+    the compiled loops are identical to pandas, the NumPy windows equal up to rounding
+    :param decimals: the output is rounded (a value next to half a unit may round the other way)
+    """
+    if kernels == 'numba':
+        np.testing.assert_array_equal(numpy_output, pandas_output)
+    else:
+        np.testing.assert_allclose(numpy_output, pandas_output, rtol=1e-9,
+                                   atol=10. ** -decimals if decimals is not None else 1e-9)
+
+
+@pytest.mark.parametrize('period', [1, 5, 20])
+def test_ema(kernels, kline, period):
+    numpy_output, pandas_output = get_both(ta.ema, kline, period)
+    np.testing.assert_array_equal(numpy_output, pandas_output)
+
+
+@pytest.mark.parametrize('period', [2, 20])
+def test_bollingerbands(kernels, kline, period):
+    numpy_output, pandas_output = get_both(ta.bollingerbands, kline['close'], period, 2.0)
+    assert_same(kernels, numpy_output, pandas_output, decimals=2)
+
+
+def test_adx(kernels, kline):
+    numpy_output, pandas_output = get_both(ta.adx, kline, 14)
+    np.testing.assert_array_equal(numpy_output, pandas_output)
+
+
+def test_stoch(kernels, kline):
+    numpy_output, pandas_output = get_both(ta.stoch, kline, 14, 3, 3)
+    assert_same(kernels, numpy_output, pandas_output)
+
+
+def test_output_is_series(kernels, kline):
+    ta.set_backend('numpy')
+    output = ta.ema(kline, 20)
+    assert isinstance(output, pd.Series) and output.index.equals(kline.index)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        ta.set_backend('polars')
+
+
+""" loops """
+# the loops run as plain Python if numba is missing (py_func of the compiled version otherwise)
+def get_loop(loop):
+    return getattr(loop, 'py_func', loop)
+
+
+@pytest.fixture(scope='module')
+def values(kline) -> np.ndarray:
+    return kline['close'].to_numpy(dtype=float)
+
+
+@pytest.mark.parametrize('com', [0., 2., 29.5])
+def test_ewm_mean_loop(values, com):
+    output = get_loop(ta_kernels._ewm_mean_loop)(values, 1. / (1. + com))
+    np.testing.assert_array_equal(output, pd.Series(values).ewm(com=com, adjust=False).mean().to_numpy())
+
+
+@pytest.mark.parametrize('window', [1, 3, 20])
+def test_rolling_moments_loop(values, window):
+    mean, std = get_loop(ta_kernels._rolling_moments_loop)(values, window)
+    rolling = pd.Series(values).rolling(window)
+    np.testing.assert_array_equal(mean, rolling.mean().to_numpy())
+    if pd.__version__ < '3':
+        np.testing.assert_array_equal(std, rolling.std().to_numpy())
+    else:  # the loop repeats pandas 2 (requirement.txt), pandas 3 leaves a residue of ~1e-5 on constant windows
+        np.testing.assert_allclose(std, rolling.std().to_numpy(), rtol=1e-7, atol=1e-4)
+
+
+@pytest.mark.parametrize('is_max', [True, False])
+def test_rolling_extreme_loop(values, is_max):
+    output = get_loop(ta_kernels._rolling_extreme_loop)(values, 14, is_max)
+    rolling = pd.Series(values).rolling(14)
+    np.testing.assert_array_equal(output, (rolling.max() if is_max else rolling.min()).to_numpy())
+
+
+@pytest.mark.parametrize('window', [1, 3, 20, 20000])
+def test_rolling_moments_numpy(values, window):
+    mean, std = ta_kernels._rolling_moments_numpy(values, window)
+    rolling = pd.Series(values).rolling(window)
+    np.testing.assert_allclose(mean, rolling.mean().to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(std, rolling.std().to_numpy(), rtol=1e-7, atol=1e-4)  # pandas 3: see above
+    if 1 < window <= 100:
+        assert (std[2000 + window - 1:2101] == 0).all()  # windows within the flat stretch
+
+
+@pytest.mark.parametrize('window', [1, 14, 20000])
+@pytest.mark.parametrize('is_max', [True, False])
+def test_rolling_extreme_numpy(values, window, is_max):
+    output = ta_kernels._rolling_extreme_numpy(values, window, is_max)
+    rolling = pd.Series(values).rolling(window)
+    np.testing.assert_array_equal(output, (rolling.max() if is_max else rolling.min()).to_numpy())
+
+
+def test_window_reduce_missing_values(values):
+    values = values.copy()
+    values[[500, 501, 900]] = np.nan
+    for window in (1, 2, 7, 14):
+        rolling = pd.Series(values).rolling(window)
+        np.testing.assert_array_equal(ta_kernels._rolling_extreme_numpy(values, window, True), rolling.max().to_numpy())
+        np.testing.assert_allclose(ta_kernels._rolling_moments_numpy(values, window)[0], rolling.mean().to_numpy(),
+                                   rtol=1e-12)
+
+
+def test_nan_led_and_flat_input(kline):
+    # the fixture leads with missing values and has a flat stretch longer than the windows
+    assert kline['close'].iloc[:10].isna().all()
+    assert kline['close'].iloc[2000:2101].nunique() == 1
@@ -0,0 +1,111 @@
+import datetime as dt
+from types import SimpleNamespace
+
+import pytest
+
+from algorithm.emc_ready import EMC
+from algorithm.template import AlgoTemplate
+from library.bar_aggregator import BarAggregator
+
+
+@pytest.fixture
+def template():
+    return AlgoTemplate(SimpleNamespace(engine='backtest'), 'FHSI')
+
+
+@pytest.fixture
+def strategy():
+    main_app = SimpleNamespace(engine='live', latency=SimpleNamespace(mark=lambda stage: None),
+                               fire_trade=lambda *args, **kwargs: pytest.fail("live orders are placed by AlgoTrade"))
+    return EMC(main_app, 'FHSI')
+
+
+def test_live_orders_are_collected(strategy):
+    strategy.place_order(side='BUY', qty=1, remark='LE')
+    strategy.place_order(side='SELL', qty=1, remark='LX')  # within a second of the first one: ignored
+
+    assert strategy.orders == [('BUY', 1, 'EMC-LE', 'MARKET')]
+    assert strategy.inv_real == 0  # updated once the order is placed (update_order_params)
+
+
+def test_update_backtest_params(template):
+    template.update_backtest_params('BUY', 1, 20000)
+    template.update_backtest_params('BUY', 2, 20030)
+    assert (template.inv_algo, template.avg_price, template.first_entry_price) == (3, 20020, 20000)
+
+    # closing a part keeps the average price
+    template.update_backtest_params('SELL', 2, 20100)
+    assert (template.inv_algo, template.avg_price) == (1, 20020)
+
+    template.update_backtest_params('SELL', 1, 20100)
+    assert (template.inv_algo, template.avg_price) == (0, 0)
+
+    # short entry
+    template.update_backtest_params('SELL', 2, 20050)
+    assert (template.inv_algo, template.avg_price, template.first_entry_price) == (-2, 20050, 20050)
+
+
+@pytest.mark.parametrize('mode', ['normal', 'reverse'])
+def test_reversal(template, mode):
+    template.mode = mode
+    side, opposite = ('BUY', 'SELL') if mode == 'normal' else ('SELL', 'BUY')
+
+    template.update_backtest_params(side, 1, 20000)
+    template.update_backtest_params(opposite, 2, 20100)  # long 1 to short 1 with one order
+
+    assert (template.inv_algo, template.avg_price, template.first_entry_price) == (-1, 20100, 20100)
+
+
+def test_update_order_params(strategy):
+    entry_time, add_time, exit_time, reverse_time = (dt.datetime(2020, 3, 2, 9, 30 + i) for i in range(4))
+
+    strategy.update_order_params('BUY', 1, 20000, entry_time)
+    assert (strategy.inv_real, strategy.inv_algo, strategy.avg_price, strategy.trd_vol) == (1, 1, 20000, 1)
+    assert (strategy.first_entry_price, strategy.last_entry_price, strategy.last_entry_time) == (20000, 20000, entry_time)
+
+    # add order: average price and last entry
+    strategy.update_order_params('BUY', 1, 20010, add_time)
+    assert (strategy.inv_real, strategy.avg_price, strategy.trd_vol) == (2, 20005, 2)
+    assert (strategy.first_entry_price, strategy.last_entry_price, strategy.last_entry_time) == (20000, 20010, add_time)
+
+    # partial close keeps the entry values
+    strategy.update_order_params('SELL', 1, 20050, exit_time)
+    assert (strategy.inv_real, strategy.avg_price, strategy.trd_vol) == (1, 20005, 3)
+    assert (strategy.last_entry_price, strategy.last_entry_time) == (20010, add_time)
+
+    # reversal: a new entry
+    strategy.update_order_params('SELL', 2, 20040, reverse_time)
+    assert (strategy.inv_real, strategy.avg_price, strategy.trd_vol) == (-1, 20040, 5)
+    assert (strategy.last_entry_price, strategy.last_entry_time) == (20040, reverse_time)
+
+    strategy.update_order_params('BUY', 1, 20050, exit_time)
+    assert (strategy.inv_real, strategy.inv_algo, strategy.avg_price, strategy.trd_vol) == (0, 0, 0, 6)
+
+
+def test_update_order_params_reverse(strategy):
+    strategy.mode = 'reverse'
+
+    # the strategy's long entry is placed as a sell order
+    strategy.update_order_params('SELL', 2, 20000, dt.datetime(2020, 3, 2, 9, 30))
+    assert (strategy.inv_real, strategy.inv_algo, strategy.avg_price) == (-2, 2, 20000)
+    assert strategy.last_entry_price == 20000
+
+
+def test_update_kline_daily(strategy, monkeypatch):
+    applied = []
+    monkeypatch.setattr(strategy, 'apply_daily_indicators', lambda: applied.append(len(strategy.kline_daily)))
+    aggregator = BarAggregator(timeframes=('daily',))
+    aggregator.subscribe('daily', lambda bar: strategy.update_kline_daily([bar]))
+
+    # night session after midnight is part of the trading day, the daily bar closes with the next day
+    for time_key, price in [(dt.datetime(2020, 3, 2, 9, 16), 20000), (dt.datetime(2020, 3, 3, 2, 59), 20100),
+                            (dt.datetime(2020, 3, 3, 9, 16), 20200), (dt.datetime(2020, 3, 4, 9, 16), 20300)]:
+        aggregator.update(time_key, price, price + 10, price - 10, price, 5)
+
+    assert strategy.kline_daily.to_dict('records') == [
+        {'open': 20000, 'high': 20110, 'low': 19990, 'close': 20100, 'volume': 10, 'time_key': 20200302},
+        {'open': 20200, 'high': 20210, 'low': 20190, 'close': 20200, 'volume': 5, 'time_key': 20200303}]
+    assert applied == [1, 2]
+
+    strategy.update_kline_daily([])
+    assert applied == [1, 2]
@@ -0,0 +1,55 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import vector_engine
+from algorithm.emc_ready import EMC
+from conftest import read_backtest_data
+from main import BackTestEngine
+
+
+def run_engine(data: pd.DataFrame, start_date: dt.datetime, end_date: dt.datetime, vectorized: bool,
+               strategy_params: dict = None) -> BackTestEngine:
+    engine = BackTestEngine(strategy=EMC, chart=None, data=data, start_date=start_date, end_date=end_date,
+                            kline_daily=pd.DataFrame(), warmup_bars=500, vectorized=vectorized, fees=12, slippage=30,
+                            point_value=10, strategy_params=strategy_params)
+    engine.start_testing_strategy()
+    return engine
+
+
+@pytest.mark.parametrize('strategy_params', [None, {'fast_period': 5, 'slow_period': 30, 'exec_set': 2},
+                                             {'mode': 'reverse'}])
+def test_same_trade_journal_as_event_loop(store_dir, strategy_params):
+    start_date, end_date = dt.datetime(2020, 3, 1), dt.datetime(2020, 4, 30)
+    data = read_backtest_data(store_dir, dt.datetime(2020, 2, 20), dt.datetime(2020, 5, 2))
+
+    event = run_engine(data, start_date, end_date, vectorized=False, strategy_params=strategy_params)
+    vector = run_engine(data, start_date, end_date, vectorized=True, strategy_params=strategy_params)
+
+    trades = event.df_trd_jrl
+    assert len(trades) > 100
+    assert trades['remark'].str.contains('TIMEOUT').any()
+    pd.testing.assert_frame_equal(vector.df_trd_jrl, trades)
+    assert vector.strategy.get_position_state() == event.strategy.get_position_state()
+
+
+def test_get_orders():
+    signals = {'long_entry': np.array([0, 1, 1, 0, 0, 0, 0, 0], dtype=bool),
+               'long_exit': np.array([0, 1, 0, 0, 1, 0, 0, 0], dtype=bool),
+               'short_entry': np.array([0, 0, 0, 0, 0, 1, 0, 0], dtype=bool),
+               'short_exit': np.array([0, 0, 0, 0, 0, 0, 0, 0], dtype=bool)}
+    can_open_order = np.ones(8, dtype=bool)
+    is_timeout = np.array([0, 0, 0, 0, 0, 0, 1, 0], dtype=bool)
+
+    orders = vector_engine.get_orders(signals, can_open_order, is_timeout, first_bar=0, last_bar=8)
+    assert orders == [(1, 'LE'), (4, 'LX'), (5, 'SE'), (6, 'SX TIMEOUT')]
+
+    # outside the open order period or the checked bars
+    can_open_order[1] = False
+    assert vector_engine.get_orders(signals, can_open_order, is_timeout, first_bar=0, last_bar=4) == [(2, 'LE')]
+
+    # position carried from the previous period
+    assert vector_engine.get_orders(signals, can_open_order, is_timeout, first_bar=2, last_bar=8, position=-1) == \
+           [(6, 'SX TIMEOUT')]